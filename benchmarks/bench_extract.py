@@ -0,0 +1,125 @@
+"""Time and peak allocation of PDF text extraction per page.
+
+Compares get_text('dict') walked the way PDFConverter used to (a has_text
+pass, four passes per line for the bounding box, a join for the text) with
+bionic.extract.extract_lines and its columnar variant extract_columns, on
+dense multi-font text pages and on the corpus's text+photo pages. "Held" is what stays allocated while the page
+is rebuilt: the converter used to keep the whole dict until then. Run
+from the repository root:
+
+    python benchmarks/bench_extract.py [--pages 40] [--repeat 3]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fitz  # noqa: E402
+
+from bionic.extract import extract_columns, extract_lines  # noqa: E402
+
+from corpus import _words, make_mixed_pdf  # noqa: E402
+
+
+def make_dense_pdf(path, pages, seed=5):
+    # 90 lines of 8pt text per page, each line in three fonts
+    rng = random.Random(seed)
+    doc = fitz.open()
+    for _ in range(pages):
+        page = doc.new_page()
+        y = 30
+        for _ in range(90):
+            x = 30
+            for fontname in ('helv', 'hebo', 'tiro'):
+                text = _words(rng, 6)
+                page.insert_text((x, y), text, fontsize=8, fontname=fontname)
+                x += fitz.get_text_length(text, fontname, 8) + 3
+            y += 8.8
+    doc.save(path, deflate=True, no_new_id=True)
+
+
+def legacy_lines(page):
+    # What PDFConverter.convert_page and insert_bionic_text did with the dict
+    text_dict = page.get_text('dict')
+    has_text = any(block['type'] == 0 and any(line['spans'] for line in block['lines'])
+                   for block in text_dict['blocks'])
+    lines = []
+    for block in text_dict['blocks']:
+        if block['type'] != 0:
+            continue
+        for line in block['lines']:
+            if not line['spans']:
+                continue
+            y0 = min(span['bbox'][1] for span in line['spans'])
+            y1 = max(span['bbox'][3] for span in line['spans'])
+            x0 = min(span['bbox'][0] for span in line['spans'])
+            x1 = max(span['bbox'][2] for span in line['spans'])
+            lines.append((fitz.Rect(x0, y0, x1, y1), ''.join(span['text'] for span in line['spans'])))
+    return has_text, text_dict, lines
+
+
+def lean_lines(page):
+    lines = extract_lines(page)
+    return bool(lines), lines
+
+
+def lean_spans(page):
+    # As used by the glyph writer (render mode 'text')
+    return extract_lines(page, spans=True)
+
+
+def columns(page):
+    # As used by the HTML render mode
+    return extract_columns(page)
+
+
+def measure(doc, func, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for page in doc:
+            func(page)
+    ms = (time.perf_counter() - start) / (repeat * len(doc)) * 1000
+    peak = held = 0
+    for page in doc:
+        tracemalloc.start()
+        result = func(page)  # noqa: F841 (kept alive for the measurement)
+        current, page_peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del result
+        peak = max(peak, page_peak)
+        held = max(held, current)
+    return ms, peak, held
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--pages', type=int, default=40)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix='bench_extract_') as work_dir:
+        samples = [('dense text', os.path.join(work_dir, 'dense.pdf'), make_dense_pdf),
+                   ('text+photo', os.path.join(work_dir, 'mixed.pdf'), make_mixed_pdf)]
+        for label, path, make in samples:
+            make(path, args.pages)
+            doc = fitz.open(path)
+            print(f'{label}: {args.pages} pages')
+            results = {}
+            for name, func in (('get_text dict', legacy_lines), ('extract_lines', lean_lines),
+                               ('  with spans', lean_spans), ('extract_columns', columns)):
+                ms, peak, held = measure(doc, func, args.repeat)
+                results[name] = (ms, peak, held)
+                print(f'  {name:<15} {ms:7.2f} ms/page  peak {peak / 1024:7.1f} KB  held {held / 1024:7.1f} KB')
+            doc.close()
+            old, new = results['get_text dict'], results['extract_lines']
+            print(f'  {old[0] / new[0]:.2f}x faster, {old[1] / max(new[1], 1):.2f}x lower peak, '
+                  f'{old[2] / max(new[2], 1):.1f}x less held')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""Output size and save time of the HTML render mode, per-line vs shared fonts.
+
+Converts a generated text PDF twice: once through insert_htmlbox for every
+line (the previous HTML render mode, still used for custom styling
+functions), once with the fonts of bionic.fonts.FontRegistry embedded once
+per document. Run from the repository root:
+
+    python benchmarks/bench_fonts.py [--pages 500] [--chunk-pages 100]
+
+The per-line run takes a few minutes for 500 pages; --skip-htmlbox leaves it out.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bionic.pdf_converter import PDFConverter  # noqa: E402
+from bionic.reading import bionic_reading  # noqa: E402
+
+from corpus import make_text_pdf  # noqa: E402
+
+
+def htmlbox_reading(text):
+    # Not the built-in engine, so every line goes through insert_htmlbox
+    return bionic_reading(text)
+
+
+def measure(name, source, output_dir, chunk_pages, **options):
+    summaries = []
+    converter = PDFConverter(source, output_dir, chunk_pages=chunk_pages, checkpoint=False,
+                             metrics=summaries.append, **options)
+    start = time.perf_counter()
+    out_path = converter.run()
+    wall = time.perf_counter() - start
+    stages = summaries[0]['stages']
+    save = stages.get('save', {}).get('seconds', 0.0)
+    insert = stages.get('insert_text', {}).get('seconds', 0.0)
+    size = os.path.getsize(out_path)
+    print(f"{name:<14} {size / (1024 * 1024):9.2f} MB  save {save:7.2f}s  insert_text {insert:7.2f}s  "
+          f"total {wall:7.2f}s")
+    return size, save
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--pages', type=int, default=500)
+    parser.add_argument('--chunk-pages', type=int, default=100)
+    parser.add_argument('--skip-htmlbox', action='store_true', help='only run the shared-font writer')
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix='bench_fonts_') as work_dir:
+        source = os.path.join(work_dir, 'text.pdf')
+        make_text_pdf(source, args.pages)
+        print(f"{args.pages} text pages, written in chunks of {args.chunk_pages}")
+        shared = measure('shared fonts', source, os.path.join(work_dir, 'shared'), args.chunk_pages)
+        measure('shared, match', source, os.path.join(work_dir, 'match'), args.chunk_pages, match_fonts=True)
+        if not args.skip_htmlbox:
+            per_line = measure('per-line html', source, os.path.join(work_dir, 'htmlbox'), args.chunk_pages,
+                               bionic_reading=htmlbox_reading)
+            print(f"output {per_line[0] / shared[0]:.1f}x smaller, save {per_line[1] / max(shared[1], 1e-9):.1f}x faster")
+
+
+if __name__ == '__main__':
+    main()
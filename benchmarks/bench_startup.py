@@ -0,0 +1,81 @@
+"""Time from launch to the GUI's first window.
+
+Starts the GUI with ``--profile-startup`` several times, waits for the
+"Startup:" line it prints once the first window is on screen, and
+reports the wall time from launch to that line next to what the app
+measured itself (which leaves out interpreter start-up and, for a
+PyInstaller onefile build, unpacking). Each run is stopped once it has
+reported. Run from the repository root:
+
+    python benchmarks/bench_startup.py [--runs 5] [--imports 10]
+    python benchmarks/bench_startup.py --command dist/main/main       # a PyInstaller build
+
+Without a display, set QT_QPA_PLATFORM=offscreen.
+"""
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REPORTED = re.compile(r'Startup: first window after (\d+) ms')
+IMPORT_LINE = re.compile(r'import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)')
+
+
+def launch(command):
+    # (wall seconds to the startup line, seconds the app reported, import-time lines)
+    start = time.perf_counter()
+    proc = subprocess.Popen(command + ['--profile-startup'], cwd=ROOT, stdout=subprocess.DEVNULL,
+                            stderr=subprocess.PIPE, text=True, errors='replace')
+    imports = []
+    try:
+        for line in proc.stderr:
+            match = REPORTED.search(line)
+            if match:
+                return time.perf_counter() - start, int(match.group(1)) / 1000, imports
+            if IMPORT_LINE.match(line):
+                imports.append(line.rstrip())
+        raise RuntimeError(f'{command} exited without reporting its startup (exit code {proc.wait()})')
+    finally:
+        proc.kill()
+        proc.wait()
+
+
+def top_imports(lines, count):
+    # Top-level imports (not nested in another) by cumulative time
+    entries = []
+    for line in lines:
+        own, cumulative, indent, name = IMPORT_LINE.match(line).groups()
+        if not indent:
+            entries.append((int(cumulative), name))
+    return sorted(entries, reverse=True)[:count]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--imports', type=int, default=10, help='slowest top-level imports to list')
+    parser.add_argument('--command', nargs='+', help='program to start (default: this Python running main.py)')
+    args = parser.parse_args(argv)
+
+    command = args.command or [sys.executable, os.path.join(ROOT, 'main.py')]
+    launch(command)  # Warm the OS file cache
+    walls, reported = [], []
+    for _ in range(args.runs):
+        wall, own, imports = launch(command)
+        walls.append(wall)
+        reported.append(own)
+    print(f"{' '.join(command)}: {args.runs} runs")
+    print(f'  launch to first window  median {statistics.median(walls) * 1000:6.0f} ms  '
+          f'min {min(walls) * 1000:6.0f} ms')
+    print(f'  reported by the app     median {statistics.median(reported) * 1000:6.0f} ms')
+    print('  slowest top-level imports (last run):')
+    for cumulative, name in top_imports(imports, args.imports):
+        print(f'    {cumulative / 1000:7.1f} ms  {name}')
+
+
+if __name__ == '__main__':
+    main()
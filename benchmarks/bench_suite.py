@@ -0,0 +1,245 @@
+"""Benchmark suite for every conversion path, with baseline comparison.
+
+Generates a deterministic corpus (see corpus.py), runs each converter
+headless in its own subprocess (the same code the GUI threads run) and
+records wall time, pages or chapters per second, peak RSS and output
+size. Run from the repository root:
+
+    python benchmarks/bench_suite.py                          # full profile -> bench_results.json
+    python benchmarks/bench_suite.py --profile quick --cases 'pdf_*'
+    python benchmarks/bench_suite.py --baseline baseline.json # exit 1 on regressions
+    python benchmarks/bench_suite.py --compare old.json new.json
+
+Wall time is measured around the conversion only, not interpreter start-up.
+Peak RSS needs the ``resource`` module (Linux, macOS) or psutil (Windows).
+"""
+import argparse
+import contextlib
+import datetime
+import fnmatch
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+# name -> (corpus file, conversion mode, converter keyword arguments)
+CASES = {
+    'pdf_html': ('text_pdf', 'pdf', {}),
+    'pdf_text_render': ('text_pdf', 'pdf', {'render_mode': 'text'}),
+    'pdf_text_render_parallel': ('text_pdf', 'pdf', {'render_mode': 'text', 'workers': 0}),
+    'pdf_mixed_raster': ('mixed_pdf', 'pdf', {}),
+    'pdf_mixed_vector': ('mixed_pdf', 'pdf', {'image_mode': 'vector'}),
+    'pdf_scanned': ('scanned_pdf', 'pdf', {}),
+    'epub_to_epub_small': ('small_epub', 'epub', {'output_format': 'EPUB'}),
+    'epub_to_epub_large': ('large_epub', 'epub', {'output_format': 'EPUB'}),
+    'epub_to_pdf_small': ('small_epub', 'epub', {'output_format': 'PDF'}),
+    'epub_to_pdf_large': ('large_epub', 'epub', {'output_format': 'PDF'}),
+    'pdf_to_epub_mixed': ('mixed_pdf', 'pdf2epub', {}),
+    'shrink_mixed': ('mixed_pdf', 'shrink', {}),
+}
+
+# Metrics compared against a baseline; higher is worse for all of them
+COMPARED = ('wall_s', 'peak_rss_mb', 'output_bytes')
+
+
+def _own_peak_kb():
+    # VmHWM is reset by exec; ru_maxrss (below) is not on Linux and would include the parent's peak
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def peak_rss_mb():
+    """Peak resident memory of this process and its finished children (worker pools), in MB."""
+    try:
+        import resource
+    except ImportError:
+        try:
+            import psutil
+        except ImportError:
+            return None
+        return psutil.Process().memory_info().peak_wset / (1024 * 1024)
+    scale = 1024 if sys.platform == 'darwin' else 1  # ru_maxrss is bytes on macOS, KB elsewhere
+    own_kb = _own_peak_kb()
+    if own_kb is None:
+        own_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+    children_kb = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / scale
+    return max(own_kb, children_kb) / 1024
+
+
+def count_units(path):
+    # Pages for PDF input, chapters (spine documents) for EPUB input
+    if path.lower().endswith('.epub'):
+        import ebooklib
+        from ebooklib import epub
+        book = epub.read_epub(path)
+        return len(list(book.get_items_of_type(ebooklib.ITEM_DOCUMENT))), 'chapters'
+    import fitz  # PyMuPDF
+    with fitz.open(path) as doc:
+        return len(doc), 'pages'
+
+
+def run_case(name, input_path, out_dir):
+    # Runs in the child process: convert once and print the measurements as JSON
+    _, mode, kwargs = CASES[name]
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(sys.stderr):
+        if mode == 'shrink':
+            from bionic.shrink import shrink_pdf
+            out_path = shrink_pdf(input_path, out_dir)
+        else:
+            from bionic.converters import make_converter
+            out_path = make_converter(input_path, out_dir, mode=mode, **kwargs).run()
+    wall = time.perf_counter() - start
+    print(json.dumps({'wall_s': wall, 'peak_rss_mb': peak_rss_mb(), 'output_bytes': os.path.getsize(out_path)}))
+
+
+def measure_case(name, input_path, repeat):
+    """Run a case ``repeat`` times in fresh processes; keeps the best value of each metric."""
+    best = None
+    for _ in range(repeat):
+        with tempfile.TemporaryDirectory(prefix='bionic_bench_') as out_dir:
+            proc = subprocess.run([sys.executable, os.path.abspath(__file__), '--run-case', name,
+                                   '--input', input_path, '--out-dir', out_dir],
+                                  capture_output=True, text=True)
+        if proc.returncode != 0:
+            lines = [line for line in proc.stderr.strip().splitlines() if line.strip()]
+            return {'error': lines[-1] if lines else f'exit code {proc.returncode}'}
+        result = json.loads(proc.stdout.strip().splitlines()[-1])
+        if best is None:
+            best = result
+        else:
+            for key, value in result.items():
+                if value is not None and (best[key] is None or value < best[key]):
+                    best[key] = value
+    return best
+
+
+def run_suite(args):
+    from corpus import ensure_corpus
+    import fitz  # PyMuPDF
+
+    corpus = ensure_corpus(args.corpus_dir, args.profile)
+    names = [name for name in CASES if any(fnmatch.fnmatch(name, pattern) for pattern in args.cases)]
+    results = {
+        'meta': {
+            'date': datetime.datetime.now().isoformat(timespec='seconds'),
+            'profile': args.profile,
+            'repeat': args.repeat,
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'pymupdf': fitz.VersionBind,
+        },
+        'cases': {},
+    }
+    for name in names:
+        corpus_name = CASES[name][0]
+        input_path = corpus[corpus_name]
+        units, unit = count_units(input_path)
+        print(f'{name:<28}', end=' ', flush=True)
+        result = measure_case(name, input_path, args.repeat)
+        result.update({'input': corpus_name, 'units': units, 'unit': unit})
+        if 'error' in result:
+            print(f"FAILED: {result['error']}")
+        else:
+            result[f'{unit}_per_s'] = units / result['wall_s'] if result['wall_s'] else None
+            rss = f"{result['peak_rss_mb']:.0f} MB" if result['peak_rss_mb'] is not None else 'n/a'
+            print(f"{result['wall_s']:8.2f} s  {result[f'{unit}_per_s']:8.1f} {unit}/s  "
+                  f"RSS {rss:>7}  output {result['output_bytes'] / 1024:,.0f} KB")
+        results['cases'][name] = result
+    return results
+
+
+def compare(baseline, current, threshold):
+    """Print a per-metric comparison; returns the list of regressions beyond ``threshold``."""
+    regressions = []
+    print(f"\n{'case':<28} {'metric':<13} {'baseline':>12} {'current':>12} {'change':>8}")
+    for name, result in current['cases'].items():
+        base = baseline['cases'].get(name)
+        if base is None:
+            print(f'{name:<28} (not in baseline)')
+            continue
+        if 'error' in result or 'error' in base:
+            if 'error' in result and 'error' in base:
+                status = 'fails in both'
+            elif 'error' in result:
+                status = 'fails now'
+                regressions.append((name, 'error', None))
+            else:
+                status = 'fixed'
+            print(f'{name:<28} {status}')
+            continue
+        for metric in COMPARED:
+            old, new = base.get(metric), result.get(metric)
+            if not old or new is None:
+                continue
+            change = new / old - 1
+            flag = ''
+            if change > threshold:
+                flag = '  REGRESSION'
+                regressions.append((name, metric, change))
+            print(f'{name:<28} {metric:<13} {old:>12.4g} {new:>12.4g} {change:>+8.1%}{flag}')
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--profile', choices=['quick', 'full'], default='full')
+    parser.add_argument('--cases', nargs='+', default=['*'], help='case names or glob patterns (default: all)')
+    parser.add_argument('--repeat', type=int, default=1, help='runs per case; the best value of each metric is kept')
+    parser.add_argument('--corpus-dir', default=os.path.join(tempfile.gettempdir(), 'bionic-bench-corpus'))
+    parser.add_argument('-o', '--output', default='bench_results.json', help='where to write the results')
+    parser.add_argument('--baseline', help='results file to compare this run against')
+    parser.add_argument('--compare', nargs=2, metavar=('BASELINE', 'CURRENT'),
+                        help='compare two results files without running anything')
+    parser.add_argument('--threshold', type=float, default=0.10,
+                        help='relative increase counted as a regression (default: 0.10)')
+    parser.add_argument('--list', action='store_true', help='list the cases and exit')
+    # Internal: run one case in this process (used by the suite for isolation)
+    parser.add_argument('--run-case', help=argparse.SUPPRESS)
+    parser.add_argument('--input', help=argparse.SUPPRESS)
+    parser.add_argument('--out-dir', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.run_case:
+        run_case(args.run_case, args.input, args.out_dir)
+        return 0
+    if args.list:
+        for name, (corpus_name, mode, kwargs) in CASES.items():
+            print(f'{name:<28} {corpus_name:<12} {mode:<9} {kwargs or ""}')
+        return 0
+    if args.compare:
+        with open(args.compare[0]) as f:
+            baseline = json.load(f)
+        with open(args.compare[1]) as f:
+            current = json.load(f)
+        return 1 if compare(baseline, current, args.threshold) else 0
+
+    results = run_suite(args)
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f'Results written to {args.output}')
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(baseline, results, args.threshold)
+        if regressions:
+            print(f'{len(regressions)} regression(s) above {args.threshold:.0%}')
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,146 @@
+"""Deterministic synthetic inputs for the benchmark suite.
+
+Every file is generated from a fixed seed, so the same profile always
+produces the same pages, words and images and timings stay comparable
+between runs and machines (PDFs are byte-identical; EPUBs differ only in
+the timestamps ebooklib writes). Files are written once per profile and
+reused.
+"""
+import os
+import random
+
+import fitz  # PyMuPDF
+
+from bench_reading import VOCABULARY
+
+# name -> (kind, options); the 'quick' profile uses the same corpus at a fraction of the size
+CORPUS = {
+    'text_pdf': ('text_pdf', {'pages': 60}),
+    'mixed_pdf': ('mixed_pdf', {'pages': 40}),
+    'scanned_pdf': ('scanned_pdf', {'pages': 40}),
+    'small_epub': ('epub', {'chapters': 10, 'paragraphs': 20}),
+    'large_epub': ('epub', {'chapters': 120, 'paragraphs': 40}),
+}
+PROFILE_SCALE = {'quick': 0.2, 'full': 1.0}
+
+
+def _words(rng, count):
+    return ' '.join(rng.choice(VOCABULARY) for _ in range(count)).replace('&', 'and')
+
+
+def _photo(rng, width, height):
+    # A banded RGB image with seeded colors, built from raw samples (Pixmap.set_rect is slow on large images)
+    band = max(1, height // 24)
+    rows = []
+    for y in range(0, height, band):
+        color = bytes((rng.randrange(256), rng.randrange(256), rng.randrange(256)))
+        rows.append(color * (width * min(band, height - y)))
+    return fitz.Pixmap(fitz.csRGB, width, height, b''.join(rows), 0)
+
+
+def _text_page(doc, rng, lines=45):
+    page = doc.new_page()
+    y = 60
+    for n in range(lines):
+        size = 16 if n == 0 else 10
+        page.insert_text((50, y), _words(rng, 4 if n == 0 else 13), fontsize=size,
+                         fontname='hebo' if n == 0 else 'helv')
+        y += size * 1.45
+    return page
+
+
+def make_text_pdf(path, pages, seed=1):
+    rng = random.Random(seed)
+    doc = fitz.open()
+    for _ in range(pages):
+        _text_page(doc, rng)
+    doc.save(path, deflate=True, no_new_id=True)
+
+
+def make_mixed_pdf(path, pages, seed=2):
+    # Text with a distinct photo on every page, plus a shared logo
+    rng = random.Random(seed)
+    doc = fitz.open()
+    logo_xref = 0
+    for _ in range(pages):
+        page = _text_page(doc, rng, lines=25)
+        photo = _photo(rng, 800, 500)
+        page.insert_image(fitz.Rect(50, 450, 545, 760), stream=photo.tobytes('jpeg', jpg_quality=85))
+        if logo_xref:
+            page.insert_image(fitz.Rect(480, 20, 560, 50), xref=logo_xref)
+        else:
+            logo = _photo(rng, 160, 60)
+            logo_xref = page.insert_image(fitz.Rect(480, 20, 560, 50), stream=logo.tobytes('png'))
+    doc.save(path, deflate=True, no_new_id=True)
+
+
+def make_scanned_pdf(path, pages, seed=3):
+    # Image-only pages, as produced by a scanner without OCR
+    rng = random.Random(seed)
+    doc = fitz.open()
+    for _ in range(pages):
+        page = doc.new_page()
+        scan = _photo(rng, 1240, 1754)  # A4 at 150 dpi
+        page.insert_image(page.rect, stream=scan.tobytes('jpeg', jpg_quality=70))
+    doc.save(path, deflate=True, no_new_id=True)
+
+
+def make_epub(path, chapters, paragraphs, seed=4):
+    from ebooklib import epub
+    rng = random.Random(seed)
+    book = epub.EpubBook()
+    book.set_identifier(f'bench-{chapters}-{paragraphs}')
+    book.set_title(f'Benchmark book ({chapters} chapters)')
+    book.set_language('en')
+    cover = _photo(rng, 600, 400)
+    book.add_item(epub.EpubImage(uid='figure', file_name='images/figure.jpeg', media_type='image/jpeg',
+                                 content=cover.tobytes('jpeg', jpg_quality=80)))
+    items = []
+    for number in range(chapters):
+        body = []
+        for n in range(paragraphs):
+            if n == 1:
+                body.append('<p><img src="images/figure.jpeg" alt="figure"/></p>')
+            elif n % 4 == 3:
+                body.append(f'<p>{_words(rng, 30)} <em>{_words(rng, 5)}</em> {_words(rng, 40)}</p>')
+            else:
+                body.append(f'<p>{_words(rng, 80)}</p>')
+        chapter = epub.EpubHtml(title=f'Chapter {number + 1}', file_name=f'chapter_{number + 1:03d}.xhtml', lang='en')
+        chapter.set_content(f'<html><body><h1>Chapter {number + 1}</h1>{"".join(body)}</body></html>')
+        book.add_item(chapter)
+        items.append(chapter)
+    book.toc = tuple(items)
+    book.spine = ['nav'] + items
+    book.add_item(epub.EpubNcx())
+    book.add_item(epub.EpubNav())
+    epub.write_epub(path, book)
+
+
+MAKERS = {
+    'text_pdf': (make_text_pdf, '.pdf'),
+    'mixed_pdf': (make_mixed_pdf, '.pdf'),
+    'scanned_pdf': (make_scanned_pdf, '.pdf'),
+    'epub': (make_epub, '.epub'),
+}
+
+
+def scaled_options(options, scale):
+    return {key: max(1, round(value * scale)) for key, value in options.items()}
+
+
+def ensure_corpus(corpus_dir, profile='full'):
+    """Generate any missing corpus files; returns {name: path}."""
+    scale = PROFILE_SCALE[profile]
+    target = os.path.join(corpus_dir, profile)
+    os.makedirs(target, exist_ok=True)
+    paths = {}
+    for name, (kind, options) in CORPUS.items():
+        maker, extension = MAKERS[kind]
+        path = os.path.join(target, name + extension)
+        if not os.path.exists(path):
+            print(f'Generating {name} ({profile})...')
+            partial = path + '.partial' + extension
+            maker(partial, **scaled_options(options, scale))
+            os.replace(partial, path)
+        paths[name] = path
+    return paths
@@ -0,0 +1,11 @@
+"""Headless bionic reading conversion library.
+
+Nothing in this package imports PyQt5; the GUI in ``main.py`` wraps these
+converters in QThreads. Converter classes live in their own modules so that
+importing the package stays cheap:
+
+    from bionic.converters import make_converter
+    out_path = make_converter('book.pdf', 'converted').run()
+"""
+from .reading import bionic_reading
+from .converters import choose_mode, default_output_dir, make_converter
@@ -0,0 +1,246 @@
+import hashlib
+import json
+import os
+import re
+import shutil
+import tempfile
+
+from .sources import source_digest
+
+# Bump when converter output changes so stale cache entries are not reused
+CACHE_VERSION = 11
+
+_REFERENCE = re.compile(r'\b(\d+) \d+ R\b')  # Indirect reference: object and generation number
+_PAGE_OBJECT = re.compile(r'/Type\s*/Pages?\b')
+
+DEFAULT_MAX_BYTES = 1024 * 1024 * 1024  # 1 GB
+
+
+def default_cache_dir():
+    base = os.environ.get('LOCALAPPDATA') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'bionic-converter')
+
+
+def function_id(func):
+    # Stable name for the styling function, part of every key
+    return f"{getattr(func, '__module__', '')}.{getattr(func, '__qualname__', repr(func))}"
+
+
+def _page_resources(doc, page):
+    # The page's /Resources entry, inherited from the page tree when the page has none
+    xref = page.xref
+    while xref:
+        kind, value = doc.xref_get_key(xref, 'Resources')
+        if kind != 'null':
+            return value
+        kind, value = doc.xref_get_key(xref, 'Parent')
+        xref = int(value.split()[0]) if kind == 'xref' else 0
+    return ''
+
+
+def _resolve(doc, text, digests):
+    # PDF object text with each indirect reference replaced by the digest of the referenced object
+    return _REFERENCE.sub(lambda match: _object_digest(doc, int(match.group(1)), digests), text)
+
+
+def _object_digest(doc, xref, digests):
+    # Hash of an object, its stream and (recursively) everything it references
+    digest = digests.get(xref)
+    if digest is None:
+        digests[xref] = 'cycle'  # Seen again while it is being hashed: a reference loop
+        text = doc.xref_object(xref, compressed=True)
+        if _PAGE_OBJECT.search(text):
+            digest = 'page'  # Annotations and structure can point back into the page tree
+        else:
+            hashed = hashlib.sha256(_resolve(doc, text, digests).encode('utf-8'))
+            if doc.xref_is_stream(xref):
+                hashed.update(doc.xref_stream_raw(xref) or b'')
+            digest = hashed.hexdigest()
+        digests[xref] = digest
+    return digest
+
+
+class ConversionCache:
+    """Persistent, content-addressed store of converted files and pages.
+
+    Whole results are keyed by a hash of the input bytes plus the converter
+    mode and styling parameters, so re-converting an unchanged file just
+    copies the stored result. PDF pages are also cached one by one, keyed by
+    their content stream and resources, so a lightly edited revision only
+    re-lays out the pages that changed. Least recently used entries are
+    evicted once the cache grows past ``max_bytes``.
+    """
+
+    def __init__(self, cache_dir=None, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir or default_cache_dir()
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.page_hits = 0
+        self.page_misses = 0
+
+    # --- Keys ---
+    def job_key(self, file_path, params):
+        digest = hashlib.sha256()
+        digest.update(json.dumps({'version': CACHE_VERSION, **params}, sort_keys=True).encode('utf-8'))
+        return source_digest(file_path, digest).hexdigest()
+
+    def page_key(self, doc, page, params, digests=None):
+        """Key for one PDF page: its content stream, geometry and everything its resources reference.
+
+        Resources are hashed by content, not object number, down through
+        Form XObjects, fonts and images, so a page that only draws a form
+        (``q /fzFrm0 Do Q``) is keyed by what the form contains. Pass the
+        same ``digests`` dict for every page of ``doc`` to hash shared
+        objects once.
+        """
+        if digests is None:
+            digests = {}
+        digest = hashlib.sha256()
+        digest.update(json.dumps({'version': CACHE_VERSION, **params}, sort_keys=True).encode('utf-8'))
+        digest.update(repr((tuple(page.rect), page.rotation)).encode('utf-8'))
+        digest.update(page.read_contents())
+        digest.update(_resolve(doc, _page_resources(doc, page), digests).encode('utf-8'))
+        return digest.hexdigest()
+
+    # --- Storage ---
+    def _path(self, kind, key, ext):
+        return os.path.join(self.cache_dir, kind, key[:2], key + ext)
+
+    def _lookup(self, kind, key, ext):
+        path = self._path(kind, key, ext)
+        if os.path.exists(path):
+            try:
+                os.utime(path)  # Mark as recently used
+            except OSError:
+                pass
+            return path
+        return None
+
+    def _store_file(self, kind, key, ext, src_path):
+        path = self._path(kind, key, ext)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        os.close(fd)
+        try:
+            shutil.copyfile(src_path, tmp_path)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return path
+
+    def _store_bytes(self, kind, key, ext, data):
+        path = self._path(kind, key, ext)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return path
+
+    def get_page(self, key):
+        path = self._lookup('pages', key, '.pdf')
+        if path:
+            self.page_hits += 1
+        else:
+            self.page_misses += 1
+        return path
+
+    def put_page(self, key, pdf_bytes):
+        return self._store_bytes('pages', key, '.pdf', pdf_bytes)
+
+    # --- Whole conversions ---
+    def run(self, converter):
+        """Run ``converter`` unless an identical conversion is cached; returns the output path.
+
+        Converters writing to an ``output_stream`` get a cached result
+        copied into the stream (and return it); a conversion that does run
+        goes straight to the stream, so its result is not stored.
+        """
+        out_path = converter.output_path()
+        ext = os.path.splitext(out_path)[1]
+        key = self.job_key(converter.file_path, converter.cache_params())
+        cached = self._lookup('results', key, ext)
+        stream = getattr(converter, 'output_stream', None)
+        if cached:
+            self.hits += 1
+            print(f'Using cached conversion for {converter.input_name}')
+            if stream is not None:
+                with open(cached, 'rb') as f:
+                    shutil.copyfileobj(f, stream)
+                stream.flush()
+                converter.progress(100)
+                return stream
+            os.makedirs(os.path.dirname(out_path) or '.', exist_ok=True)
+            shutil.copyfile(cached, out_path)
+            converter.progress(100)
+            return out_path
+        self.misses += 1
+        if hasattr(converter, 'cache'):
+            converter.cache = self  # Per-page reuse inside the conversion
+        if stream is not None:
+            return converter.run()
+        out_path = converter.run()
+        self._store_file('results', key, ext, out_path)
+        self.evict()
+        return out_path
+
+    # --- Maintenance ---
+    def _entries(self):
+        entries = []
+        for kind in ('results', 'pages'):
+            root = os.path.join(self.cache_dir, kind)
+            for dirpath, _, filenames in os.walk(root):
+                for name in filenames:
+                    if name.endswith('.tmp'):
+                        continue
+                    path = os.path.join(dirpath, name)
+                    try:
+                        st = os.stat(path)
+                    except OSError:
+                        continue
+                    entries.append((st.st_mtime, st.st_size, kind, path))
+        return entries
+
+    def evict(self):
+        """Delete least recently used entries until the cache fits in max_bytes."""
+        if not self.max_bytes:
+            return 0
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _, _ in entries)
+        removed = 0
+        for _, size, _, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+                removed += 1
+            except OSError:
+                pass
+        return removed
+
+    def stats(self):
+        entries = self._entries()
+        return {
+            'cache_dir': self.cache_dir,
+            'max_bytes': self.max_bytes,
+            'bytes': sum(size for _, size, _, _ in entries),
+            'results': sum(1 for entry in entries if entry[2] == 'results'),
+            'pages': sum(1 for entry in entries if entry[2] == 'pages'),
+            'hits': self.hits,
+            'misses': self.misses,
+            'page_hits': self.page_hits,
+            'page_misses': self.page_misses,
+        }
+
+    def clear(self):
+        for kind in ('results', 'pages'):
+            shutil.rmtree(os.path.join(self.cache_dir, kind), ignore_errors=True)
@@ -0,0 +1,327 @@
+import argparse
+import contextlib
+import os
+import sys
+import time
+
+from .cache import DEFAULT_MAX_BYTES, ConversionCache
+from .converters import (MODE_EPUB, MODE_PDF, MODE_PDF_TO_EPUB, choose_mode,
+                         default_output_dir, make_converter)
+from .metrics import PROFILE_MODES, format_summary, profile_run
+from .sources import stdin_source
+
+# Input or output directory argument that means stdin or stdout
+PIPE = '-'
+
+# Same values as bionic.shrink.PRESETS, kept here so the parser does not import PyMuPDF
+SHRINK_PRESETS = ('fast', 'fonts', 'images')
+DEFAULT_SHRINK_PRESET = 'fonts'
+# Same as bionic.epub_writer.DEFAULT_COMPRESS_LEVEL, which would import lxml
+DEFAULT_EPUB_COMPRESSION = 6
+
+
+def _print_progress(value):
+    print(f"\r{value:3d}%", end='', file=sys.stderr, flush=True)
+
+
+def make_cache(args):
+    max_bytes = int(args.cache_mb * 1024 * 1024) if args.cache_mb is not None else DEFAULT_MAX_BYTES
+    return ConversionCache(args.cache_dir, max_bytes=max_bytes)
+
+
+def converter_options(args, mode):
+    # Converter keyword arguments from the options shared by 'convert' and 'watch'
+    kwargs = {}
+    if mode in (MODE_PDF, MODE_EPUB):
+        kwargs['optimize'] = args.optimize
+    if mode == MODE_PDF:
+        kwargs['workers'] = args.workers
+        kwargs['render_mode'] = args.render
+        kwargs['match_fonts'] = args.match_fonts
+        kwargs['image_mode'] = args.images
+        kwargs['raster_dpi'] = args.dpi
+        kwargs['chunk_pages'] = args.chunk_pages or None
+        kwargs['chunk_bytes'] = int(args.chunk_mb * 1024 * 1024) if args.chunk_mb else None
+    elif mode == MODE_EPUB:
+        kwargs['chunk_pages'] = args.chunk_pages or None
+    elif mode == MODE_PDF_TO_EPUB:
+        kwargs['workers'] = args.workers
+        kwargs['max_image_px'] = args.max_image_px
+        kwargs['jpeg_quality'] = args.jpeg_quality
+    if mode in (MODE_EPUB, MODE_PDF_TO_EPUB):
+        kwargs['compress_level'] = args.epub_compression
+    return kwargs
+
+
+def cmd_convert(args):
+    source = stdin_source() if args.input == PIPE else args.input
+    mode = args.mode or choose_mode(source, pdf_to_epub=args.pdf_to_epub)
+    to_stdout = args.output_dir == PIPE
+    if to_stdout and args.shrink:
+        raise ValueError('--shrink writes a second file; use --optimize when writing to stdout')
+    if to_stdout:
+        output_dir = None
+    else:
+        output_dir = os.path.normpath(args.output_dir) if args.output_dir else default_output_dir(source)
+    # Captured before stdout is redirected to stderr below
+    kwargs = converter_options(args, mode)
+    kwargs.update(input_name=args.name, output_stream=sys.stdout.buffer if to_stdout else None)
+    if mode in (MODE_PDF, MODE_EPUB):
+        kwargs['checkpoint'] = not args.no_resume
+    if mode == MODE_EPUB:
+        kwargs['chapters'] = args.pages
+    else:
+        kwargs['pages'] = args.pages
+    summaries = []
+    start_time = time.time()
+    # Converter log lines go to stderr so stdout only carries the output path, or the output itself.
+    # That includes anything printed while the converter modules are imported.
+    with contextlib.redirect_stdout(sys.stderr):
+        converter = make_converter(
+            source, output_dir, mode=mode, output_format=args.format.upper(),
+            progress=None if args.quiet else _print_progress,
+            metrics=summaries.append, metrics_log=args.metrics_log, **kwargs
+        )
+        if args.no_cache or args.profile:
+            # Profiling a cache hit would only measure a file copy
+            run = converter.run
+        else:
+            run = lambda: make_cache(args).run(converter)
+        if args.profile:
+            out_base = os.path.splitext(converter.output_path())[0]
+            out_path = profile_run(run, args.profile, out_base)
+        else:
+            out_path = run()
+        if not args.quiet:
+            print()
+        if args.metrics and summaries:
+            print(format_summary(summaries[-1]))
+        if args.shrink and out_path.lower().endswith('.pdf'):
+            from .shrink import shrink_pdf
+            out_path = shrink_pdf(out_path, output_dir, args.shrink_preset, workers=args.workers)
+    if not args.quiet:
+        print(f"Done in {time.time() - start_time:.1f}s", file=sys.stderr)
+    if not to_stdout:
+        print(out_path)
+    return 0
+
+
+def cmd_shrink(args):
+    from .shrink import shrink_pdf
+    output_dir = os.path.normpath(args.output_dir) if args.output_dir else os.path.dirname(os.path.abspath(args.input))
+    with contextlib.redirect_stdout(sys.stderr):
+        out_path = shrink_pdf(args.input, output_dir, args.preset, workers=args.workers,
+                              progress=None if args.quiet else _print_progress)
+        if not args.quiet:
+            print()
+    print(out_path)
+    return 0
+
+
+def cmd_watch(args):
+    from .watch import FolderWatcher, WatchState, default_state_path, watch_folder, watch_options
+    folder = os.path.abspath(args.folder)
+    output_dir = os.path.normpath(args.output_dir) if args.output_dir else os.path.join(folder, 'converted')
+    cache = None if args.no_cache else make_cache(args)
+    options = watch_options(output_dir, args.mode, args.pdf_to_epub, args.format, args.render, args.images,
+                            args.dpi, args.match_fonts, args.optimize, args.max_image_px)
+
+    def convert(file_path):
+        mode = args.mode or choose_mode(file_path, pdf_to_epub=args.pdf_to_epub)
+        converter = make_converter(file_path, output_dir, mode=mode, output_format=args.format.upper(),
+                                   metrics_log=args.metrics_log, **converter_options(args, mode))
+        return cache.run(converter) if cache else converter.run()
+
+    watcher = FolderWatcher(folder, settle=args.settle, poll_interval=args.poll, use_inotify=not args.polling)
+    state = WatchState(args.state or default_state_path(output_dir))
+    log = (lambda message: None) if args.quiet else (lambda message: print(message, file=sys.stderr, flush=True))
+    # Converter log lines go to stderr, as with 'convert'
+    with contextlib.redirect_stdout(sys.stderr):
+        try:
+            count = watch_folder(watcher, state, convert, options, once=args.once, log=log)
+        except KeyboardInterrupt:
+            log('Stopped')
+            return 0
+    log(f'Converted {count} file(s)')
+    return 0
+
+
+def cmd_serve(args):
+    from .server import serve
+    cache_dir = None if args.no_cache else (args.cache_dir or '')
+    max_bytes = int(args.cache_mb * 1024 * 1024) if args.cache_mb is not None else DEFAULT_MAX_BYTES
+    try:
+        serve(args.host, args.port, args.socket, workers=args.workers or os.cpu_count() or 1,
+              max_queue=args.queue, spool_dir=args.spool_dir, cache_dir=cache_dir, cache_bytes=max_bytes,
+              job_ttl=args.job_ttl, max_upload=int(args.max_upload_mb * 1024 * 1024), verbose=args.verbose,
+              path_roots=args.path_root or ())
+    except KeyboardInterrupt:
+        print('Stopped', file=sys.stderr)
+    return 0
+
+
+def cmd_cache(args):
+    cache = make_cache(args)
+    if args.action == 'clear':
+        cache.clear()
+        print(f"Cleared {cache.cache_dir}")
+        return 0
+    stats = cache.stats()
+    print(f"Directory: {stats['cache_dir']}")
+    print(f"Results:   {stats['results']}")
+    print(f"Pages:     {stats['pages']}")
+    print(f"Size:      {stats['bytes'] / (1024 * 1024):.1f} MB of {stats['max_bytes'] / (1024 * 1024):.0f} MB")
+    return 0
+
+
+def add_cache_arguments(parser):
+    parser.add_argument('--cache-dir', default=None,
+                        help='conversion cache directory (default: the user cache directory)')
+    parser.add_argument('--cache-mb', type=float, default=None,
+                        help='evict least recently used cache entries above this size (default: 1024)')
+
+
+def add_conversion_arguments(parser):
+    # Conversion options shared by 'convert' and 'watch'
+    parser.add_argument('--mode', choices=[MODE_PDF, MODE_EPUB, MODE_PDF_TO_EPUB],
+                        help='conversion mode (default: chosen from the file extension)')
+    parser.add_argument('--pdf-to-epub', action='store_true',
+                        help='convert a PDF to EPUB, preserving images (experimental)')
+    parser.add_argument('--format', default='EPUB', choices=['EPUB', 'PDF', 'epub', 'pdf'],
+                        help='output format for EPUB input (default: EPUB)')
+    parser.add_argument('-j', '--workers', type=int, default=1,
+                        help='processes for PDF -> PDF conversion and PDF -> EPUB image scaling '
+                             '(0 = one per CPU core, default: 1)')
+    parser.add_argument('--render', choices=['html', 'text'], default='html',
+                        help="PDF text rendering: 'html' writes each line at its source font size in embedded "
+                             "fonts (default), 'text' places glyphs directly at the source font size "
+                             "(much faster for Western Latin text; other lines are laid out as in 'html')")
+    parser.add_argument('--match-fonts', action='store_true',
+                        help="with --render html, use a serif, sans or monospace face per line to match "
+                             "the source font (default: serif throughout)")
+    parser.add_argument('--images', choices=['raster', 'vector'], default='raster',
+                        help="PDF pages with text and images: 'raster' renders the page to a bitmap "
+                             "(default), 'vector' keeps the original images and drawings and only replaces the text")
+    parser.add_argument('--dpi', type=int, default=None,
+                        help='resolution of rasterized pages (default: 72; also the fallback for --images vector)')
+    parser.add_argument('--chunk-pages', type=int, default=100,
+                        help='write PDF output to disk every N pages to bound memory (0 = only at the end, default: 100)')
+    parser.add_argument('--chunk-mb', type=float, default=None,
+                        help='also write PDF output to disk whenever about this many MB are buffered')
+    parser.add_argument('--max-image-px', type=int, default=None,
+                        help='PDF -> EPUB: scale images down to at most this many pixels on their longer side')
+    parser.add_argument('--jpeg-quality', type=int, default=85,
+                        help='PDF -> EPUB: JPEG quality for scaled-down images (default: 85)')
+    parser.add_argument('--epub-compression', type=int, choices=range(10), default=DEFAULT_EPUB_COMPRESSION,
+                        metavar='0-9',
+                        help='EPUB output: deflate level for text; JPEG, PNG and other compressed media '
+                             'are stored as they are (0 stores everything, default: %(default)s)')
+    parser.add_argument('--optimize', choices=SHRINK_PRESETS, default=None,
+                        help="optimize PDF output with this preset while it is finalized, "
+                             "instead of writing a separate shrunk copy")
+    parser.add_argument('--no-cache', action='store_true',
+                        help='always convert from scratch and do not store the result in the cache')
+    parser.add_argument('--metrics-log', metavar='FILE', default=None,
+                        help='append per-page stage timings and the summary to FILE as JSON lines')
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog='python -m bionic',
+        description='Apply bionic reading to PDF and EPUB files without the GUI.')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    convert = sub.add_parser('convert', help='convert a PDF or EPUB file')
+    convert.add_argument('input', help="PDF or EPUB file to convert, or '-' to read it from stdin")
+    convert.add_argument('-o', '--output-dir',
+                         help="output directory, or '-' to write the result to stdout "
+                              "(default: 'converted' next to the input)")
+    convert.add_argument('--name', default=None,
+                         help="file name of input read from stdin, used for the output file name "
+                              "(default: 'stream')")
+    convert.add_argument('--pages', '--chapters', metavar='RANGES', default=None,
+                         help="convert only these pages (chapters for EPUB input), e.g. '1-20,45,100-'")
+    add_conversion_arguments(convert)
+    convert.add_argument('--shrink', action='store_true', help='also write a shrunk copy of PDF output')
+    convert.add_argument('--shrink-preset', choices=SHRINK_PRESETS, default=DEFAULT_SHRINK_PRESET,
+                         help=f'optimizer preset for --shrink (default: {DEFAULT_SHRINK_PRESET})')
+    convert.add_argument('--no-resume', action='store_true',
+                         help='ignore and do not write checkpoints; by default an interrupted PDF output '
+                              'is resumed from the last chunk written')
+    convert.add_argument('--metrics', action='store_true',
+                         help='print the time spent in each conversion stage and the page counts per path')
+    convert.add_argument('--profile', choices=PROFILE_MODES, default=None,
+                         help="run under cProfile or tracemalloc and write the report next to the output "
+                              "(implies --no-cache)")
+    add_cache_arguments(convert)
+    convert.add_argument('-q', '--quiet', action='store_true', help='only print the output path')
+    convert.set_defaults(func=cmd_convert)
+
+    shrink = sub.add_parser('shrink', help='optimize an already converted PDF')
+    shrink.add_argument('input', help='PDF file to shrink')
+    shrink.add_argument('-o', '--output-dir', help='output directory (default: next to the input)')
+    shrink.add_argument('--preset', choices=SHRINK_PRESETS, default=DEFAULT_SHRINK_PRESET,
+                        help="'fast': drop unused objects and compress streams; 'fonts': also subset fonts "
+                             "and merge duplicates; 'images': also recompress and downsample images "
+                             f"(default: {DEFAULT_SHRINK_PRESET})")
+    shrink.add_argument('-j', '--workers', type=int, default=1,
+                        help="processes for the 'images' preset (0 = one per CPU core, default: 1)")
+    shrink.add_argument('-q', '--quiet', action='store_true', help='only print the output path')
+    shrink.set_defaults(func=cmd_shrink)
+
+    watch = sub.add_parser('watch', help='convert files dropped into a folder as they arrive')
+    watch.add_argument('folder', help='folder to watch for PDF and EPUB files (not its subfolders)')
+    watch.add_argument('-o', '--output-dir', help="output directory (default: 'converted' in the watched folder)")
+    watch.add_argument('--state', metavar='FILE', default=None,
+                       help='JSON file recording what was converted, so a restart skips those files '
+                            '(default: .bionic-watch.json in the output directory)')
+    watch.add_argument('--settle', type=float, default=2.0,
+                       help='seconds a file must stay unchanged before it is converted (default: 2)')
+    watch.add_argument('--poll', type=float, default=2.0,
+                       help='seconds between folder scans when polling (default: 2)')
+    watch.add_argument('--polling', action='store_true',
+                       help='scan the folder periodically instead of using inotify (e.g. for network shares)')
+    watch.add_argument('--once', action='store_true',
+                       help='convert the files already in the folder that need it, then exit')
+    add_conversion_arguments(watch)
+    add_cache_arguments(watch)
+    watch.add_argument('-q', '--quiet', action='store_true', help='do not log converted files')
+    watch.set_defaults(func=cmd_watch)
+
+    serve = sub.add_parser('serve', help='run a local conversion daemon with an HTTP API')
+    serve.add_argument('--host', default='127.0.0.1', help='address to listen on (default: 127.0.0.1)')
+    serve.add_argument('--port', type=int, default=8765, help='TCP port (default: 8765; 0 picks a free one)')
+    serve.add_argument('--socket', metavar='PATH', default=None, help='listen on this Unix socket instead of TCP')
+    serve.add_argument('-j', '--workers', type=int, default=1,
+                       help='conversion worker processes, started up front (0 = one per CPU core, default: 1)')
+    serve.add_argument('--queue', type=int, default=16,
+                       help='jobs that may wait for a worker; further submissions get HTTP 503 (default: 16)')
+    serve.add_argument('--spool-dir', default=None,
+                       help='directory for uploaded inputs and results (default: a temporary directory)')
+    serve.add_argument('--job-ttl', type=float, default=3600,
+                       help='seconds a finished job and its result are kept (0 = until deleted, default: 3600)')
+    serve.add_argument('--path-root', action='append', metavar='DIR', default=None,
+                       help='accept JSON submissions by path for files under DIR (repeatable; default: uploads only)')
+    serve.add_argument('--max-upload-mb', type=float, default=1024, help='largest accepted upload (default: 1024)')
+    serve.add_argument('--no-cache', action='store_true', help='do not use the conversion cache')
+    add_cache_arguments(serve)
+    serve.add_argument('-v', '--verbose', action='store_true', help='log requests and converter output to stderr')
+    serve.set_defaults(func=cmd_serve)
+
+    cache = sub.add_parser('cache', help='show or clear the conversion cache')
+    cache.add_argument('action', choices=['stats', 'clear'])
+    add_cache_arguments(cache)
+    cache.set_defaults(func=cmd_cache)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    try:
+        return args.func(args)
+    except KeyboardInterrupt:
+        print("\nInterrupted; run the same command again to resume from the last checkpoint", file=sys.stderr)
+        return 130
+    except Exception as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
@@ -0,0 +1,56 @@
+import os
+import threading
+
+from .sources import is_stream, source_digest
+
+
+class ConversionCancelled(Exception):
+    """Raised inside a converter whose JobControl was cancelled."""
+
+
+class JobControl:
+    """Cooperative cancel and pause for a running conversion.
+
+    Converters call ``check`` between pages or chapters; it waits while the
+    job is paused and raises ``ConversionCancelled`` once it is cancelled.
+    ``cancel``, ``pause`` and ``resume`` may be called from any thread.
+    """
+
+    def __init__(self):
+        self._cancelled = threading.Event()
+        self._running = threading.Event()
+        self._running.set()
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    @property
+    def paused(self):
+        return not self._running.is_set()
+
+    def cancel(self):
+        self._cancelled.set()
+        self._running.set()  # Wake a paused job so it can stop
+
+    def pause(self):
+        if not self.cancelled:
+            self._running.clear()
+
+    def resume(self):
+        self._running.set()
+
+    def check(self):
+        self._running.wait()
+        if self._cancelled.is_set():
+            raise ConversionCancelled('Conversion cancelled')
+
+
+def job_identity(file_path, params):
+    # What a checkpoint must match to be resumed: the same input file, unchanged, and the same settings.
+    # In-memory input has no file to stat, so it is identified by its content.
+    if is_stream(file_path):
+        return {'source': 'sha256:' + source_digest(file_path).hexdigest(), 'size': memoryview(file_path).nbytes,
+                **params}
+    st = os.stat(file_path)
+    return {'source': os.path.abspath(file_path), 'size': st.st_size, 'mtime_ns': st.st_mtime_ns, **params}
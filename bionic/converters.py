@@ -0,0 +1,45 @@
+import os
+
+from .sources import is_stream, looks_like_epub
+
+# Conversion modes, chosen per input file the same way the GUI does
+MODE_PDF = 'pdf'            # PDF -> bionic PDF
+MODE_EPUB = 'epub'          # EPUB -> bionic EPUB or PDF
+MODE_PDF_TO_EPUB = 'pdf2epub'  # PDF -> EPUB, one chapter per page (experimental)
+
+
+def default_output_dir(file_path):
+    # 'converted' folder next to the input file (in the working directory for in-memory input)
+    if is_stream(file_path):
+        return os.path.normpath(os.path.join(os.getcwd(), 'converted'))
+    return os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(file_path)), 'converted'))
+
+
+def choose_mode(file_path, pdf_to_epub=False):
+    # In-memory input has no extension: EPUBs are ZIP archives, everything else is taken for a PDF
+    if looks_like_epub(file_path) if is_stream(file_path) else file_path.lower().endswith('.epub'):
+        return MODE_EPUB
+    if pdf_to_epub:
+        return MODE_PDF_TO_EPUB
+    return MODE_PDF
+
+
+def make_converter(file_path, output_dir, mode=None, output_format='EPUB', **kwargs):
+    """Build the converter for ``file_path``.
+
+    Converter modules are imported on demand so callers only pay for the
+    libraries the chosen mode needs. Extra keyword arguments (callbacks,
+    ``bionic_reading``, ``input_name`` and ``output_stream`` for in-memory
+    input and streamed output) are passed through to the converter.
+    """
+    mode = mode or choose_mode(file_path)
+    if mode == MODE_PDF:
+        from .pdf_converter import PDFConverter
+        return PDFConverter(file_path, output_dir, **kwargs)
+    if mode == MODE_EPUB:
+        from .epub_converter import EpubConverter
+        return EpubConverter(file_path, output_dir, output_format=output_format, **kwargs)
+    if mode == MODE_PDF_TO_EPUB:
+        from .pdf_to_epub import PDFToEpubConverter
+        return PDFToEpubConverter(file_path, output_dir, **kwargs)
+    raise ValueError(f"Unknown conversion mode: {mode}")
@@ -0,0 +1,273 @@
+import io
+import os
+import posixpath
+import zipfile
+
+import fitz  # PyMuPDF
+
+from .cache import function_id
+from .control import ConversionCancelled, JobControl, job_identity
+from .epub_package import EpubPackage
+from .epub_writer import DEFAULT_COMPRESS_LEVEL, EpubWriter
+from .html_transform import transform_document
+from .metrics import ConversionMetrics
+from .page_ranges import parse_ranges
+from .pdf_output import PDFOutput
+from .reading import bionic_reading as default_bionic_reading
+from .sources import epub_file, is_stream, source_name
+
+
+# Same default as PDF -> PDF conversion
+DEFAULT_CHUNK_PAGES = 100
+
+
+def _noop(*args):
+    pass
+
+
+class EpubConverter:
+    """Apply bionic reading to an EPUB and save it as EPUB or PDF.
+
+    ``output_format`` is 'EPUB' or 'PDF'. PDF output is laid out with
+    PyMuPDF's Story engine so no GUI toolkit is needed, one chapter at a
+    time in reading order, starting each chapter on a new page. Finished
+    pages are written to disk at the first chapter end after every
+    ``chunk_pages`` pages; with ``checkpoint`` set each write is also a
+    checkpoint that a later run of the same job resumes from.
+
+    ``control`` (a ``bionic.control.JobControl``) pauses or cancels the
+    conversion between chapters. ``optimize`` applies a ``bionic.shrink``
+    preset to PDF output as it is finalized.
+
+    Stage timings (read, transform, layout, save) are passed to ``metrics``
+    when the conversion finishes; ``metrics_log`` names a JSON-lines file
+    for them.
+
+    ``chapters`` selects chapters by their position in reading order, e.g.
+    "3-5" (see ``bionic.page_ranges``). Only those are transformed and
+    written; EPUB output leaves the other chapters and their table of
+    contents entries out.
+
+    EPUB output is streamed from the source archive into the new one a
+    chapter at a time (see ``write_epub``), with text deflated at
+    ``compress_level``.
+
+    ``file_path`` may also be the EPUB itself in memory (bytes, bytearray,
+    memoryview or ``mmap.mmap``), named by ``input_name``. With an
+    ``output_stream`` the EPUB or PDF is written to that binary file
+    object instead of ``output_dir``, and ``run`` returns the stream; PDF
+    output is then kept in memory until the end, without checkpoints.
+    """
+
+    def __init__(self, file_path, output_dir, output_format='EPUB',
+                 bionic_reading=default_bionic_reading, progress=None, saving=None,
+                 chunk_pages=DEFAULT_CHUNK_PAGES, metrics=None, metrics_log=None, control=None,
+                 checkpoint=True, optimize=None, chapters=None, input_name=None, output_stream=None,
+                 compress_level=DEFAULT_COMPRESS_LEVEL):
+        self.file_path = file_path
+        self.input_name = source_name(file_path, input_name)
+        self.output_dir = output_dir
+        self.output_stream = output_stream
+        self.output_format = output_format  # 'EPUB' or 'PDF'
+        self.bionic_reading = bionic_reading
+        self.progress = progress or _noop
+        self.saving = saving or _noop
+        self.chunk_pages = chunk_pages
+        self.metrics = metrics or _noop
+        self.timings = ConversionMetrics(metrics_log, label=self.input_name)
+        self.control = control or JobControl()
+        self.checkpoint = checkpoint
+        self.optimize = optimize
+        self.chapters = chapters.strip() if chapters and chapters.strip() else None
+        self.compress_level = compress_level
+
+    def output_path(self):
+        base_name = os.path.splitext(self.input_name)[0]
+        extension = 'epub' if self.output_format == 'EPUB' else 'pdf'
+        return os.path.join(self.output_dir or '', f'{base_name}_bionic.{extension}')
+
+    def cache_params(self):
+        return {'mode': 'epub', 'format': self.output_format, 'bionic_reading': function_id(self.bionic_reading),
+                'optimize': self.optimize if self.output_format != 'EPUB' else None, 'chapters': self.chapters,
+                'compress_level': self.compress_level if self.output_format == 'EPUB' else None}
+
+    def checkpoint_id(self):
+        return job_identity(self.file_path, self.cache_params())
+
+    def selected_chapters(self, package):
+        # Archive names of the chapters to convert, in reading order (the navigation document is not one)
+        chapters = package.chapters()
+        if not self.chapters:
+            return chapters
+        selected = [chapters[n] for n in parse_ranges(self.chapters, len(chapters), 'chapters')]
+        print(f'Converting {len(selected)} of {len(chapters)} chapters ({self.chapters})')
+        return selected
+
+    def resource_archive(self, source):
+        # The book's zip itself, for the Story layout engine: MuPDF reads an image, stylesheet or font
+        # from it only when a chapter uses one. An EPUB given in memory is handed over as one buffer.
+        if is_stream(self.file_path):
+            return fitz.Archive(zipfile.ZipFile(io.BytesIO(bytes(self.file_path))))
+        return fitz.Archive(source)
+
+    def append_part(self, output, writer, buffer):
+        # Finish the pages laid out so far and hand them to the chunked output
+        writer.close()
+        part = fitz.open('pdf', buffer.getvalue())
+        try:
+            output.add_document(part)
+        finally:
+            part.close()
+
+    def finish_output(self, partial_path, out_path):
+        from .shrink import format_report, optimize_pdf
+        print(format_report(optimize_pdf(partial_path, out_path, self.optimize)))
+
+    def write_pdf(self, source, out_path):
+        """Lay out the chapters one at a time on A4 pages.
+
+        Only the container and package documents are parsed up front; each
+        chapter is read from ``source`` (the open ``zipfile.ZipFile``) when
+        it is laid out, and images, stylesheets and fonts are read from the
+        archive by the layout engine as chapters use them.
+
+        Chapters share one DocumentWriter per output chunk, so fonts are
+        embedded once per chunk rather than once per chapter. Once a chunk
+        has ``chunk_pages`` pages it is closed at the end of the chapter and
+        PDFOutput writes it to disk, so memory does not grow with the book
+        and every write ends on a chapter boundary a later run can resume
+        from.
+        """
+        with self.timings.stage('read'):
+            chapters = self.selected_chapters(EpubPackage(source))
+            archive = self.resource_archive(source)
+        mediabox = fitz.paper_rect('a4')
+        where = mediabox + (36, 36, -36, -36)
+        checkpoint = self.checkpoint and self.output_stream is None
+        output = PDFOutput(out_path, max_pages=self.chunk_pages,
+                           checkpoint=self.checkpoint_id() if checkpoint else None, stream=self.output_stream)
+        timings = self.timings
+        writer = buffer = None
+        chunk_page_count = 0
+        start = output.resume()
+        if start:
+            print(f'Resuming from chapter {start + 1} of {len(chapters)}')
+        try:
+            for n in range(start, len(chapters)):
+                self.control.check()
+                name = chapters[n]
+                with timings.stage('read'):
+                    content = source.read(name)
+                with timings.stage('transform'):
+                    html = transform_document(content, self.bionic_reading, resource_base=posixpath.dirname(name))
+                with timings.stage('layout'):
+                    story = fitz.Story(html=html.decode('utf-8'), archive=archive)
+                    more = 1
+                    while more:
+                        if writer is None:
+                            buffer = io.BytesIO()
+                            writer = fitz.DocumentWriter(buffer, 'compress')
+                            chunk_page_count = 0
+                        device = writer.begin_page(mediabox)
+                        more, _ = story.place(where)
+                        story.draw(device)
+                        writer.end_page()
+                        timings.pages += 1
+                        chunk_page_count += 1
+                output.position = n + 1
+                if self.chunk_pages and chunk_page_count >= self.chunk_pages:
+                    with timings.stage('save'):
+                        self.append_part(output, writer, buffer)
+                    writer = buffer = None
+                # Only report progress up to 99% during processing
+                self.progress(int((n + 1) / len(chapters) * 99))
+            self.saving()
+            with timings.stage('save'):
+                if writer is not None:
+                    self.append_part(output, writer, buffer)
+                    writer = None
+                out_path = output.close(finish=self.finish_output if self.optimize else None)
+        except ConversionCancelled:
+            # The open chunk holds whole chapters only (cancel is checked between them): keep it
+            if writer is not None:
+                self.append_part(output, writer, buffer)
+            output.suspend()
+            raise
+        except BaseException:
+            if writer is not None:
+                writer.close()
+            output.suspend(flush=False)
+            raise
+        return out_path
+
+    def write_epub(self, out_path):
+        """Copy the EPUB into a new archive entry by entry, styling the chapters on the way.
+
+        Only the container and package documents are parsed up front. Each
+        chapter is read, transformed and written before the next one, and
+        every other entry (images, stylesheets, fonts, the package files)
+        is copied as it is, so neither book is ever held in memory as a
+        whole. Unselected chapters are left out, and the package document,
+        navigation document and NCX are rewritten without them.
+        """
+        timings = self.timings
+        source = zipfile.ZipFile(epub_file(self.file_path))
+        try:
+            with timings.stage('read'):
+                package = EpubPackage(source)
+                documents = package.documents
+                dropped = set()
+                rewritten = {}
+                if self.chapters:
+                    chapters = package.chapters()
+                    documents = [chapters[n] for n in parse_ranges(self.chapters, len(chapters), 'chapters')]
+                    print(f'Converting {len(documents)} of {len(chapters)} chapters ({self.chapters})')
+                    dropped = set(chapters).difference(documents)
+                    rewritten = package.pruned_files(dropped)
+            if self.output_stream is not None:
+                writer = EpubWriter(stream=self.output_stream, compress_level=self.compress_level)
+            else:
+                writer = EpubWriter(out_path, compress_level=self.compress_level)
+            try:
+                pending = set(documents)
+                done = 0
+                for info in source.infolist():
+                    name = info.filename
+                    if name == 'mimetype' or name in dropped or info.is_dir():
+                        continue
+                    if name in pending:
+                        self.control.check()
+                        # One lxml pass per chapter styles every text node, including text around inline markup
+                        with timings.stage('transform'):
+                            data = transform_document(source.read(name), self.bionic_reading)
+                        with timings.stage('save'):
+                            writer.write(name, data)
+                        done += 1
+                        self.progress(int(done / len(documents) * 90))
+                        continue
+                    with timings.stage('save'):
+                        if name in rewritten:
+                            writer.write(name, rewritten[name])
+                        else:
+                            writer.write(name, source.read(name), package.media_types.get(name))
+                self.saving()
+                with timings.stage('save'):
+                    return writer.close(package=False)
+            except BaseException:
+                writer.abort()
+                raise
+        finally:
+            source.close()
+
+    def run(self):
+        timings = self.timings
+        out_path = self.output_path()
+        if self.output_stream is None:
+            os.makedirs(self.output_dir, exist_ok=True)
+        if self.output_format != 'EPUB':
+            with zipfile.ZipFile(epub_file(self.file_path)) as source:
+                out_path = self.write_pdf(source, out_path)
+        else:
+            out_path = self.write_epub(out_path)
+        self.metrics(timings.finish())
+        return out_path
@@ -0,0 +1,144 @@
+"""The package files of an EPUB archive, read without loading the book.
+
+``EpubPackage`` parses only ``META-INF/container.xml`` and the package
+document (the OPF): the manifest, the spine, and which items are the
+navigation document and the NCX. Everything else stays in the archive
+until it is needed, so EPUB -> EPUB conversion can read, style and write
+one chapter at a time (see ``bionic.epub_converter``).
+
+``pruned_files`` rewrites the package document, navigation document and
+NCX without a set of dropped chapters, for converting a chapter selection.
+Table of contents entries that point into a dropped chapter are removed,
+unless entries below them are kept: a navigation document entry then
+keeps its title without a link, an NCX entry points to its first kept
+child instead.
+"""
+import posixpath
+from urllib.parse import unquote
+
+from lxml import etree
+
+CONTAINER_PATH = 'META-INF/container.xml'
+XHTML_MEDIA_TYPE = 'application/xhtml+xml'
+NCX_MEDIA_TYPE = 'application/x-dtbncx+xml'
+
+CONTAINER_NS = '{urn:oasis:names:tc:opendocument:xmlns:container}'
+OPF_NS = '{http://www.idpf.org/2007/opf}'
+XHTML_NS = '{http://www.w3.org/1999/xhtml}'
+NCX_NS = '{http://www.daisy.org/z3986/2005/ncx/}'
+
+_xml_parser = etree.XMLParser(resolve_entities=False, huge_tree=True)
+
+
+def _target(base, href):
+    # Archive name a link points to, None for external links
+    path = unquote(href.split('#')[0])
+    if not path or ':' in path:
+        return None
+    return posixpath.normpath(posixpath.join(base, path))
+
+
+def _serialize(root):
+    # The whole document, so its DOCTYPE is kept
+    return etree.tostring(root.getroottree(), encoding='utf-8', xml_declaration=True)
+
+
+class EpubPackage:
+    """Manifest and spine of the EPUB in ``archive`` (an open ``zipfile.ZipFile``).
+
+    Items are identified by their name in the archive. ``media_types``
+    maps each manifest item to its media type.
+    """
+
+    def __init__(self, archive):
+        self.archive = archive
+        container = etree.fromstring(archive.read(CONTAINER_PATH), _xml_parser)
+        self.path = container.find(f'.//{CONTAINER_NS}rootfile').get('full-path')
+        self.base = posixpath.dirname(self.path)
+        self.tree = etree.fromstring(archive.read(self.path), _xml_parser)
+        self.ids = {}  # Manifest id -> archive name
+        self.media_types = {}
+        self.documents = []  # XHTML documents in manifest order
+        self.nav = self.ncx = None
+        for item in self.tree.iter(f'{OPF_NS}item'):
+            name = _target(self.base, item.get('href', ''))
+            if name is None:
+                continue
+            media_type = item.get('media-type')
+            self.ids[item.get('id')] = name
+            self.media_types[name] = media_type
+            if media_type == XHTML_MEDIA_TYPE:
+                self.documents.append(name)
+                if 'nav' in item.get('properties', '').split():
+                    self.nav = name
+            elif media_type == NCX_MEDIA_TYPE:
+                self.ncx = name
+
+    def reading_order(self):
+        # Documents in spine order; books without a usable spine fall back to manifest order
+        documents = set(self.documents)
+        order = [self.ids.get(ref.get('idref')) for ref in self.tree.iter(f'{OPF_NS}itemref')]
+        return [name for name in order if name in documents] or list(self.documents)
+
+    def chapters(self):
+        # Reading order without the navigation document, which is not counted as a chapter
+        return [name for name in self.reading_order() if name != self.nav]
+
+    def pruned_files(self, dropped):
+        """{archive name: new content} of the package files, without the ``dropped`` documents."""
+        files = {self.path: self._pruned_package(dropped)}
+        if self.nav and self.nav not in dropped:
+            files[self.nav] = self._pruned_nav(dropped)
+        if self.ncx:
+            files[self.ncx] = self._pruned_ncx(dropped)
+        return files
+
+    def _pruned_package(self, dropped):
+        tree = etree.fromstring(self.archive.read(self.path), _xml_parser)
+        dropped_ids = {item_id for item_id, name in self.ids.items() if name in dropped}
+        for item in list(tree.iter(f'{OPF_NS}item')):
+            if item.get('id') in dropped_ids:
+                item.getparent().remove(item)
+        for ref in list(tree.iter(f'{OPF_NS}itemref')):
+            if ref.get('idref') in dropped_ids:
+                ref.getparent().remove(ref)
+        for reference in list(tree.iter(f'{OPF_NS}reference')):
+            if _target(self.base, reference.get('href', '')) in dropped:
+                reference.getparent().remove(reference)
+        return _serialize(tree)
+
+    def _pruned_nav(self, dropped):
+        tree = etree.fromstring(self.archive.read(self.nav), _xml_parser)
+        base = posixpath.dirname(self.nav)
+
+        def kept(link):
+            return _target(base, link.get('href', '')) not in dropped
+
+        # Innermost entries first, so a parent sees what is left of its children
+        for entry in reversed(list(tree.iter(f'{XHTML_NS}li'))):
+            links = list(entry.iter(f'{XHTML_NS}a'))
+            if links and not any(kept(link) for link in links):
+                entry.getparent().remove(entry)
+                continue
+            own = entry.find(f'{XHTML_NS}a')
+            if own is not None and not kept(own):
+                own.tag = f'{XHTML_NS}span'
+                del own.attrib['href']
+        return _serialize(tree)
+
+    def _pruned_ncx(self, dropped):
+        tree = etree.fromstring(self.archive.read(self.ncx), _xml_parser)
+        base = posixpath.dirname(self.ncx)
+
+        def kept(content):
+            return _target(base, content.get('src', '')) not in dropped
+
+        for point in reversed(list(tree.iter(f'{NCX_NS}navPoint', f'{NCX_NS}pageTarget', f'{NCX_NS}navTarget'))):
+            contents = [content for content in point.iter(f'{NCX_NS}content') if kept(content)]
+            if not contents:
+                point.getparent().remove(point)
+                continue
+            own = point.find(f'{NCX_NS}content')
+            if own is not None and not kept(own):
+                own.set('src', contents[0].get('src'))
+        return _serialize(tree)
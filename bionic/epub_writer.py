@@ -0,0 +1,244 @@
+"""Streaming EPUB output.
+
+``EpubWriter`` writes an EPUB into its zip archive item by item while the
+converters produce them, so nothing is kept in memory once written. The
+``mimetype`` entry goes first and uncompressed, as the EPUB container
+format requires. Media in compressed formats (JPEG, PNG, GIF, WebP, WOFF
+fonts, audio and video) is stored as it is instead of being deflated
+again, unless a quick deflate of its first 64 KB shows it would shrink
+after all (a nearly blank scan, a PNG saved without compression); text
+(XHTML, CSS, XML, SVG, ...) is deflated at ``compress_level`` (zlib's
+0-9, 0 stores everything).
+
+A new book is built with ``add`` and ``add_chapter``, and ``close`` then
+writes the package document, the navigation document and the NCX for the
+items and chapters added. ``write`` puts an entry into the archive as it
+is; ``close(package=False)`` generates nothing, for archives that bring
+their own package files (see ``bionic.epub_converter``).
+
+The file is written as ``<out_path>.partial`` and renamed when complete;
+``abort`` removes it. With a ``stream`` the archive is written to that
+binary file object instead. zipfile handles streams that cannot seek (a
+pipe) by giving each entry a data descriptor after its data; the
+``mimetype`` entry is written here first so that it has its CRC and size
+in its local header, where readers that sniff the container expect them.
+"""
+import os
+import posixpath
+import time
+import zipfile
+import zlib
+from xml.sax.saxutils import escape, quoteattr
+
+from lxml import etree, html as lxml_html
+
+MIMETYPE = b'application/epub+zip'
+XHTML_MEDIA_TYPE = 'application/xhtml+xml'
+NCX_MEDIA_TYPE = 'application/x-dtbncx+xml'
+CONTENT_DIR = 'EPUB'  # Where added items go in the archive, next to the package document
+
+DEFAULT_COMPRESS_LEVEL = 6
+
+# Formats with their own compression: deflating them again costs time and saves next to nothing
+COMPRESSED_EXTENSIONS = frozenset(['.jpg', '.jpeg', '.png', '.gif', '.webp', '.woff', '.woff2',
+                                   '.mp3', '.m4a', '.aac', '.ogg', '.opus', '.mp4', '.m4v', '.webm'])
+COMPRESSED_MEDIA_TYPES = frozenset(['image/jpeg', 'image/png', 'image/gif', 'image/webp',
+                                    'font/woff', 'font/woff2', 'application/font-woff'])
+
+# Compressed-format media is deflated anyway if a level 1 deflate of its first PROBE_BYTES saves over 10%
+PROBE_BYTES = 65536
+PROBE_RATIO = 0.9
+
+CONTAINER_XML = '''<?xml version="1.0" encoding="UTF-8"?>
+<container version="1.0" xmlns="urn:oasis:names:tc:opendocument:xmlns:container">
+  <rootfiles>
+    <rootfile full-path="{path}" media-type="application/oebps-package+xml"/>
+  </rootfiles>
+</container>
+'''
+
+XHTML_DOCUMENT = '''<?xml version='1.0' encoding='utf-8'?>
+<!DOCTYPE html>
+<html xmlns="http://www.w3.org/1999/xhtml" xmlns:epub="http://www.idpf.org/2007/ops" lang={lang} xml:lang={lang}>
+<head>
+<title>{title}</title>
+</head>
+{body}
+</html>
+'''
+
+
+def is_compressed_media(name, media_type=None):
+    # By media type where the manifest gives one, else by file extension
+    if media_type and (media_type in COMPRESSED_MEDIA_TYPES or media_type.startswith(('audio/', 'video/'))):
+        return True
+    return os.path.splitext(name)[1].lower() in COMPRESSED_EXTENSIONS
+
+
+def is_seekable(stream):
+    try:
+        return stream.seekable()
+    except (AttributeError, OSError):
+        return False
+
+
+class CountingStream:
+    """An unseekable stream that knows how much has been written to it, for zipfile's offsets."""
+
+    def __init__(self, stream, offset=0):
+        self.stream = stream
+        self.offset = offset
+
+    def write(self, data):
+        n = self.stream.write(data)
+        self.offset += n
+        return n
+
+    def tell(self):
+        return self.offset
+
+    def flush(self):
+        self.stream.flush()
+
+
+def worth_deflating(data):
+    sample = data[:PROBE_BYTES]
+    return len(zlib.compress(sample, 1)) < len(sample) * PROBE_RATIO
+
+
+def xhtml_document(title, body_html, lang='en'):
+    """A chapter as XHTML bytes around an HTML ``body_html`` fragment.
+
+    The fragment is parsed leniently as HTML (``<br>``, bare ``&``) and
+    serialized as XML, as ebooklib does for chapters set from HTML.
+    """
+    body = lxml_html.fragment_fromstring(body_html, create_parent='body')
+    return XHTML_DOCUMENT.format(lang=quoteattr(lang), title=escape(title),
+                                 body=etree.tostring(body, encoding='unicode', method='xml')).encode('utf-8')
+
+
+class EpubWriter:
+    """An EPUB archive that items are written into as they are produced."""
+
+    def __init__(self, out_path=None, stream=None, compress_level=DEFAULT_COMPRESS_LEVEL):
+        self.out_path = out_path
+        self.stream = stream
+        self.compress_level = compress_level
+        self.partial_path = out_path + '.partial' if stream is None else None
+        self.items = []  # (item id, file name, media type, properties) for the manifest
+        self.chapters = []  # (item id, file name, title) in reading order
+        self.date_time = time.localtime()[:6]
+        if stream is not None and not is_seekable(stream):
+            # The mimetype entry is constant, so its CRC and size go in its local header up front
+            info = self.entry_info('mimetype')
+            info.CRC = zlib.crc32(MIMETYPE)
+            info.file_size = info.compress_size = len(MIMETYPE)
+            info.header_offset = 0
+            header = info.FileHeader(False)
+            stream.write(header + MIMETYPE)
+            self.zip = zipfile.ZipFile(CountingStream(stream, len(header) + len(MIMETYPE)), 'w')
+            self.zip.filelist.append(info)
+            self.zip.NameToInfo[info.filename] = info
+        else:
+            self.zip = zipfile.ZipFile(self.stream if stream is not None else self.partial_path, 'w')
+            self.write('mimetype', MIMETYPE, compress=False)
+
+    def entry_info(self, name):
+        info = zipfile.ZipInfo(name, self.date_time)
+        info.external_attr = 0o644 << 16
+        return info
+
+    def write(self, name, data, media_type=None, compress=None):
+        """Write ``data`` as archive entry ``name``.
+
+        ``compress`` None stores media in a compressed format (by
+        ``media_type`` or file extension) unless it is ``worth_deflating``,
+        and deflates everything else.
+        """
+        if compress is None:
+            compress = not is_compressed_media(name, media_type) or worth_deflating(data)
+        info = self.entry_info(name)
+        if compress and self.compress_level:
+            info.compress_type = zipfile.ZIP_DEFLATED
+            self.zip.writestr(info, data, compresslevel=self.compress_level)
+        else:
+            self.zip.writestr(info, data)
+
+    def add(self, file_name, data, media_type, item_id=None, properties=None):
+        """Write an item of the book (``file_name`` relative to the package document); returns its id."""
+        item_id = item_id or f'item_{len(self.items) + 1}'
+        self.write(posixpath.join(CONTENT_DIR, file_name), data, media_type)
+        self.items.append((item_id, file_name, media_type, properties))
+        return item_id
+
+    def add_chapter(self, file_name, title, body_html, lang='en'):
+        """Write a chapter from an HTML body fragment and add it to the spine and table of contents."""
+        item_id = self.add(file_name, xhtml_document(title, body_html, lang), XHTML_MEDIA_TYPE,
+                           f'chapter_{len(self.chapters) + 1}')
+        self.chapters.append((item_id, file_name, title))
+
+    def write_package(self, title, identifier, language):
+        # Navigation document, NCX, package document and container for the items added so far
+        links = ''.join(f'<li><a href={quoteattr(file_name)}>{escape(chapter_title)}</a></li>\n'
+                        for _, file_name, chapter_title in self.chapters)
+        nav_body = (f'<body><nav epub:type="toc" id="toc" role="doc-toc"><h2>{escape(title)}</h2>'
+                    f'<ol>\n{links}</ol></nav></body>')
+        self.add('nav.xhtml', XHTML_DOCUMENT.format(lang=quoteattr(language), title=escape(title),
+                                                    body=nav_body).encode('utf-8'),
+                 XHTML_MEDIA_TYPE, 'nav', 'nav')
+
+        nav_points = ''.join(
+            f'<navPoint id="navpoint_{n}" playOrder="{n}"><navLabel><text>{escape(chapter_title)}</text>'
+            f'</navLabel><content src={quoteattr(file_name)}/></navPoint>\n'
+            for n, (_, file_name, chapter_title) in enumerate(self.chapters, 1))
+        self.add('toc.ncx', (
+            "<?xml version='1.0' encoding='utf-8'?>\n"
+            '<ncx xmlns="http://www.daisy.org/z3986/2005/ncx/" version="2005-1">\n'
+            f'<head><meta name="dtb:uid" content={quoteattr(identifier)}/><meta name="dtb:depth" content="1"/>'
+            '<meta name="dtb:totalPageCount" content="0"/><meta name="dtb:maxPageNumber" content="0"/></head>\n'
+            f'<docTitle><text>{escape(title)}</text></docTitle>\n'
+            f'<navMap>\n{nav_points}</navMap>\n</ncx>\n').encode('utf-8'), NCX_MEDIA_TYPE, 'ncx')
+
+        manifest = ''.join(
+            f'<item id={quoteattr(item_id)} href={quoteattr(file_name)} media-type={quoteattr(media_type)}'
+            + (f' properties={quoteattr(properties)}' if properties else '') + '/>\n'
+            for item_id, file_name, media_type, properties in self.items)
+        spine = ''.join(f'<itemref idref={quoteattr(item_id)}/>\n' for item_id in
+                        ['nav'] + [item_id for item_id, _, _ in self.chapters])
+        modified = time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+        package_path = posixpath.join(CONTENT_DIR, 'content.opf')
+        self.write(package_path, (
+            "<?xml version='1.0' encoding='utf-8'?>\n"
+            '<package xmlns="http://www.idpf.org/2007/opf" unique-identifier="id" version="3.0">\n'
+            '<metadata xmlns:dc="http://purl.org/dc/elements/1.1/">\n'
+            f'<dc:identifier id="id">{escape(identifier)}</dc:identifier>\n'
+            f'<dc:title>{escape(title)}</dc:title>\n'
+            f'<dc:language>{escape(language)}</dc:language>\n'
+            f'<meta property="dcterms:modified">{modified}</meta>\n'
+            f'</metadata>\n<manifest>\n{manifest}</manifest>\n'
+            f'<spine toc="ncx">\n{spine}</spine>\n</package>\n').encode('utf-8'))
+        self.write('META-INF/container.xml', CONTAINER_XML.format(path=package_path).encode('utf-8'))
+
+    def close(self, title='', identifier='', language='en', package=True):
+        """Finish the archive and return the output path (or the stream).
+
+        With ``package`` the package files for the items added are written
+        first, with the book's ``title``, ``identifier`` and ``language``.
+        """
+        if package:
+            self.write_package(title, identifier, language)
+        self.zip.close()
+        if self.stream is not None:
+            self.stream.flush()
+            return self.stream
+        os.replace(self.partial_path, self.out_path)
+        return self.out_path
+
+    def abort(self):
+        # Give up on a failed or cancelled conversion: nothing is left behind on disk
+        try:
+            self.zip.close()
+        except Exception:
+            pass
+        if self.partial_path and os.path.exists(self.partial_path):
+            os.remove(self.partial_path)
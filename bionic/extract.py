@@ -0,0 +1,208 @@
+"""Text lines of a PDF page as compact records.
+
+``page.get_text('dict')`` returns a nested tree of dicts with a dozen
+keys per span and, by default, a copy of every image on the page. The
+converters only need each line's box, text and the font of its first
+visible span (plus the spans themselves for the glyph writer), so
+``extract_lines`` reads the page through one ``TextPage`` made without
+image payloads and keeps ``__slots__`` records with exactly that. Each
+line's bounding box and text are built in the same pass over its spans.
+
+``extract_columns`` is the columnar variant used by the HTML render mode:
+one pass copies each span's box, size, flags and baseline into flat
+lists, and NumPy reductions over them give every line its box, dominant
+font size (that of the span with the most characters) and baseline, and
+the right edge of its block, i.e. of the column the line sits in.
+"""
+import fitz  # PyMuPDF
+import numpy as np
+
+# The flags get_text('dict') uses, without TEXT_PRESERVE_IMAGES: image blocks and their data are skipped
+TEXT_FLAGS = fitz.TEXTFLAGS_DICT & ~fitz.TEXT_PRESERVE_IMAGES
+
+
+class TextSpan:
+    """One run of text in a single font: what the glyph writer places."""
+
+    __slots__ = ('text', 'size', 'font', 'flags', 'color', 'origin', 'x0', 'x1')
+
+    def __init__(self, text, size, font, flags, color, origin, x0, x1):
+        self.text = text
+        self.size = size
+        self.font = font
+        self.flags = flags
+        self.color = color
+        self.origin = origin
+        self.x0 = x0
+        self.x1 = x1
+
+
+class TextLine:
+    """A line's bounding box and text, and the size, font and flags of its first visible span.
+
+    ``font`` is None when no span has visible text. ``spans`` holds
+    ``TextSpan`` records when extracted with ``spans=True``, else None.
+    """
+
+    __slots__ = ('x0', 'y0', 'x1', 'y1', 'text', 'size', 'font', 'flags', 'spans')
+
+    def __init__(self, x0, y0, x1, y1, text, size, font, flags, spans):
+        self.x0 = x0
+        self.y0 = y0
+        self.x1 = x1
+        self.y1 = y1
+        self.text = text
+        self.size = size
+        self.font = font
+        self.flags = flags
+        self.spans = spans
+
+    @property
+    def rect(self):
+        return fitz.Rect(self.x0, self.y0, self.x1, self.y1)
+
+
+def extract_lines(page, textpage=None, spans=False):
+    """The ``TextLine`` records of ``page`` in reading order; lines without spans are left out.
+
+    Pass a ``textpage`` made with ``TEXT_FLAGS`` to reuse one the caller
+    already has.
+    """
+    if textpage is None:
+        textpage = page.get_textpage(flags=TEXT_FLAGS)
+    lines = []
+    for block in textpage.extractDICT()['blocks']:
+        if block['type'] != 0:
+            continue
+        for line in block['lines']:
+            line_spans = line['spans']
+            if not line_spans:
+                continue
+            x0 = y0 = float('inf')
+            x1 = y1 = float('-inf')
+            texts = []
+            first = None
+            records = [] if spans else None
+            for span in line_spans:
+                sx0, sy0, sx1, sy1 = span['bbox']
+                if sx0 < x0:
+                    x0 = sx0
+                if sy0 < y0:
+                    y0 = sy0
+                if sx1 > x1:
+                    x1 = sx1
+                if sy1 > y1:
+                    y1 = sy1
+                text = span['text']
+                texts.append(text)
+                if first is None and text.strip():
+                    first = span
+                if spans:
+                    records.append(TextSpan(text, span['size'], span['font'], span['flags'], span['color'],
+                                            span['origin'], sx0, sx1))
+            if first is None:
+                lines.append(TextLine(x0, y0, x1, y1, ''.join(texts), line_spans[0]['size'], None, 0, records))
+            else:
+                lines.append(TextLine(x0, y0, x1, y1, ''.join(texts), first['size'], first['font'], first['flags'],
+                                      records))
+    return lines
+
+
+class PageLines:
+    """The text lines of a page as columns: NumPy arrays of geometry plus lists of strings.
+
+    ``x0``, ``y0``, ``x1``, ``y1`` are the line boxes; ``size`` and
+    ``baseline`` the font size and origin y of each line's dominant span;
+    ``column_x1`` the right edge of the line's block. ``flags`` and ``font``
+    come from the first visible span (``font`` is None for lines without
+    visible text), as in ``TextLine``; ``text`` holds the line strings.
+    """
+
+    __slots__ = ('x0', 'y0', 'x1', 'y1', 'size', 'baseline', 'column_x1', 'flags', 'font', 'text')
+
+    def __init__(self, x0, y0, x1, y1, size, baseline, column_x1, flags, font, text):
+        self.x0 = x0
+        self.y0 = y0
+        self.x1 = x1
+        self.y1 = y1
+        self.size = size
+        self.baseline = baseline
+        self.column_x1 = column_x1
+        self.flags = flags
+        self.font = font
+        self.text = text
+
+    def __len__(self):
+        return len(self.text)
+
+    def rect(self, n):
+        return fitz.Rect(float(self.x0[n]), float(self.y0[n]), float(self.x1[n]), float(self.y1[n]))
+
+
+def _group_sizes(starts, total):
+    # Lengths of the consecutive groups beginning at starts
+    return np.diff(np.append(starts, total))
+
+
+def extract_columns(page, textpage=None):
+    """The lines of ``page`` in reading order as ``PageLines``; lines without spans are left out."""
+    if textpage is None:
+        textpage = page.get_textpage(flags=TEXT_FLAGS)
+    boxes = []
+    sizes = []
+    flags = []
+    baselines = []
+    visible = []  # Characters other than surrounding whitespace, per span
+    texts = []
+    fonts = []
+    line_starts = []
+    line_blocks = []
+    for number, block in enumerate(textpage.extractDICT()['blocks']):
+        if block['type'] != 0:
+            continue
+        for line in block['lines']:
+            if not line['spans']:
+                continue
+            line_starts.append(len(texts))
+            line_blocks.append(number)
+            for span in line['spans']:
+                boxes.append(span['bbox'])
+                sizes.append(span['size'])
+                flags.append(span['flags'])
+                baselines.append(span['origin'][1])
+                text = span['text']
+                texts.append(text)
+                fonts.append(span['font'])
+                visible.append(len(text.strip()))
+    if not line_starts:
+        empty = np.zeros(0)
+        return PageLines(empty, empty, empty, empty, empty, empty, empty, np.zeros(0, dtype=int), [], [])
+
+    span_count = len(texts)
+    starts = np.array(line_starts)
+    line_spans = _group_sizes(starts, span_count)
+    boxes = np.array(boxes, dtype=float)
+    x0 = np.minimum.reduceat(boxes[:, 0], starts)
+    y0 = np.minimum.reduceat(boxes[:, 1], starts)
+    x1 = np.maximum.reduceat(boxes[:, 2], starts)
+    y1 = np.maximum.reduceat(boxes[:, 3], starts)
+
+    # Dominant span: the first with the most visible characters; first visible span: the first with any
+    index = np.arange(span_count)
+    visible = np.array(visible)
+    most = np.repeat(np.maximum.reduceat(visible, starts), line_spans)
+    dominant = np.minimum.reduceat(np.where(visible == most, index, span_count), starts)
+    first_visible = np.minimum.reduceat(np.where(visible > 0, index, span_count), starts)
+    has_visible = first_visible < span_count
+    first = np.where(has_visible, first_visible, starts)
+
+    # Blocks are consecutive runs of lines; the widest line of a block marks its column's right edge
+    line_blocks = np.array(line_blocks)
+    block_starts = np.flatnonzero(np.diff(line_blocks, prepend=-1))
+    column_x1 = np.repeat(np.maximum.reduceat(x1, block_starts), _group_sizes(block_starts, len(line_blocks)))
+
+    ends = np.append(starts[1:], span_count).tolist()
+    line_texts = [''.join(texts[start:end]) for start, end in zip(line_starts, ends)]
+    line_fonts = [fonts[n] if shown else None for n, shown in zip(first.tolist(), has_visible.tolist())]
+    return PageLines(x0, y0, x1, y1, np.array(sizes, dtype=float)[dominant], np.array(baselines, dtype=float)[dominant],
+                     column_x1, np.array(flags)[first], line_fonts, line_texts)
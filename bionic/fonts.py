@@ -0,0 +1,217 @@
+"""Embedded fonts shared by every page of an output document.
+
+The HTML render mode used to lay out each line with insert_htmlbox, which
+embeds its fonts again for every line. ``FontRegistry`` instead loads one
+regular and one bold face per family and every page refers to the same
+embedded copy: MuPDF keeps a single font object per document for a given
+font program, so ``page.insert_font`` with the registry's buffer reuses it.
+
+Output written in chunks (``bionic.pdf_output.PDFOutput``) or merged from
+worker processes gets one copy per chunk or part; ``share_fonts`` points
+the later pages at the first copy and drops the rest.
+
+With ``match_fonts`` each line is written in the substitute family
+(serif, sans or monospace) closest to its source font; otherwise all text
+uses the serif faces, like the HTML engine's default font.
+"""
+import hashlib
+import re
+
+import fitz  # PyMuPDF
+
+FAMILY_SERIF = 'serif'
+FAMILY_SANS = 'sans'
+FAMILY_MONO = 'mono'
+
+# (regular, bold) built-in MuPDF faces per family. They cover Latin, Greek
+# and Cyrillic; lines with other characters are left to the HTML engine.
+FAMILY_FACES = {
+    FAMILY_SERIF: ('tiro', 'tibo'),
+    FAMILY_SANS: ('helv', 'hebo'),
+    FAMILY_MONO: ('cour', 'cobo'),
+}
+DEFAULT_FAMILY = FAMILY_SERIF
+
+# Encoded runs kept per registry before the cache starts over
+ENCODE_CACHE_SIZE = 65536
+
+# Span flags from get_text('dict')
+_FLAG_SERIF = 4
+_FLAG_MONO = 8
+
+_MONO_NAMES = ('mono', 'courier', 'consol', 'menlo', 'typewriter', 'code')
+_SANS_NAMES = ('sans', 'arial', 'helvetica', 'verdana', 'calibri', 'segoe', 'tahoma', 'gothic', 'grotesk')
+_SERIF_NAMES = ('serif', 'times', 'roman', 'georgia', 'garamond', 'cambria', 'book', 'minion', 'palatino')
+
+_REF_RE = re.compile(r'(\d+) 0 R')
+_FONT_ENTRY_RE = re.compile(r'/([^\s/<>\[\]()]+)\s*(\d+) 0 R')
+
+_fonts = {}
+_base_font_names = None
+
+
+def get_font(code):
+    font = _fonts.get(code)
+    if font is None:
+        font = _fonts[code] = fitz.Font(code)
+    return font
+
+
+def font_family(font, flags=0):
+    """The substitute family for a source font: by its name, else by the span flags."""
+    name = (font or '').lower()
+    if any(part in name for part in _MONO_NAMES):
+        return FAMILY_MONO
+    if any(part in name for part in _SANS_NAMES):
+        return FAMILY_SANS
+    if any(part in name for part in _SERIF_NAMES):
+        return FAMILY_SERIF
+    if flags & _FLAG_MONO:
+        return FAMILY_MONO
+    return FAMILY_SERIF if flags & _FLAG_SERIF else FAMILY_SANS
+
+
+class FontRegistry:
+    """The embedded faces used for bionic text, with cached glyph lookups."""
+
+    def __init__(self, match_fonts=False):
+        self.match_fonts = match_fonts
+        self._glyphs = {}  # (face, char) -> (glyph id, advance at 1pt)
+        self._encoded = {}  # (face, text) -> result of encode; runs repeat as often as words do
+        self._coverage = {}  # family -> set of characters both faces can show
+
+    def family(self, font, flags=0):
+        # The family for a line whose first visible span has this font and flags (font None: no visible text)
+        if not self.match_fonts or font is None:
+            return DEFAULT_FAMILY
+        return font_family(font, flags)
+
+    def face(self, family, bold):
+        return FAMILY_FACES[family][1 if bold else 0]
+
+    def resource_name(self, face):
+        # Page resource name of an embedded face; fixed, so content streams can be built before insertion
+        return f'B{face}'
+
+    def covers(self, family, text):
+        coverage = self._coverage.get(family)
+        if coverage is None:
+            regular, bold = (get_font(face) for face in FAMILY_FACES[family])
+            coverage = self._coverage[family] = {
+                chr(cp) for cp in regular.valid_codepoints() if bold.has_glyph(cp)}
+        return all(char in coverage for char in text)
+
+    def glyph(self, face, char):
+        """(glyph id, advance at 1pt) of ``char`` in ``face``."""
+        key = (face, char)
+        glyph = self._glyphs.get(key)
+        if glyph is None:
+            font = get_font(face)
+            glyph = self._glyphs[key] = (font.has_glyph(ord(char)), font.glyph_advance(ord(char)))
+        return glyph
+
+    def encode(self, face, text):
+        # (hex glyph ids for an Identity-H Tj operand, advance width at 1pt)
+        key = (face, text)
+        encoded = self._encoded.get(key)
+        if encoded is not None:
+            return encoded
+        hex_ids = []
+        width = 0.0
+        for char in text:
+            gid, advance = self.glyph(face, char)
+            hex_ids.append('%04x' % gid)
+            width += advance
+        if len(self._encoded) >= ENCODE_CACHE_SIZE:
+            self._encoded.clear()
+        encoded = self._encoded[key] = (''.join(hex_ids), width)
+        return encoded
+
+    def embed(self, page, faces):
+        # The first page of a document embeds each face; later pages get a reference to the same object
+        for face in faces:
+            page.insert_font(fontname=self.resource_name(face), fontbuffer=get_font(face).buffer)
+
+
+def _shared_font_names():
+    # The BaseFont names MuPDF gives the registry faces, found by embedding each one in a scratch document
+    global _base_font_names
+    if _base_font_names is None:
+        names = set()
+        with fitz.open() as doc:
+            page = doc.new_page()
+            for faces in FAMILY_FACES.values():
+                for face in faces:
+                    xref = page.insert_font(fontname=f'B{face}', fontbuffer=get_font(face).buffer)
+                    names.add(doc.xref_get_key(xref, 'BaseFont')[1])
+        _base_font_names = names
+    return _base_font_names
+
+
+def _object_digest(doc, xref, digest, members):
+    # Hash an object and everything it references, ignoring object numbers; collects their xrefs in members.
+    # With digest None only the xrefs are collected.
+    members.add(xref)
+    source = doc.xref_object(xref, compressed=True)
+    if digest is not None:
+        digest.update(_REF_RE.sub('R', source).encode('utf-8'))
+        if doc.xref_is_stream(xref):
+            digest.update(doc.xref_stream_raw(xref) or b'')
+    for ref in _REF_RE.findall(source):
+        ref = int(ref)
+        if ref not in members:
+            _object_digest(doc, ref, digest, members)
+
+
+def share_fonts(doc, shared, first_page=0):
+    """Make pages ``first_page`` onwards use one copy of each registry font.
+
+    ``shared`` maps a font's content digest to the xref of the copy kept in
+    ``doc``; pass the same dict for every call on one document. Pages that
+    refer to another identical copy are pointed at the kept one, and the
+    objects of the duplicate are deleted. Returns the number of duplicates
+    removed.
+    """
+    names = _shared_font_names()
+    digests = {}  # xref -> digest, or None for fonts that are not shared
+    duplicates = {}  # duplicate xref -> its objects
+    for page_number in range(first_page, doc.page_count):
+        page_xref = doc.page_xref(page_number)
+        kind, value = doc.xref_get_key(page_xref, 'Resources/Font')
+        if kind == 'xref':
+            holder, prefix = int(value.split()[0]), ''
+            value = doc.xref_object(holder, compressed=True)
+        elif kind == 'dict':
+            kind, resources = doc.xref_get_key(page_xref, 'Resources')
+            if kind == 'xref':
+                holder, prefix = int(resources.split()[0]), 'Font/'
+            else:
+                holder, prefix = page_xref, 'Resources/Font/'
+        else:
+            continue
+        for name, xref in _FONT_ENTRY_RE.findall(value):
+            xref = int(xref)
+            if xref not in digests:
+                digests[xref] = None
+                if doc.xref_get_key(xref, 'Subtype')[1] == '/Type0' and \
+                        doc.xref_get_key(xref, 'BaseFont')[1] in names:
+                    digest = hashlib.sha1()
+                    members = set()
+                    _object_digest(doc, xref, digest, members)
+                    key = digest.hexdigest()
+                    digests[xref] = key
+                    if key not in shared:
+                        shared[key] = xref
+                    elif shared[key] != xref:
+                        duplicates[xref] = members
+            key = digests[xref]
+            if key is not None and shared[key] != xref:
+                doc.xref_set_key(holder, prefix + name, f'{shared[key]} 0 R')
+    kept = set()
+    if duplicates:
+        for xref in set(shared.values()):
+            _object_digest(doc, xref, None, kept)
+    for xref, members in duplicates.items():
+        for member in members - kept:
+            doc.update_object(member, 'null')  # Frees the object
+    return len(duplicates)
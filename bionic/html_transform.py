@@ -0,0 +1,236 @@
+"""Apply bionic reading to a whole (X)HTML document in one pass.
+
+The document is parsed once with lxml and every text node in the body is
+rewritten in place: the node keeps its leading plain text and the bold
+halves become new ``<b>`` elements carrying the plain text that follows
+them as their tail. Text mixed with inline markup (``tail text`` after an
+``<i>``) is styled too, and nothing is serialized and parsed again.
+"""
+import posixpath
+import re
+
+from lxml import etree, html as lxml_html
+
+from .reading import bionic_reading as default_bionic_reading, token_segments
+
+# Elements whose text is code, markup or otherwise not prose
+SKIP_TAGS = frozenset(['head', 'script', 'style', 'pre', 'code', 'kbd', 'samp', 'var',
+                       'math', 'svg', 'textarea', 'rt', 'rp'])
+
+XHTML_NAMESPACE = 'http://www.w3.org/1999/xhtml'
+XML_NAMESPACE = 'http://www.w3.org/XML/1998/namespace'
+
+# Prefixes EPUB content uses, for documents that use them without declaring them
+KNOWN_NAMESPACES = {'epub': 'http://www.idpf.org/2007/ops', 'svg': 'http://www.w3.org/2000/svg',
+                    'xlink': 'http://www.w3.org/1999/xlink', 'm': 'http://www.w3.org/1998/Math/MathML'}
+
+# Characters HTML tolerates but XML 1.0 does not allow
+_NOT_XML = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f\ufffe\uffff]')
+
+_xml_parser = etree.XMLParser(resolve_entities=False, huge_tree=True)
+
+
+def _local_name(tag):
+    return tag.rsplit('}', 1)[-1].lower()
+
+
+def _namespace(tag):
+    return tag[:tag.index('}') + 1] if tag.startswith('{') else ''
+
+
+class _Styler:
+    """Styles one text string by appending ``<b>`` elements to a parent.
+
+    Returns the plain text that goes before the first appended element.
+    """
+
+    def __init__(self, bionic_reading, namespace):
+        self.bionic_reading = bionic_reading
+        self.bold_tag = etree.QName(namespace[1:-1] or None, 'b')
+        self.namespace = namespace
+
+    def __call__(self, parent, text):
+        if self.bionic_reading is default_bionic_reading:
+            return self.append_segments(parent, text)
+        return self.append_markup(parent, text)
+
+    def append_segments(self, parent, text):
+        # Same runs as reading.bionic_segments, built straight into elements;
+        # plain runs are collected and become the text or tail around each <b>
+        sub_element = etree.SubElement
+        bold_tag = self.bold_tag
+        lead = None
+        node = None
+        plain = []
+        for n, token in enumerate(text.split(' ')):
+            if n:
+                plain.append(' ')
+            for run, bold in token_segments(token):
+                if not bold:
+                    plain.append(run)
+                    continue
+                if node is None:
+                    lead = ''.join(plain)
+                elif plain:
+                    node.tail = ''.join(plain)
+                plain = []
+                node = sub_element(parent, bold_tag)
+                node.text = run
+        if node is None:
+            return ''.join(plain)
+        if plain:
+            node.tail = ''.join(plain)
+        return lead
+
+    def append_markup(self, parent, text):
+        # A custom styling function returns HTML, so its result has to be parsed
+        fragment = lxml_html.fragment_fromstring(self.bionic_reading(text), create_parent='div')
+        if self.namespace:
+            for node in fragment.iterdescendants():
+                if isinstance(node.tag, str):
+                    node.tag = self.namespace + node.tag
+        for node in list(fragment):
+            parent.append(node)
+        return fragment.text or ''
+
+
+def _xml_text(text):
+    return _NOT_XML.sub('', text) if text else text
+
+
+def _append_text(element, text):
+    # Add text after the last child of ``element`` (or as its text when it has none)
+    if not text:
+        return
+    if len(element):
+        element[-1].tail = (element[-1].tail or '') + text
+    else:
+        element.text = (element.text or '') + text
+
+
+def _xhtml_tree(html_root):
+    """Rebuild an HTML-parsed document as XHTML elements.
+
+    The HTML parser keeps ``xmlns`` declarations as plain attributes and
+    names like ``epub:type`` unsplit, so elements are moved into the XHTML
+    namespace (or the one an ``xmlns`` attribute gives, as for inline SVG)
+    and prefixes are resolved against the declarations in the document.
+    """
+    namespaces = dict(KNOWN_NAMESPACES)
+    used = set()
+    for element in html_root.iter():
+        if not isinstance(element.tag, str):
+            continue
+        for name, value in element.attrib.items():
+            if name.startswith('xmlns:') and name[6:] != 'xml':
+                namespaces.setdefault(name[6:], value)
+        used.update(name.split(':', 1)[0] for name in [element.tag] + list(element.attrib) if ':' in name)
+
+    def qualified(name, default):
+        prefix, _, local = name.rpartition(':')
+        if prefix == 'xml':
+            return f'{{{XML_NAMESPACE}}}{local}'
+        if prefix in namespaces:
+            return f'{{{namespaces[prefix]}}}{local}'
+        return f'{{{default}}}{local}' if default else local
+
+    def copy_attributes(source, target):
+        for name, value in source.attrib.items():
+            if name != 'xmlns' and not name.startswith('xmlns:'):
+                target.set(qualified(name, None), _xml_text(value))
+
+    nsmap = {None: XHTML_NAMESPACE}
+    nsmap.update((prefix, namespaces[prefix]) for prefix in used if prefix in namespaces)
+    default = html_root.get('xmlns', XHTML_NAMESPACE)
+    root = etree.Element(qualified(html_root.tag, default), nsmap=nsmap)
+    copy_attributes(html_root, root)
+    stack = [(html_root, root, default)]
+    while stack:
+        source, target, default = stack.pop()
+        target.text = _xml_text(source.text)
+        for child in source:
+            if isinstance(child.tag, str):
+                child_default = child.get('xmlns', default)
+                node = etree.SubElement(target, qualified(child.tag, child_default))
+                copy_attributes(child, node)
+                stack.append((child, node, child_default))
+            elif child.tag is etree.Comment and '--' not in child.text and not child.text.endswith('-'):
+                target.append(etree.Comment(_xml_text(child.text)))
+            # Comments XML cannot hold and processing instructions are dropped; their tails are kept
+            _append_text(target, _xml_text(child.tail))
+    return etree.ElementTree(root)
+
+
+def _needs_styling(text):
+    return bool(text) and not text.isspace()
+
+
+def _is_relative_url(url):
+    return bool(url) and ':' not in url.split('/', 1)[0] and not url.startswith(('/', '#'))
+
+
+def _rebase_image(element, base):
+    # Make a relative <img src> relative to the book's root folder instead of the document's folder
+    src = element.get('src')
+    if _is_relative_url(src):
+        element.set('src', posixpath.normpath(posixpath.join(base, src)))
+
+
+def transform_tree(root, bionic_reading=default_bionic_reading, resource_base=None):
+    """Style every prose text node under ``root``'s body in place; returns the node count.
+
+    With ``resource_base`` (the document's folder inside the book), relative
+    image paths are rewritten against it in the same walk, so they resolve
+    from a single archive of the whole book.
+    """
+    body = None
+    for element in root.iter():
+        if isinstance(element.tag, str) and _local_name(element.tag) == 'body':
+            body = element
+            break
+    if body is None:
+        body = root
+    style = _Styler(bionic_reading, _namespace(body.tag))
+    styled = 0
+    stack = [body]
+    while stack:
+        element = stack.pop()
+        children = list(element)
+        for child in children:
+            # Comments and processing instructions have a tail but no content of their own
+            if isinstance(child.tag, str):
+                name = _local_name(child.tag)
+                if name not in SKIP_TAGS:
+                    stack.append(child)
+                if name == 'img' and resource_base is not None:
+                    _rebase_image(child, resource_base)
+        text = element.text
+        tails = [child.tail for child in children]
+        if not _needs_styling(text) and not any(_needs_styling(tail) for tail in tails):
+            continue
+        # Rebuild the child list in order: styled text, then each child followed by its styled tail
+        del element[:]
+        if _needs_styling(text):
+            element.text = style(element, text)
+            styled += 1
+        for child, tail in zip(children, tails):
+            element.append(child)
+            if _needs_styling(tail):
+                child.tail = style(element, tail)
+                styled += 1
+    return styled
+
+
+def transform_document(content, bionic_reading=default_bionic_reading, resource_base=None):
+    """Return ``content`` (bytes or str of an XHTML/HTML document) with bionic styling, as UTF-8 bytes."""
+    if isinstance(content, str):
+        content = content.encode('utf-8')
+    doctype = None
+    try:
+        tree = etree.fromstring(content, _xml_parser).getroottree()
+    except etree.XMLSyntaxError:
+        # Not well-formed XML (e.g. HTML entities); the HTML parser copes and the output is rebuilt as XHTML
+        tree = _xhtml_tree(lxml_html.document_fromstring(content))
+        doctype = '<!DOCTYPE html>'
+    transform_tree(tree.getroot(), bionic_reading, resource_base)
+    return etree.tostring(tree, encoding='utf-8', xml_declaration=True, doctype=doctype)
@@ -0,0 +1,252 @@
+"""Per-stage timings and page counts for a conversion.
+
+Converters time their stages (text extraction, styling, text insertion,
+rasterizing, page copies, saving) with ``ConversionMetrics.stage`` and
+count pages by the path they took. ``summary`` returns plain dicts that
+can be sent through a Qt signal or dumped as JSON; with a ``log_path``
+every page and the final summary are appended to a JSON-lines file.
+
+``profile_run`` wraps a whole conversion in cProfile or tracemalloc;
+``ImportTimer`` times module imports the way ``python -X importtime`` does,
+for the GUI's ``--profile-startup``.
+"""
+import contextlib
+import json
+import os
+import sys
+import threading
+import time
+
+# How a PDF page was converted
+PATH_MIXED = 'mixed'            # text and images: rasterized or vector background plus bionic text
+PATH_IMAGE_ONLY = 'image_only'  # copied as is
+PATH_TEXT_ONLY = 'text_only'    # new page with bionic text
+PATH_EMPTY = 'empty'            # no text or images: copied as is (drawings included)
+PAGE_PATHS = (PATH_MIXED, PATH_IMAGE_ONLY, PATH_TEXT_ONLY, PATH_EMPTY)
+
+PROFILE_MODES = ('cprofile', 'tracemalloc')
+
+
+class ConversionMetrics:
+    """Accumulates stage timings; ``log_path`` also records each page as a JSON line.
+
+    ``record_pages`` keeps per-page records without a log file of its own,
+    for worker processes whose records are merged into the parent's log.
+    """
+
+    def __init__(self, log_path=None, label=None, record_pages=None):
+        self.log_path = log_path
+        self.label = label
+        self.record_pages = bool(log_path) if record_pages is None else record_pages
+        self.stages = {}  # name -> [seconds, calls]
+        self.paths = dict.fromkeys(PAGE_PATHS, 0)
+        self.pages = 0
+        self.records = []  # per-page records not yet written to the log
+        self._page = None
+        self._started = time.perf_counter()
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def add(self, name, seconds, calls=1):
+        totals = self.stages.get(name)
+        if totals is None:
+            totals = self.stages[name] = [0.0, 0]
+        totals[0] += seconds
+        totals[1] += calls
+        if self._page is not None:
+            self._page['stages'][name] = self._page['stages'].get(name, 0.0) + seconds
+
+    def begin_page(self, number):
+        # Stage times until end_page are also attributed to this page in the log
+        if self.record_pages:
+            self._page = {'event': 'page', 'page': number, 'stages': {}}
+
+    def end_page(self, path):
+        self.pages += 1
+        self.paths[path] = self.paths.get(path, 0) + 1
+        if self._page is not None:
+            self._page['path'] = path
+            self.records.append(self._page)
+            self._page = None
+            if self.log_path and len(self.records) >= 100:
+                self.flush_log()
+
+    def merge(self, summary, records=()):
+        """Add the summary (and page records) of another run, e.g. from a worker process."""
+        for name, stage in summary['stages'].items():
+            self.add(name, stage['seconds'], stage['calls'])
+        for path, count in summary['paths'].items():
+            self.paths[path] = self.paths.get(path, 0) + count
+        self.pages += summary['pages']
+        if self.record_pages:
+            self.records.extend(records)
+            if self.log_path:
+                self.flush_log()
+
+    def summary(self):
+        wall = time.perf_counter() - self._started
+        stages = {name: {'seconds': round(seconds, 6), 'calls': calls}
+                  for name, (seconds, calls) in sorted(self.stages.items(), key=lambda item: -item[1][0])}
+        return {'label': self.label, 'wall_s': round(wall, 6), 'pages': self.pages,
+                'pages_per_s': round(self.pages / wall, 3) if wall else None,
+                'paths': dict(self.paths), 'stages': stages}
+
+    def flush_log(self):
+        # Append the page records gathered so far
+        if not self.log_path or not self.records:
+            self.records = []
+            return
+        with open(self.log_path, 'a', encoding='utf-8') as f:
+            for record in self.records:
+                f.write(json.dumps(record) + '\n')
+        self.records = []
+
+    def finish(self):
+        """Write the remaining log lines and the summary; returns the summary."""
+        summary = self.summary()
+        if self.log_path:
+            self.flush_log()
+            with open(self.log_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps({'event': 'summary', **summary}) + '\n')
+        return summary
+
+
+def format_summary(summary):
+    """Human-readable table of a summary, for logs and the console."""
+    lines = [f"{summary['pages']} pages in {summary['wall_s']:.2f}s"
+             + (f" ({summary['pages_per_s']:.1f} pages/s)" if summary['pages_per_s'] else '')]
+    paths = ', '.join(f'{path} {count}' for path, count in summary['paths'].items() if count)
+    if paths:
+        lines.append(f'  paths: {paths}')
+    wall = summary['wall_s'] or 1
+    for name, stage in summary['stages'].items():
+        lines.append(f"  {name:<14} {stage['seconds']:8.3f}s {stage['seconds'] / wall:6.1%}  ({stage['calls']} calls)")
+    return '\n'.join(lines)
+
+
+def profile_run(func, mode, out_base):
+    """Call ``func()`` under cProfile or tracemalloc and write the report next to ``out_base``.
+
+    cProfile writes ``<out_base>.prof`` (open with pstats or snakeviz) and
+    tracemalloc ``<out_base>.tracemalloc.txt`` with the top allocation
+    sites and peak traced memory (Python objects only; MuPDF's own buffers
+    are not traced). Only the calling process is profiled, not worker
+    processes.
+    """
+    if mode not in PROFILE_MODES:
+        raise ValueError(f"Unknown profile mode: {mode}")
+    os.makedirs(os.path.dirname(os.path.abspath(out_base)), exist_ok=True)
+    if mode == 'cprofile':
+        import cProfile
+        import pstats
+        profiler = cProfile.Profile()
+        try:
+            return profiler.runcall(func)
+        finally:
+            report_path = out_base + '.prof'
+            profiler.dump_stats(report_path)
+            print(f'cProfile data written to {report_path}; top functions by cumulative time:')
+            pstats.Stats(profiler).sort_stats('cumulative').print_stats(15)
+    import tracemalloc
+    tracemalloc.start(10)
+    try:
+        return func()
+    finally:
+        snapshot = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        report_path = out_base + '.tracemalloc.txt'
+        with open(report_path, 'w', encoding='utf-8') as f:
+            f.write(f'Traced memory: current {current / 1048576:.1f} MB, peak {peak / 1048576:.1f} MB\n\n')
+            for stat in snapshot.statistics('lineno')[:30]:
+                f.write(f'{stat}\n')
+        print(f'tracemalloc report written to {report_path} (peak {peak / 1048576:.1f} MB)')
+
+
+class _TimedLoader:
+    # Stands in for a module's loader and times create_module (where extension modules initialize)
+    # and exec_module; everything else goes to the real loader
+
+    def __init__(self, loader, timer):
+        self._loader = loader
+        self._timer = timer
+        self._created = (0.0, 0.0)  # (cumulative, nested) seconds of create_module
+
+    def __getattr__(self, name):
+        return getattr(self._loader, name)
+
+    def create_module(self, spec):
+        module, cumulative, nested = self._timer.timed(self._loader.create_module, spec)
+        self._created = (cumulative, nested)
+        return module
+
+    def exec_module(self, module):
+        _, cumulative, nested = self._timer.timed(self._loader.exec_module, module)
+        created, created_nested = self._created
+        self._timer.record(module.__name__, created + cumulative, created_nested + nested)
+
+
+class ImportTimer:
+    """Times every module imported while installed, like ``python -X importtime``.
+
+    ``install`` puts the timer first on ``sys.meta_path``; it finds modules
+    through the other finders and wraps their loaders. ``records`` holds
+    (module name, self seconds, cumulative seconds, nesting depth) in the
+    order imports finish, children before their parent.
+    """
+
+    def __init__(self):
+        self.records = []
+        self._local = threading.local()
+
+    def install(self):
+        if self not in sys.meta_path:
+            sys.meta_path.insert(0, self)
+
+    def uninstall(self):
+        if self in sys.meta_path:
+            sys.meta_path.remove(self)
+
+    def find_spec(self, name, path=None, target=None):
+        for finder in sys.meta_path:
+            find_spec = getattr(finder, 'find_spec', None)
+            if finder is self or find_spec is None:
+                continue
+            spec = find_spec(name, path, target)
+            if spec is None:
+                continue
+            if hasattr(spec.loader, 'exec_module'):
+                spec.loader = _TimedLoader(spec.loader, self)
+            return spec
+        return None
+
+    def timed(self, func, arg):
+        # (func(arg), seconds it took, seconds of that spent in nested imports)
+        stack = self._local.__dict__.setdefault('stack', [])
+        stack.append(0.0)
+        start = time.perf_counter()
+        try:
+            result = func(arg)
+        finally:
+            cumulative = time.perf_counter() - start
+            nested = stack.pop()
+            if stack:
+                stack[-1] += cumulative
+        return result, cumulative, nested
+
+    def record(self, name, cumulative, nested):
+        depth = len(self._local.__dict__.get('stack', ()))
+        self.records.append((name, cumulative - nested, cumulative, depth))
+
+    def report(self):
+        """The records as ``-X importtime`` prints them (microseconds, nested imports indented)."""
+        lines = ['import time: self [us] | cumulative | imported package']
+        for name, own, cumulative, depth in self.records:
+            lines.append(f"import time: {own * 1e6:9.0f} | {cumulative * 1e6:10.0f} | {'  ' * depth}{name}")
+        return '\n'.join(lines)
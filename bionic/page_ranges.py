@@ -0,0 +1,53 @@
+"""Page and chapter selections such as "1-20,45,100-".
+
+A selection lists 1-based numbers and ranges separated by commas: "3",
+"1-20", "100-" (to the end) or "-5" (from the start). ``None`` or an empty
+string selects everything.
+"""
+
+
+def split_ranges(spec):
+    """Parse ``spec`` into (first, last) pairs of 1-based numbers; last is None for an open end.
+
+    Returns None for an empty selection and raises ValueError for
+    malformed input.
+    """
+    if spec is None or not spec.strip():
+        return None
+    ranges = []
+    for part in spec.split(','):
+        part = part.strip()
+        if not part:
+            continue
+        first, dash, last = part.partition('-')
+        first, last = first.strip(), last.strip()
+        try:
+            first = int(first) if first else 1
+            if not dash:
+                last = first
+            else:
+                last = int(last) if last else None
+        except ValueError:
+            raise ValueError(f"Invalid page range '{part}': use numbers like 1-20,45,100-") from None
+        if first < 1 or (last is not None and last < first):
+            raise ValueError(f"Invalid page range '{part}'")
+        ranges.append((first, last))
+    return ranges or None
+
+
+def parse_ranges(spec, total, unit='pages'):
+    """The 0-based indexes ``spec`` selects out of ``total``, in document order.
+
+    Numbers past ``total`` are ignored; ValueError is raised when nothing
+    is left.
+    """
+    ranges = split_ranges(spec)
+    if ranges is None:
+        return list(range(total))
+    selected = set()
+    for first, last in ranges:
+        last = total if last is None else min(last, total)
+        selected.update(range(first - 1, last))
+    if not selected:
+        raise ValueError(f"'{spec}' selects none of the {total} {unit}")
+    return sorted(selected)
@@ -0,0 +1,552 @@
+import os
+import tempfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import fitz  # PyMuPDF
+
+from .cache import function_id
+from .control import ConversionCancelled, JobControl, job_identity
+from .extract import extract_columns, extract_lines
+from .fonts import FontRegistry
+from .metrics import (PATH_EMPTY, PATH_IMAGE_ONLY, PATH_MIXED, PATH_TEXT_ONLY,
+                      ConversionMetrics)
+from .page_ranges import parse_ranges
+from .reading import bionic_lines, bionic_reading as default_bionic_reading
+from .pdf_output import PDFOutput
+from .sources import is_stream, source_name
+from .text_writer import GlyphTextWriter, LineTextWriter
+
+# How the bionic text is put on the page
+RENDER_HTML = 'html'  # each line fitted to its box in shared embedded fonts; insert_htmlbox for other scripts
+RENDER_TEXT = 'text'  # glyphs placed directly with TextWriter at the source font size (fast)
+RENDER_MODES = (RENDER_HTML, RENDER_TEXT)
+
+# How pages with both text and images are rebuilt
+IMAGE_RASTER = 'raster'  # render the page to a bitmap background, then overlay the text
+IMAGE_VECTOR = 'vector'  # copy the page, strip only its text layer, then overlay the text
+IMAGE_MODES = (IMAGE_RASTER, IMAGE_VECTOR)
+
+# Converted pages are appended to the output file in chunks of this many pages
+DEFAULT_CHUNK_PAGES = 100
+
+# Longest run of pass-through pages copied with one insert_pdf call, so progress and checkpoints keep moving
+MAX_RUN_PAGES = 50
+
+
+def _noop(*args):
+    pass
+
+
+def open_pdf(source):
+    """Open a PDF given as a path or in memory (bytes, bytearray, memoryview or mmap), without copying it."""
+    if is_stream(source):
+        return fitz.open(stream=memoryview(source), filetype='pdf')
+    return fitz.open(source)
+
+
+def image_bytes(doc, xref):
+    # Stored size of an image stream, without reading it
+    kind, value = doc.xref_get_key(xref, 'Length')
+    return int(value) if kind == 'int' else 0
+
+
+def resolve_workers(workers):
+    # 0 or None means one worker per CPU core
+    if not workers:
+        return os.cpu_count() or 1
+    return max(1, int(workers))
+
+
+def split_pages(total, workers):
+    """Split ``range(total)`` into ordered (start, stop) chunks.
+
+    Chunks are several times smaller than ``total / workers`` so finished
+    chunks report progress regularly and slow pages don't stall one worker.
+    """
+    chunk = max(1, min(50, -(-total // (workers * 4))))
+    return [(start, min(start + chunk, total)) for start in range(0, total, chunk)]
+
+
+# In-memory input of the parent conversion, sent once to each worker process by _set_worker_source
+_worker_source = None
+
+
+def _set_worker_source(data):
+    global _worker_source
+    _worker_source = data
+
+
+def _convert_part(file_path, page_numbers, part_path, options, record_pages=False):
+    # Runs in a worker process: convert the given pages into a partial PDF.
+    # file_path None means the in-memory input set by _set_worker_source.
+    # Returns the page count and this part's metrics (summary, page records).
+    source = _worker_source if file_path is None else file_path
+    converter = PDFConverter(source, None, **options)
+    converter.timings = ConversionMetrics(record_pages=record_pages)
+    doc = open_pdf(source)
+    part = fitz.open()
+    try:
+        run = PageRun()
+        for i in page_numbers:
+            converter.convert_page(doc, i, part, run)
+        converter.copy_run(doc, run, part)
+        with converter.timings.stage('save'):
+            part.save(part_path, garbage=0)
+    finally:
+        part.close()
+        doc.close()
+    return len(page_numbers), converter.timings.summary(), converter.timings.records
+
+
+class PageRun:
+    """Consecutive source pages that are copied as they are (image-only or blank), not yet in the output.
+
+    ``PDFConverter.copy_run`` copies the whole run with one ``insert_pdf``
+    call, which maps the shared resources of its pages once instead of
+    once per page.
+    """
+
+    def __init__(self, count_bytes=False):
+        self.first = None
+        self.last = None
+        self.count_bytes = count_bytes  # Whether to total the images' stream bytes, for a chunk size limit
+        self.bytes = 0
+
+    def __len__(self):
+        return 0 if self.first is None else self.last - self.first + 1
+
+    def follows(self, i):
+        return self.last is not None and i == self.last + 1
+
+    def add(self, doc, i, images):
+        if self.first is None:
+            self.first = i
+        self.last = i
+        if self.count_bytes:
+            self.bytes += sum(image_bytes(doc, image[0]) for image in images)
+
+    def clear(self):
+        self.first = self.last = None
+        self.bytes = 0
+
+
+class PDFConverter:
+    """Apply bionic reading to a PDF, keeping images and page geometry.
+
+    ``progress`` is called with an int percentage (0-99) and ``saving`` right
+    before the output is written. ``run`` returns the output path and raises
+    on failure.
+
+    ``pages`` selects the pages to convert, e.g. "1-20,45,100-" (see
+    ``bionic.page_ranges``); the output holds only those pages and the
+    others are never loaded.
+
+    With ``workers`` > 1 the pages are split across a process pool; each
+    worker builds a partial document and the parts are merged in page order.
+    ``bionic_reading`` must then be a picklable module-level function.
+
+    ``render_mode`` 'html' writes each line at the size and baseline of its
+    dominant source span, shrunk only where the bold runs would pass the
+    right edge of its column, using serif faces embedded once per output
+    document (see ``bionic.fonts``); with ``match_fonts`` each line gets the serif,
+    sans or monospace face closest to its source font instead. Lines in
+    scripts those faces lack, and all lines when ``bionic_reading`` is not
+    the built-in engine, go through insert_htmlbox. ``render_mode`` 'text'
+    skips the HTML layout engine and writes each span at its own baseline
+    and size with base-14 Helvetica; it always uses the built-in styling
+    engine. Helvetica only covers WinAnsi (Western Latin) text, so lines
+    with other characters go through insert_htmlbox there too.
+
+    ``image_mode`` 'vector' keeps the images and drawings of mixed
+    text+image pages as they are and only replaces the text; pages where
+    that fails fall back to a bitmap rendered at ``raster_dpi`` (None keeps
+    PyMuPDF's default 72 dpi, as the 'raster' mode does).
+
+    Pages without text (image-only scans and blank pages) are copied as
+    they are; consecutive ones are copied together with a single
+    ``insert_pdf`` call.
+
+    Output is streamed to disk every ``chunk_pages`` pages or roughly
+    ``chunk_bytes`` bytes (whichever comes first; None disables a limit), so
+    memory does not grow with the document.
+
+    Stage timings and page path counts are collected in ``self.timings``
+    (a ``bionic.metrics.ConversionMetrics``); ``metrics`` is called with
+    their summary when the conversion finishes, and ``metrics_log`` names a
+    JSON-lines file that receives a record per page plus the summary.
+
+    With a ``cache`` (a ``bionic.cache.ConversionCache``) every converted
+    text page is stored and reused when the same page content comes up
+    again, in this document or a later revision of it.
+
+    ``optimize`` names a ``bionic.shrink`` preset applied while the output
+    is finalized, so the optimized file is written once instead of being
+    saved and then rewritten by a separate shrink.
+
+    ``control`` (a ``bionic.control.JobControl``, one is created if not
+    given) pauses or cancels the conversion between pages. With
+    ``checkpoint`` set, every chunk written to disk is a checkpoint: a
+    cancelled, failed or killed run leaves its partial output behind and
+    the next run of the same job continues after the last saved page.
+
+    ``file_path`` may also be the PDF itself as bytes, bytearray,
+    memoryview or ``mmap.mmap``; it is read in place (see
+    ``bionic.sources``) and ``input_name`` names it in the output file name
+    and logs. With an ``output_stream`` (a writable binary file object)
+    the result is written there instead of to ``output_dir``: the whole
+    output is then kept in memory until the end, and ``run`` returns the
+    stream.
+    """
+
+    def __init__(self, file_path, output_dir, bionic_reading=default_bionic_reading,
+                 progress=None, saving=None, workers=1, render_mode=RENDER_HTML,
+                 image_mode=IMAGE_RASTER, raster_dpi=None, chunk_pages=DEFAULT_CHUNK_PAGES, chunk_bytes=None,
+                 cache=None, metrics=None, metrics_log=None, control=None, checkpoint=True, optimize=None,
+                 match_fonts=False, pages=None, input_name=None, output_stream=None):
+        self.file_path = file_path
+        self.input_name = source_name(file_path, input_name)
+        self.output_dir = output_dir
+        self.output_stream = output_stream
+        self.bionic_reading = bionic_reading
+        self.progress = progress or _noop
+        self.saving = saving or _noop
+        self.workers = resolve_workers(workers)
+        if render_mode not in RENDER_MODES:
+            raise ValueError(f"Unknown render mode: {render_mode}")
+        self.render_mode = render_mode
+        self.glyph_writer = GlyphTextWriter() if render_mode == RENDER_TEXT else None
+        self.match_fonts = match_fonts
+        self.line_writer = None
+        if render_mode == RENDER_HTML and bionic_reading is default_bionic_reading:
+            self.line_writer = LineTextWriter(FontRegistry(match_fonts))
+        if image_mode not in IMAGE_MODES:
+            raise ValueError(f"Unknown image mode: {image_mode}")
+        self.image_mode = image_mode
+        self.raster_dpi = raster_dpi
+        self.chunk_pages = chunk_pages
+        self.chunk_bytes = chunk_bytes
+        self.cache = cache
+        self._object_digests = {}
+        self.metrics = metrics or _noop
+        self.timings = ConversionMetrics(metrics_log, label=self.input_name)
+        self.control = control or JobControl()
+        self.checkpoint = checkpoint
+        self.optimize = optimize
+        self.pages = pages.strip() if pages and pages.strip() else None
+
+    def int_to_rgb_tuple(self, color_int):
+        r = (color_int >> 16) & 0xFF
+        g = (color_int >> 8) & 0xFF
+        b = color_int & 0xFF
+        return (r / 255.0, g / 255.0, b / 255.0)
+
+    def output_path(self):
+        base_name = os.path.splitext(self.input_name)[0]
+        return os.path.join(self.output_dir or '', f'{base_name}_bionic.pdf')
+
+    def cache_params(self):
+        # Everything besides the input that changes the output
+        return {'mode': 'pdf', 'bionic_reading': function_id(self.bionic_reading),
+                'render_mode': self.render_mode, 'image_mode': self.image_mode, 'raster_dpi': self.raster_dpi,
+                'optimize': self.optimize, 'match_fonts': self.match_fonts, 'pages': self.pages}
+
+    def page_params(self):
+        # A converted page is the same whichever other pages are selected
+        params = self.cache_params()
+        del params['pages']
+        return params
+
+    def style_lines(self, texts):
+        # The default engine styles a whole page in one batched call
+        if self.bionic_reading is default_bionic_reading:
+            return bionic_lines(texts)
+        return [self.bionic_reading(text) for text in texts]
+
+    def insert_bionic_text(self, new_page, lines, page_number):
+        # lines: the page's bionic.extract.TextLine records for the glyph writer, else its PageLines
+        timings = self.timings
+        if self.glyph_writer:
+            with timings.stage('style'):
+                ops, indexes = self.glyph_writer.page_operators(lines)
+            with timings.stage('insert_text'):
+                self.glyph_writer.write_operators(new_page, ops)
+            # Lines outside WinAnsi need the HTML engine's fonts
+            if indexes:
+                self.insert_html_lines(new_page, [(lines[n].rect, lines[n].text, lines[n].size) for n in indexes],
+                                       page_number)
+            return
+        indexes = range(len(lines))
+        if self.line_writer:
+            registry = self.line_writer.registry
+            families = [registry.family(font, flags) for font, flags in zip(lines.font, lines.flags.tolist())]
+            with timings.stage('style'):
+                ops, faces, indexes = self.line_writer.page_operators(lines, families)
+            with timings.stage('insert_text'):
+                self.line_writer.write_operators(new_page, ops, faces)
+            # The rest need the HTML engine's fallback fonts
+            if not indexes:
+                return
+        self.insert_html_lines(new_page, [(lines.rect(n), lines.text[n], float(lines.size[n])) for n in indexes],
+                               page_number)
+
+    def insert_html_lines(self, new_page, boxes, page_number):
+        # boxes: (rect, text, font size) of lines laid out by insert_htmlbox, which has fonts for any script.
+        # A line that cannot be laid out fails the conversion rather than leaving text out of the page.
+        with self.timings.stage('style'):
+            styled_lines = self.style_lines([text for _, text, _ in boxes])
+        with self.timings.stage('insert_text'):
+            for (rect, text, size), styled in zip(boxes, styled_lines):
+                if rect.is_empty:
+                    # Zero-height or zero-width line boxes (hidden or degenerate text): room for the line at its size
+                    room = max(size, 1)
+                    rect = fitz.Rect(rect.x0, rect.y0, max(rect.x1, rect.x0 + room * max(len(text), 1)),
+                                     max(rect.y1, rect.y0 + room * 1.5))
+                bionic_html = f'<span style="font-size:{size:g}pt">{styled}</span>'
+                try:
+                    new_page.insert_htmlbox(rect, bionic_html)
+                except Exception as e:
+                    raise RuntimeError(f"Could not lay out text on page {page_number + 1}: {e}") from e
+
+    def add_raster_page(self, doc, i, new_doc):
+        # The whole source page, text included, as a bitmap background
+        with self.timings.stage('rasterize'):
+            return self._add_raster_page(doc, i, new_doc)
+
+    def _add_raster_page(self, doc, i, new_doc):
+        page = doc[i]
+        new_page = new_doc.new_page(width=page.rect.width, height=page.rect.height)
+        pix = page.get_pixmap(dpi=self.raster_dpi) if self.raster_dpi else page.get_pixmap()
+        img_rect = fitz.Rect(0, 0, page.rect.width, page.rect.height)
+        new_page.insert_image(img_rect, pixmap=pix)
+        return new_page
+
+    def add_vector_page(self, doc, i, new_doc):
+        # Copy the page as is, then redact its text only: images and line art stay untouched
+        with self.timings.stage('strip_text'):
+            return self._add_vector_page(doc, i, new_doc)
+
+    def _add_vector_page(self, doc, i, new_doc):
+        new_doc.insert_pdf(doc, from_page=i, to_page=i)
+        new_page = new_doc[-1]
+        try:
+            new_page.add_redact_annot(new_page.rect, fill=False, cross_out=False)
+            new_page.apply_redactions(images=fitz.PDF_REDACT_IMAGE_NONE,
+                                      graphics=fitz.PDF_REDACT_LINE_ART_NONE,
+                                      text=fitz.PDF_REDACT_TEXT_REMOVE)
+        except Exception:
+            new_doc.delete_page(-1)
+            raise
+        return new_page
+
+    def build_text_page(self, doc, i, new_doc, lines, has_images):
+        page = doc[i]
+        if has_images:
+            new_page = None
+            if self.image_mode == IMAGE_VECTOR:
+                try:
+                    new_page = self.add_vector_page(doc, i, new_doc)
+                except Exception as e:
+                    print(f"Could not strip text from page {i}, rasterizing it instead: {e}")
+            if new_page is None:
+                new_page = self.add_raster_page(doc, i, new_doc)
+        else:
+            new_page = new_doc.new_page(width=page.rect.width, height=page.rect.height)
+        self.insert_bionic_text(new_page, lines, i)
+
+    def build_cached_text_page(self, doc, i, new_doc, lines, has_images):
+        # Reuse a page converted before; otherwise convert it on its own and store it
+        with self.timings.stage('cache_lookup'):
+            key = self.cache.page_key(doc, doc[i], self.page_params(), self._object_digests)
+            cached_path = self.cache.get_page(key)
+            if cached_path:
+                try:
+                    with fitz.open(cached_path) as cached:
+                        new_doc.insert_pdf(cached)
+                    return
+                except Exception as e:
+                    print(f"Ignoring unreadable cached page {i}: {e}")
+        single = fitz.open()
+        try:
+            self.build_text_page(doc, i, single, lines, has_images)
+            with self.timings.stage('cache_store'):
+                self.cache.put_page(key, single.tobytes(garbage=1, deflate=True))
+                new_doc.insert_pdf(single)
+        finally:
+            single.close()
+
+    def copy_run(self, doc, run, new_doc):
+        # Append the pages collected in run to new_doc in one go
+        if not run:
+            return
+        with self.timings.stage('copy_page'):
+            new_doc.insert_pdf(doc, from_page=run.first, to_page=run.last)
+        run.clear()
+
+    def run_full(self, run, output):
+        # Copy a run once it would fill the output's current chunk, so chunks keep their size
+        if len(run) >= MAX_RUN_PAGES:
+            return True
+        if output.max_pages and len(output.doc) + len(run) >= output.max_pages:
+            return True
+        return bool(output.max_bytes and output.chunk_bytes + run.bytes >= output.max_bytes)
+
+    def convert_page(self, doc, i, new_doc, run=None):
+        """Convert page ``i`` of ``doc`` into ``new_doc``.
+
+        With a ``run`` (a ``PageRun``) a page without text is added to the
+        run instead of being copied right away; the run is copied before
+        any other page goes into ``new_doc``, so page order is kept.
+        """
+        timings = self.timings
+        timings.begin_page(i)
+        page = doc[i]
+        with timings.stage('extract'):
+            # The glyph writer places each span; the line writers work on the page's lines as columns
+            if self.glyph_writer:
+                lines = extract_lines(page, spans=True)
+            else:
+                lines = extract_columns(page)
+            images = page.get_images(full=True)
+        if lines:
+            path = PATH_MIXED if images else PATH_TEXT_ONLY
+            if run is not None:
+                self.copy_run(doc, run, new_doc)
+            if self.cache:
+                self.build_cached_text_page(doc, i, new_doc, lines, bool(images))
+            else:
+                self.build_text_page(doc, i, new_doc, lines, bool(images))
+        else:
+            path = PATH_IMAGE_ONLY if images else PATH_EMPTY
+            if run is None:
+                with timings.stage('copy_page'):
+                    new_doc.insert_pdf(doc, from_page=i, to_page=i)
+            else:
+                if not run.follows(i):
+                    self.copy_run(doc, run, new_doc)
+                run.add(doc, i, images)
+        timings.end_page(path)
+
+    def worker_options(self):
+        # Keyword arguments that rebuild this converter's page settings in a worker process
+        return {'bionic_reading': self.bionic_reading, 'render_mode': self.render_mode,
+                'image_mode': self.image_mode, 'raster_dpi': self.raster_dpi, 'cache': self.cache,
+                'match_fonts': self.match_fonts}
+
+    def convert_pages(self, doc, output, page_numbers, start=0):
+        # page_numbers: the selected pages; start and output.position count within them
+        total = len(page_numbers)
+        run = PageRun(count_bytes=bool(output.max_bytes))
+        for n in range(start, total):
+            self.control.check()
+            self.convert_page(doc, page_numbers[n], output.doc, run)
+            if self.run_full(run, output):
+                self.copy_run(doc, run, output.doc)
+            # Pages still waiting in the run are not in the output yet
+            output.position = n + 1 - len(run)
+            with self.timings.stage('save'):
+                output.page_added()
+            # Only report progress up to 99% during processing
+            self.progress(int((n + 1) / total * 99))
+        if run:
+            self.copy_run(doc, run, output.doc)
+            output.position = total
+            with self.timings.stage('save'):
+                output.page_added()
+
+    def convert_pages_parallel(self, doc, output, page_numbers, start=0):
+        total = len(page_numbers)
+        chunks = [(chunk_start + start, chunk_stop + start)
+                  for chunk_start, chunk_stop in split_pages(total - start, self.workers)]
+        print(f'Converting {total - start} pages in {len(chunks)} chunks on {self.workers} processes')
+        with tempfile.TemporaryDirectory(prefix='bionic_parts_', dir=self.output_dir) as parts_dir:
+            part_paths = [os.path.join(parts_dir, f'part_{n:05d}.pdf') for n in range(len(chunks))]
+            finished = [False] * len(chunks)
+            in_flight = {}
+            next_chunk = next_part = 0
+            done = start
+            if is_stream(self.file_path):
+                # Each worker gets its own copy of in-memory input once, not with every range
+                source = None
+                pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_set_worker_source,
+                                           initargs=(bytes(self.file_path),))
+            else:
+                source = self.file_path
+                pool = ProcessPoolExecutor(max_workers=self.workers)
+            with pool:
+                options = self.worker_options()
+                record_pages = self.timings.record_pages
+                while next_part < len(chunks):
+                    # One range per process at a time, so pause and cancel take effect between ranges
+                    while next_chunk < len(chunks) and len(in_flight) < self.workers:
+                        self.control.check()
+                        chunk_start, chunk_stop = chunks[next_chunk]
+                        future = pool.submit(_convert_part, source, page_numbers[chunk_start:chunk_stop],
+                                             part_paths[next_chunk], options, record_pages)
+                        in_flight[future] = next_chunk
+                        next_chunk += 1
+                    completed, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in completed:
+                        count, summary, records = future.result()
+                        done += count
+                        # Worker stage times add up across processes, so they can exceed the wall time
+                        self.timings.merge(summary, records)
+                        finished[in_flight.pop(future)] = True
+                    # Append the parts in page order as soon as they are contiguous
+                    while next_part < len(chunks) and finished[next_part]:
+                        output.position = chunks[next_part][1]
+                        with self.timings.stage('merge'):
+                            part = fitz.open(part_paths[next_part])
+                            try:
+                                output.add_document(part)
+                            finally:
+                                part.close()
+                        os.remove(part_paths[next_part])
+                        next_part += 1
+                    self.progress(int(done / total * 99))
+
+    def finish_output(self, partial_path, out_path):
+        from .shrink import format_report, optimize_pdf
+        print(format_report(optimize_pdf(partial_path, out_path, self.optimize, workers=self.workers)))
+
+    def checkpoint_id(self):
+        return job_identity(self.file_path, self.cache_params())
+
+    def run(self):
+        print('PDF conversion started')
+        doc = open_pdf(self.file_path)
+        try:
+            if self.output_stream is None:
+                os.makedirs(self.output_dir, exist_ok=True)  # Ensure it exists
+            out_path = self.output_path()
+            page_numbers = parse_ranges(self.pages, len(doc))
+            if self.pages:
+                print(f'Converting {len(page_numbers)} of {len(doc)} pages ({self.pages})')
+            # Output to a stream is only written at the end, so it has no checkpoints
+            checkpoint = self.checkpoint and self.output_stream is None
+            output = PDFOutput(out_path, max_pages=self.chunk_pages, max_bytes=self.chunk_bytes,
+                               checkpoint=self.checkpoint_id() if checkpoint else None, stream=self.output_stream)
+            start = output.resume()
+            if start:
+                print(f'Resuming after {start} of {len(page_numbers)} pages')
+            try:
+                if self.workers > 1 and len(page_numbers) - start > 1:
+                    self.convert_pages_parallel(doc, output, page_numbers, start)
+                else:
+                    self.convert_pages(doc, output, page_numbers, start)
+                # Signal that saving is about to start; only the last chunk is still in memory
+                self.saving()
+                print('Saving PDF...')
+                with self.timings.stage('save'):
+                    out_path = output.close(finish=self.finish_output if self.optimize else None)
+                print('PDF saved successfully')
+            except ConversionCancelled:
+                # Keep the pages converted so far as a checkpoint
+                output.suspend()
+                raise
+            except BaseException:
+                output.suspend(flush=False)
+                raise
+        finally:
+            doc.close()
+        self.metrics(self.timings.finish())
+        return out_path
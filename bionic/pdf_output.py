@@ -0,0 +1,227 @@
+import json
+import os
+import shutil
+import tempfile
+
+import fitz  # PyMuPDF
+
+from .fonts import share_fonts
+from .sources import OutputStream
+
+
+class PDFOutput:
+    """Collects converted pages and writes them to ``out_path`` in chunks.
+
+    Pages are added to ``self.doc``. Once it holds ``max_pages`` pages or
+    roughly ``max_bytes`` of new objects, the chunk is appended to the file
+    on disk with an incremental save and a fresh in-memory document is
+    started, so memory stays bounded and most of the writing happens while
+    the conversion is still running. Without limits everything is saved in
+    one go by ``close``, as before.
+
+    The file is written as ``<out_path>.partial`` and renamed when complete.
+
+    With a ``checkpoint`` (a JSON-serializable identity of the job, see
+    ``bionic.control.job_identity``) every flush also records the file size
+    and the converter's ``position`` (the next page or chapter to convert)
+    in ``<out_path>.checkpoint.json``. ``resume`` reopens such a file after
+    a cancel or crash: incremental saves only append, so cutting the file
+    back to the recorded size restores the last checkpoint.
+
+    The embedded fonts of ``bionic.fonts.FontRegistry`` are kept once per
+    file: each chunk brings its own copy, which ``flush`` swaps for the one
+    already written.
+
+    With a ``stream`` (a writable binary file object) instead of an
+    ``out_path`` nothing goes to disk: all pages stay in ``self.doc`` and
+    ``close`` saves them to the stream in one go. There are no chunks and
+    no checkpoints then.
+    """
+
+    def __init__(self, out_path, max_pages=None, max_bytes=None, checkpoint=None, stream=None):
+        self.out_path = out_path
+        self.stream = stream
+        if stream is None:
+            self.partial_path = out_path + '.partial'
+            self.manifest_path = out_path + '.checkpoint.json'
+            self.max_pages = max_pages
+            self.max_bytes = max_bytes
+        else:
+            self.partial_path = self.manifest_path = None
+            self.max_pages = self.max_bytes = None
+            checkpoint = None
+        # Round-trip through JSON so it compares equal to the stored manifest
+        self.checkpoint = json.loads(json.dumps(checkpoint)) if checkpoint else None
+        self.position = None  # Set by the converter; None while the pages in memory end mid-unit
+        self.pages_written = 0
+        self.chunks_written = 0
+        self._file_fonts = None  # Font digest -> xref in the partial file, see bionic.fonts.share_fonts
+        self._new_chunk()
+
+    def _new_chunk(self):
+        self.doc = fitz.open()
+        self.chunk_bytes = 0
+        self._seen_xrefs = 1
+
+    def _count_new_bytes(self):
+        # Stream lengths of the objects created since the last check track the chunk's size closely
+        xref_count = self.doc.xref_length()
+        for xref in range(self._seen_xrefs, xref_count):
+            kind, value = self.doc.xref_get_key(xref, 'Length')
+            if kind == 'int':
+                self.chunk_bytes += int(value)
+        self._seen_xrefs = xref_count
+
+    def _read_manifest(self):
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_manifest(self):
+        manifest = {'job': self.checkpoint, 'position': self.position, 'pages': self.pages_written,
+                    'bytes': os.path.getsize(self.partial_path)}
+        tmp_path = self.manifest_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f)
+        os.replace(tmp_path, self.manifest_path)
+
+    def _remove_files(self):
+        for path in (self.partial_path, self.manifest_path):
+            if path and os.path.exists(path):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    def resume(self):
+        """Continue a checkpointed earlier run of the same job.
+
+        Returns the position to continue from, or 0 (after removing any
+        stale partial output) when there is nothing to resume.
+        """
+        if not self.checkpoint:
+            return 0
+        manifest = self._read_manifest()
+        if manifest and manifest.get('job') == self.checkpoint and os.path.exists(self.partial_path):
+            try:
+                if os.path.getsize(self.partial_path) > manifest['bytes']:
+                    os.truncate(self.partial_path, manifest['bytes'])  # Drop a save cut short by the interruption
+                with fitz.open(self.partial_path) as partial:
+                    valid = len(partial) == manifest['pages']
+            except Exception as e:
+                print(f'Ignoring unusable checkpoint for {os.path.basename(self.out_path)}: {e}')
+                valid = False
+            if valid:
+                self.pages_written = manifest['pages']
+                self.chunks_written = 1  # Later chunks are appended incrementally
+                self.position = manifest['position']
+                return self.position
+        self._remove_files()
+        return 0
+
+    def page_added(self):
+        """Call after adding pages to ``self.doc``; flushes when over budget."""
+        if self.max_bytes:
+            self._count_new_bytes()
+        if (self.max_pages and len(self.doc) >= self.max_pages) or \
+                (self.max_bytes and self.chunk_bytes >= self.max_bytes):
+            self.flush()
+
+    def add_document(self, part):
+        # Append every page of an already converted partial document
+        self.doc.insert_pdf(part)
+        self.page_added()
+
+    def flush(self):
+        if len(self.doc) == 0:
+            return
+        share_fonts(self.doc, {})  # Parts from worker processes and cached pages have their own copies
+        if self.chunks_written == 0:
+            self.doc.save(self.partial_path, garbage=0)
+        else:
+            out = fitz.open(self.partial_path)
+            try:
+                first_page = len(out)
+                if self._file_fonts is None:
+                    self._file_fonts = {}
+                    share_fonts(out, self._file_fonts)  # Find the copies written so far
+                out.insert_pdf(self.doc)
+                share_fonts(out, self._file_fonts, first_page)
+                out.saveIncr()
+            finally:
+                out.close()
+        self.pages_written += len(self.doc)
+        self.chunks_written += 1
+        self.doc.close()
+        self._new_chunk()
+        if self.checkpoint and self.position is not None:
+            self._write_manifest()
+
+    def close(self, finish=None):
+        """Write the remaining pages and move the finished file into place.
+
+        ``finish(partial_path, out_path)``, if given, writes the final file
+        from the partial one instead of renaming it (e.g. an optimizing save).
+        Returns ``out_path``, or the stream when writing to one.
+        """
+        if self.stream is not None:
+            return self._close_stream(finish)
+        self.flush()
+        self.doc.close()
+        if finish:
+            finished_path = self.out_path + '.tmp'
+            finish(self.partial_path, finished_path)
+            os.replace(finished_path, self.out_path)
+            os.remove(self.partial_path)
+        else:
+            os.replace(self.partial_path, self.out_path)
+        if os.path.exists(self.manifest_path):
+            os.remove(self.manifest_path)
+        return self.out_path
+
+    def _close_stream(self, finish):
+        page_count = len(self.doc)
+        share_fonts(self.doc, {})  # Parts from worker processes and cached pages have their own copies
+        try:
+            if finish:
+                # The optimizer works on files, so this is the one case that goes through disk
+                with tempfile.TemporaryDirectory(prefix='bionic_stream_') as work_dir:
+                    partial_path = os.path.join(work_dir, 'partial.pdf')
+                    finished_path = os.path.join(work_dir, 'finished.pdf')
+                    self.doc.save(partial_path, garbage=0)
+                    self.doc.close()
+                    finish(partial_path, finished_path)
+                    with open(finished_path, 'rb') as f:
+                        shutil.copyfileobj(f, self.stream)
+            else:
+                self.doc.save(OutputStream(self.stream), garbage=0)
+        finally:
+            self._close_doc()
+        self.pages_written += page_count
+        self.stream.flush()
+        return self.stream
+
+    def suspend(self, flush=True):
+        """Stop without finishing.
+
+        With a checkpoint the partial file and manifest stay on disk for
+        ``resume``, after saving the pages still in memory if ``flush`` is
+        set; without one this is the same as ``abort``.
+        """
+        if not self.checkpoint:
+            self.abort()
+            return
+        if flush:
+            self.flush()
+        self._close_doc()
+
+    def abort(self):
+        self._close_doc()
+        self._remove_files()
+
+    def _close_doc(self):
+        # Also called after close() failed half-way, when the document is already closed
+        if not self.doc.is_closed:
+            self.doc.close()
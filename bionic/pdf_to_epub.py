@@ -0,0 +1,201 @@
+import hashlib
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import fitz  # PyMuPDF
+
+from .cache import function_id
+from .control import JobControl
+from .epub_writer import DEFAULT_COMPRESS_LEVEL, EpubWriter
+from .metrics import PATH_EMPTY, PATH_IMAGE_ONLY, PATH_MIXED, PATH_TEXT_ONLY, ConversionMetrics
+from .page_ranges import parse_ranges
+from .pdf_converter import open_pdf, resolve_workers
+from .reading import bionic_reading as default_bionic_reading
+from .sources import source_name
+
+
+def _noop(*args):
+    pass
+
+
+# Image formats e-readers display; anything else extracted from a PDF (JPX, JBIG2, ...) becomes PNG
+EPUB_IMAGE_FORMATS = ('jpeg', 'png')
+
+
+def _prepare_image(data, ext, target_ext, max_px, jpeg_quality):
+    # Runs in a worker process: scale an oversized image down and/or re-encode it as target_ext
+    pix = fitz.Pixmap(data)
+    if pix.colorspace and pix.colorspace.n not in (1, 3):
+        pix = fitz.Pixmap(fitz.csRGB, pix)  # CMYK and friends
+    if max_px and max(pix.width, pix.height) > max_px:
+        scale = max_px / max(pix.width, pix.height)
+        pix = fitz.Pixmap(pix, max(1, round(pix.width * scale)), max(1, round(pix.height * scale)), None)
+    if target_ext == 'jpeg':
+        if pix.alpha:
+            pix = fitz.Pixmap(pix, 0)
+        return pix.tobytes('jpeg', jpg_quality=jpeg_quality)
+    return pix.tobytes('png')
+
+
+class EpubImageStore:
+    """Images of a PDF, each extracted and stored in the EPUB only once.
+
+    Images are looked up by xref first and then by a hash of their raw
+    stream, so a logo repeated on every page, even as separate copies in
+    the PDF, becomes one file referenced from every chapter. With
+    ``max_px`` set, images larger than that on their longer side are
+    scaled down (and JPEGs re-encoded at ``jpeg_quality``) in a process
+    pool by ``prepare``. ``write_ready`` writes the images that need no
+    more processing to an ``EpubWriter`` and lets go of their data.
+    """
+
+    def __init__(self, max_px=None, jpeg_quality=85):
+        self.max_px = max_px
+        self.jpeg_quality = jpeg_quality
+        self.by_xref = {}
+        self.by_digest = {}
+        self.images = []  # [file_name, data (None once written), ext, target_ext, needs_processing]
+        self.references = 0
+
+    def add(self, doc, xref):
+        """Return the EPUB file name for image ``xref`` of ``doc``."""
+        self.references += 1
+        file_name = self.by_xref.get(xref)
+        if file_name:
+            return file_name
+        digest = hashlib.sha256(doc.xref_object(xref, compressed=True).encode('utf-8'))
+        digest.update(doc.xref_stream_raw(xref) or b'')
+        digest = digest.hexdigest()
+        file_name = self.by_digest.get(digest)
+        if file_name is None:
+            base_image = doc.extract_image(xref)
+            ext = base_image['ext']
+            target_ext = ext if ext in EPUB_IMAGE_FORMATS else 'png'
+            oversized = bool(self.max_px) and max(base_image['width'], base_image['height']) > self.max_px
+            file_name = f'images/img_{len(self.images) + 1:04d}.{target_ext}'
+            self.images.append([file_name, base_image['image'], ext, target_ext, oversized or target_ext != ext])
+            self.by_digest[digest] = file_name
+        self.by_xref[xref] = file_name
+        return file_name
+
+    def prepare(self, workers=1):
+        # Convert/downscale the images that need it, in parallel when there are several
+        pending = [image for image in self.images if image[4] and image[1] is not None]
+        if not pending:
+            return
+        args = [(image[1], image[2], image[3], self.max_px, self.jpeg_quality) for image in pending]
+        workers = min(resolve_workers(workers), len(pending))
+        if workers > 1:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                results = list(pool.map(_prepare_image, *zip(*args)))
+        else:
+            results = [_prepare_image(*arg) for arg in args]
+        for image, data in zip(pending, results):
+            image[1] = data
+            image[4] = False
+
+    def write_ready(self, writer):
+        for index, image in enumerate(self.images):
+            file_name, data, _, target_ext, needs_processing = image
+            if data is not None and not needs_processing:
+                writer.add(file_name, data, f'image/{target_ext}', f'image_{index + 1}')
+                image[1] = None
+
+
+class PDFToEpubConverter:
+    """Experimental PDF to EPUB conversion: one chapter per page, images kept.
+
+    Each distinct image is stored once (see ``EpubImageStore``); with
+    ``max_image_px`` set, larger images are scaled down using ``workers``
+    processes. Stage timings are passed to ``metrics`` at the end, as for
+    the other converters, and ``control`` pauses or cancels between pages.
+    ``pages`` limits the conversion to a selection such as "1-20,45,100-".
+    As for ``bionic.pdf_converter.PDFConverter``, the PDF may be given in
+    memory and the EPUB written to an ``output_stream``.
+
+    The EPUB is streamed (see ``bionic.epub_writer``): each page's chapter
+    is written as soon as it is converted, and so is every image that
+    needs no scaling; text is deflated at ``compress_level``.
+    """
+
+    def __init__(self, file_path, output_dir, bionic_reading=default_bionic_reading,
+                 progress=None, saving=None, max_image_px=None, jpeg_quality=85, workers=1,
+                 metrics=None, metrics_log=None, control=None, pages=None, input_name=None, output_stream=None,
+                 compress_level=DEFAULT_COMPRESS_LEVEL):
+        self.file_path = file_path
+        self.input_name = source_name(file_path, input_name)
+        self.output_dir = output_dir
+        self.output_stream = output_stream
+        self.bionic_reading = bionic_reading
+        self.progress = progress or _noop
+        self.saving = saving or _noop
+        self.max_image_px = max_image_px
+        self.jpeg_quality = jpeg_quality
+        self.workers = workers
+        self.metrics = metrics or _noop
+        self.timings = ConversionMetrics(metrics_log, label=self.input_name)
+        self.control = control or JobControl()
+        self.pages = pages.strip() if pages and pages.strip() else None
+        self.compress_level = compress_level
+
+    def output_path(self):
+        return os.path.join(self.output_dir or '', os.path.splitext(self.input_name)[0] + '_bionic_images.epub')
+
+    def cache_params(self):
+        return {'mode': 'pdf2epub', 'bionic_reading': function_id(self.bionic_reading),
+                'max_image_px': self.max_image_px, 'jpeg_quality': self.jpeg_quality, 'pages': self.pages,
+                'compress_level': self.compress_level}
+
+    def run(self):
+        doc = open_pdf(self.file_path)
+        images = EpubImageStore(self.max_image_px, self.jpeg_quality)
+        timings = self.timings
+        out_path = self.output_path()
+        if self.output_stream is None:
+            os.makedirs(self.output_dir, exist_ok=True)
+            writer = EpubWriter(out_path, compress_level=self.compress_level)
+        else:
+            writer = EpubWriter(stream=self.output_stream, compress_level=self.compress_level)
+        try:
+            try:
+                page_numbers = parse_ranges(self.pages, len(doc))
+                total = len(page_numbers)
+                for n, i in enumerate(page_numbers):
+                    self.control.check()
+                    page = doc[i]
+                    timings.begin_page(i)
+                    # Images are stored once per distinct image and referenced from every page using them
+                    img_tags = []
+                    with timings.stage('images'):
+                        for img in page.get_images(full=True):
+                            img_src = images.add(doc, img[0])
+                            img_tags.append(f'<img src="{img_src}" style="max-width:100%;max-height:400px;display:block;margin:auto;"/>')
+                    # Extract text
+                    with timings.stage('extract'):
+                        text = page.get_text("text")
+                    with timings.stage('style'):
+                        bionic_html = self.bionic_reading(text).replace("\n", "<br>")
+                    body = ''.join(img_tags) + f'<div style="margin-top:10px">{bionic_html}</div>'
+                    # The chapter and the images that are ready go into the archive right away
+                    with timings.stage('save'):
+                        writer.add_chapter(f'page_{i+1}.xhtml', f'Page {i+1}', body)
+                        images.write_ready(writer)
+                    if text.strip():
+                        timings.end_page(PATH_MIXED if img_tags else PATH_TEXT_ONLY)
+                    else:
+                        timings.end_page(PATH_IMAGE_ONLY if img_tags else PATH_EMPTY)
+                    self.progress(int((n + 1) / total * 90))
+            finally:
+                doc.close()
+            print(f'{len(images.images)} distinct images for {images.references} image references')
+            with timings.stage('images'):
+                images.prepare(self.workers)
+            self.saving()
+            with timings.stage('save'):
+                images.write_ready(writer)
+                out_path = writer.close(os.path.splitext(self.input_name)[0] + ' (Bionic)', self.input_name, 'en')
+        except BaseException:
+            writer.abort()
+            raise
+        self.metrics(timings.finish())
+        return out_path
@@ -0,0 +1,112 @@
+import re
+from functools import lru_cache
+
+# A word is a run of Unicode letters, optionally joined by apostrophes
+# ("don't", "l’homme"). Digits, underscores, punctuation and whitespace are
+# left between words untouched, so "word," styles "word" and keeps the comma.
+_WORD_RE = re.compile(r"([^\W\d_]+(?:['’][^\W\d_]+)*)")
+
+# Styled fragments are cached per distinct word and per distinct
+# space-separated token ("word," / "(see"); these bound the two caches
+WORD_CACHE_SIZE = 65536
+TOKEN_CACHE_SIZE = 65536
+
+
+def _escape(text):
+    # Text between words goes into HTML, so escape markup characters
+    return text.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
+
+
+@lru_cache(maxsize=WORD_CACHE_SIZE)
+def style_word(word):
+    # Bold the first half of a word (all of it for words under 3 characters)
+    if len(word) < 3:
+        return f"<b>{word}</b>"
+    split = (len(word) + 1) // 2
+    return f"<b>{word[:split]}</b>{word[split:]}"
+
+
+def _transform(text):
+    # re.split with a capture group alternates [between, word, between, word, ..., between];
+    # the slice assignments keep the per-token loop in C
+    parts = _WORD_RE.split(text)
+    if '&' in text or '<' in text or '>' in text:
+        parts[0::2] = map(_escape, parts[0::2])
+    parts[1::2] = map(style_word, parts[1::2])
+    return ''.join(parts)
+
+
+@lru_cache(maxsize=TOKEN_CACHE_SIZE)
+def style_token(token):
+    # Tokens repeat far more often than they are new, so only run the regex on a cache miss
+    return _transform(token)
+
+
+def bionic_reading(text):
+    # Apply bionic reading: bold the first part of each word, preserving line breaks and spacing, using HTML <b> tags
+    return ' '.join(map(style_token, text.split(' ')))
+
+
+def bionic_lines(lines):
+    """Style a whole page's lines in one call; returns a list in the same order."""
+    token = style_token
+    return [' '.join(map(token, line.split(' '))) for line in lines]
+
+
+def split_word(word):
+    # The (bold, regular) halves used by style_word
+    if len(word) < 3:
+        return word, ''
+    split = (len(word) + 1) // 2
+    return word[:split], word[split:]
+
+
+@lru_cache(maxsize=TOKEN_CACHE_SIZE)
+def token_segments(token):
+    # Plain-text counterpart of style_token: a tuple of (text, bold) pairs
+    segments = []
+    plain = ''
+    parts = _WORD_RE.split(token)
+    for n, part in enumerate(parts):
+        if n % 2 == 0:
+            plain += part
+            continue
+        bold, rest = split_word(part)
+        if plain:
+            segments.append((plain, False))
+        segments.append((bold, True))
+        plain = rest
+    if plain:
+        segments.append((plain, False))
+    return tuple(segments)
+
+
+def bionic_segments(text):
+    """Split text into (text, bold) runs for writers that place glyphs directly.
+
+    Adjacent regular runs are merged, so a line alternates bold and regular.
+    """
+    segments = []
+    for n, token in enumerate(text.split(' ')):
+        if n:
+            if segments and not segments[-1][1]:
+                segments[-1] = (segments[-1][0] + ' ', False)
+            else:
+                segments.append((' ', False))
+        for segment in token_segments(token):
+            if not segment[1] and segments and not segments[-1][1]:
+                segments[-1] = (segments[-1][0] + segment[0], False)
+            else:
+                segments.append(segment)
+    return segments
+
+
+def cache_clear():
+    style_word.cache_clear()
+    style_token.cache_clear()
+    token_segments.cache_clear()
+
+
+def cache_info():
+    return {'words': style_word.cache_info(), 'tokens': style_token.cache_info(),
+            'segments': token_segments.cache_info()}
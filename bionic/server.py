@@ -0,0 +1,692 @@
+"""Local conversion daemon: a JSON-over-HTTP API in front of warm worker processes.
+
+``ConversionService`` starts ``workers`` processes when it starts. Each one
+imports PyMuPDF, lxml and the converters once and then runs one job at
+a time, so a job pays for neither interpreter start-up nor imports. Jobs
+wait in a queue of at most ``max_queue`` entries; when it is full new
+submissions are refused (HTTP 503 with Retry-After) instead of piling up.
+
+``serve`` runs the API on localhost or on a Unix socket:
+
+    POST   /jobs                submit: the document as the request body, options
+                                as query parameters (name, mode, format, pages,
+                                chapters, render, images, dpi, match_fonts, optimize,
+                                max_image_px, jpeg_quality, epub_compression); or a JSON body
+                                {"path": "/abs/input.pdf", "options": {...}} for a file
+                                under one of the server's ``path_roots``
+    GET    /jobs                all jobs
+    GET    /jobs/<id>           status, progress, error and stage metrics
+    GET    /jobs/<id>/progress  newline-delimited JSON status lines until the job ends
+    GET    /jobs/<id>/result    the converted file
+    DELETE /jobs/<id>           cancel the job, or forget a finished one and its files
+    GET    /health              worker and queue counts
+
+Uploaded inputs and results live in a per-job directory under
+``spool_dir``; finished jobs are forgotten after ``job_ttl`` seconds.
+
+Submitting by path lets a client have the daemon read files with the
+daemon user's permissions, so it is off unless ``path_roots`` names the
+directories clients may convert from.
+"""
+import collections
+import json
+import multiprocessing
+import os
+import queue
+import shutil
+import signal
+import socketserver
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from .cache import DEFAULT_MAX_BYTES, default_cache_dir
+from .converters import MODE_EPUB, MODE_PDF, MODE_PDF_TO_EPUB, choose_mode
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+DEFAULT_MAX_QUEUE = 16
+DEFAULT_JOB_TTL = 3600
+DEFAULT_MAX_UPLOAD_BYTES = 1024 * 1024 * 1024  # 1 GB
+
+STATUS_QUEUED = 'queued'
+STATUS_RUNNING = 'running'
+STATUS_DONE = 'done'
+STATUS_FAILED = 'failed'
+STATUS_CANCELLED = 'cancelled'
+FINISHED = (STATUS_DONE, STATUS_FAILED, STATUS_CANCELLED)
+
+_CONTENT_TYPES = {'.pdf': 'application/pdf', '.epub': 'application/epub+zip'}
+_TRUE = ('1', 'true', 'yes', 'on')
+
+
+class QueueFull(Exception):
+    """Raised by ``ConversionService.submit`` when ``max_queue`` jobs are already waiting."""
+
+
+def _flag(value):
+    return value if isinstance(value, bool) else str(value).lower() in _TRUE
+
+
+def _under_roots(path, roots):
+    # Whether ``path``, with symlinks resolved, is inside one of the (resolved) ``roots``
+    path = os.path.realpath(path)
+    return any(os.path.commonpath([root, path]) == root for root in roots)
+
+
+def job_options(mode, params):
+    """Converter keyword arguments for a job, from request parameters (strings or JSON values).
+
+    Mirrors the ``convert`` command line options; raises ValueError for
+    malformed numbers. Unknown render or image modes are reported by the
+    converter when the job runs.
+    """
+    def number(key, kind=int):
+        value = params.get(key)
+        if value in (None, ''):
+            return None
+        try:
+            return kind(value)
+        except (TypeError, ValueError):
+            raise ValueError(f"'{key}' must be a number") from None
+
+    kwargs = {}
+    if mode in (MODE_PDF, MODE_EPUB):
+        kwargs['checkpoint'] = False  # Job directories are not kept for a later run to resume from
+        kwargs['optimize'] = params.get('optimize') or None
+    if mode == MODE_EPUB:
+        kwargs['output_format'] = str(params.get('format') or 'EPUB').upper()
+        kwargs['chapters'] = params.get('chapters') or params.get('pages') or None
+    else:
+        kwargs['pages'] = params.get('pages') or None
+    if mode == MODE_PDF:
+        kwargs['render_mode'] = params.get('render') or 'html'
+        kwargs['image_mode'] = params.get('images') or 'raster'
+        kwargs['raster_dpi'] = number('dpi')
+        kwargs['match_fonts'] = _flag(params.get('match_fonts', False))
+    elif mode == MODE_PDF_TO_EPUB:
+        kwargs['max_image_px'] = number('max_image_px')
+        kwargs['jpeg_quality'] = number('jpeg_quality') or 85
+    compress_level = number('epub_compression')
+    if compress_level is not None and mode in (MODE_EPUB, MODE_PDF_TO_EPUB):
+        kwargs['compress_level'] = compress_level
+    return kwargs
+
+
+def _worker_main(index, tasks, events, cancel, cache_dir, cache_bytes, verbose):
+    # Runs in a worker process for the life of the service; Ctrl+C is handled by the parent, which stops it
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    if not verbose:
+        sys.stdout = open(os.devnull, 'w')  # Converter log lines
+    # Warm up: load PyMuPDF, lxml and the converters before the first job arrives
+    from . import epub_converter, pdf_converter, pdf_to_epub  # noqa: F401
+    from .cache import ConversionCache
+    from .control import ConversionCancelled, JobControl
+    from .converters import make_converter
+    cache = ConversionCache(cache_dir, max_bytes=cache_bytes) if cache_dir is not None else None
+    events.put(('ready', index, None))
+    while True:
+        task = tasks.get()
+        if task is None:
+            return
+        job_id, source, output_dir, mode, options = task
+        control = JobControl()
+        finished = threading.Event()
+
+        def watch_cancel():
+            while not finished.is_set():
+                if cancel.wait(0.2):
+                    control.cancel()
+                    return
+
+        last = [-1]
+
+        def progress(value):
+            if value != last[0]:
+                last[0] = value
+                events.put(('progress', index, (job_id, value)))
+
+        summaries = []
+        watcher = threading.Thread(target=watch_cancel, daemon=True)
+        watcher.start()
+        try:
+            converter = make_converter(source, output_dir, mode=mode, progress=progress,
+                                       metrics=summaries.append, control=control, **options)
+            out_path = cache.run(converter) if cache else converter.run()
+            events.put(('done', index, (job_id, out_path, summaries[-1] if summaries else None)))
+        except ConversionCancelled:
+            events.put(('cancelled', index, (job_id,)))
+        except Exception as e:
+            events.put(('failed', index, (job_id, str(e) or type(e).__name__)))
+        finally:
+            finished.set()
+            watcher.join()
+
+
+class Job:
+    """One conversion request and its state, as reported by the API."""
+
+    def __init__(self, job_id, name, source, mode, options, job_dir, output_dir=None):
+        self.id = job_id
+        self.name = name
+        self.source = source
+        self.mode = mode
+        self.options = options
+        self.job_dir = job_dir
+        self.output_dir = output_dir or os.path.join(job_dir, 'out')
+        self.status = STATUS_QUEUED
+        self.progress = 0
+        self.error = None
+        self.out_path = None
+        self.metrics = None
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.version = 0  # Bumped on every change, for progress streams
+
+    def to_dict(self):
+        info = {'id': self.id, 'name': self.name, 'mode': self.mode, 'status': self.status,
+                'progress': self.progress, 'created': self.created, 'started': self.started,
+                'finished': self.finished}
+        if self.error:
+            info['error'] = self.error
+        if self.status == STATUS_DONE:
+            info['result'] = f'/jobs/{self.id}/result'
+            info['output_name'] = os.path.basename(self.out_path)
+            info['metrics'] = self.metrics
+        return info
+
+
+class _Worker:
+    # The service's handle on one worker process
+
+    def __init__(self, index, context, events, args):
+        self.index = index
+        self.tasks = context.Queue()
+        self.cancel = context.Event()
+        self.job = None
+        self.ready = False
+        self.process = context.Process(target=_worker_main, args=(index, self.tasks, events, self.cancel) + args,
+                                       daemon=True)
+        self.process.start()
+
+
+class ConversionService:
+    """Runs conversion jobs on ``workers`` pre-started processes with a bounded queue.
+
+    ``cache_dir`` None disables the conversion cache; otherwise every
+    worker uses a ``bionic.cache.ConversionCache`` there (an empty string
+    picks the default directory). All methods are thread-safe.
+    """
+
+    def __init__(self, workers=1, max_queue=DEFAULT_MAX_QUEUE, spool_dir=None, cache_dir='',
+                 cache_bytes=DEFAULT_MAX_BYTES, job_ttl=DEFAULT_JOB_TTL, verbose=False):
+        self.workers = max(1, workers)
+        self.max_queue = max_queue
+        self.own_spool = spool_dir is None
+        self.spool_dir = spool_dir or tempfile.mkdtemp(prefix='bionic_serve_')
+        self.cache_dir = default_cache_dir() if cache_dir == '' else cache_dir
+        self.cache_bytes = cache_bytes
+        self.job_ttl = job_ttl
+        self.verbose = verbose
+        self.jobs = collections.OrderedDict()
+        self.pending = collections.deque()
+        self._changed = threading.Condition()  # Guards all job and worker state
+        self._context = multiprocessing.get_context('spawn')
+        self._events = None
+        self._workers = []
+        self._collector = None
+        self._running = False
+
+    # --- Lifecycle ---
+    def start(self):
+        os.makedirs(self.spool_dir, exist_ok=True)
+        self._events = self._context.Queue()
+        self._running = True
+        self._workers = [self._start_worker(n) for n in range(self.workers)]
+        self._collector = threading.Thread(target=self._collect, name='bionic-serve-events', daemon=True)
+        self._collector.start()
+
+    def _start_worker(self, index):
+        return _Worker(index, self._context, self._events, (self.cache_dir, self.cache_bytes, self.verbose))
+
+    @property
+    def running(self):
+        return self._running
+
+    def add_workers(self, count):
+        """Grow the pool to ``count`` worker processes; it does not shrink while running."""
+        with self._changed:
+            while self._running and len(self._workers) < count:
+                self._workers.append(self._start_worker(len(self._workers)))
+            self.workers = max(self.workers, count)
+            self._dispatch()
+
+    def stop(self):
+        with self._changed:
+            self._running = False
+            for job in list(self.pending):
+                self._finish(job, STATUS_CANCELLED)
+            self.pending.clear()
+            for worker in self._workers:
+                worker.cancel.set()
+                worker.tasks.put(None)
+            self._changed.notify_all()
+        for worker in self._workers:
+            worker.process.join(timeout=5)
+            if worker.process.is_alive():
+                worker.process.terminate()
+                worker.process.join()
+        if self._collector:
+            self._collector.join(timeout=2)
+        if self.own_spool:
+            shutil.rmtree(self.spool_dir, ignore_errors=True)
+
+    # --- Jobs ---
+    def queue_full(self):
+        with self._changed:
+            return len(self.pending) >= self.max_queue
+
+    def new_job_dir(self):
+        # A fresh directory for one job's input and output; returns (job id, path)
+        job_id = uuid.uuid4().hex
+        job_dir = os.path.join(self.spool_dir, job_id)
+        os.makedirs(job_dir)
+        return job_id, job_dir
+
+    def submit(self, source, params=None, name=None, job_id=None, job_dir=None, options=None, output_dir=None):
+        """Queue a conversion of the file at ``source``; returns its ``Job``.
+
+        ``params`` are the request options (see ``job_options``); in-process
+        callers can pass converter keyword ``options`` directly instead, and
+        an ``output_dir`` to write the result to rather than the job
+        directory. Raises QueueFull when ``max_queue`` jobs are already
+        waiting, ValueError for invalid options and RuntimeError once the
+        service has stopped.
+        """
+        params = params or {}
+        if job_dir is None:
+            job_id, job_dir = self.new_job_dir()
+        try:
+            mode = params.get('mode') or choose_mode(source, pdf_to_epub=_flag(params.get('pdf_to_epub', False)))
+            if mode not in (MODE_PDF, MODE_EPUB, MODE_PDF_TO_EPUB):
+                raise ValueError(f"Unknown conversion mode: {mode}")
+            if options is None:
+                options = job_options(mode, params)
+            job = Job(job_id, name or os.path.basename(source), source, mode, options, job_dir, output_dir)
+            with self._changed:
+                if not self._running:
+                    raise RuntimeError('The conversion service is stopped')
+                if len(self.pending) >= self.max_queue:
+                    raise QueueFull(f'{len(self.pending)} jobs are already waiting')
+                self.jobs[job.id] = job
+                self.pending.append(job)
+                self._dispatch()
+                self._changed.notify_all()
+        except BaseException:
+            shutil.rmtree(job_dir, ignore_errors=True)
+            raise
+        return job
+
+    def get(self, job_id):
+        with self._changed:
+            return self.jobs.get(job_id)
+
+    def list_jobs(self):
+        with self._changed:
+            return [job.to_dict() for job in self.jobs.values()]
+
+    def cancel(self, job_id):
+        """Cancel a queued or running job; returns False if there is no such job."""
+        with self._changed:
+            job = self.jobs.get(job_id)
+            if job is None:
+                return False
+            if job.status == STATUS_QUEUED:
+                self.pending.remove(job)
+                self._finish(job, STATUS_CANCELLED)
+            elif job.status == STATUS_RUNNING:
+                for worker in self._workers:
+                    if worker.job is job:
+                        worker.cancel.set()
+            return True
+
+    def remove(self, job_id):
+        """Forget a finished job and delete its files; running jobs are cancelled first."""
+        with self._changed:
+            job = self.jobs.get(job_id)
+            if job is None:
+                return False
+            if job.status not in FINISHED:
+                self.cancel(job_id)
+                return True
+            del self.jobs[job_id]
+        shutil.rmtree(job.job_dir, ignore_errors=True)
+        return True
+
+    def wait(self, job, version, timeout=None):
+        """Block until ``job`` changes from ``version`` (or it has finished); returns its state dict and version."""
+        with self._changed:
+            self._changed.wait_for(lambda: job.version != version or job.status in FINISHED or not self._running,
+                                   timeout)
+            return job.to_dict(), job.version
+
+    def stats(self):
+        with self._changed:
+            return {'workers': len(self._workers),
+                    'ready': sum(1 for worker in self._workers if worker.ready),
+                    'busy': sum(1 for worker in self._workers if worker.job is not None),
+                    'queued': len(self.pending), 'max_queue': self.max_queue, 'jobs': len(self.jobs)}
+
+    # --- Internals (called with self._changed held) ---
+    def _dispatch(self):
+        for worker in self._workers:
+            if not self.pending:
+                return
+            if worker.job is None and worker.process.is_alive():
+                job = self.pending.popleft()
+                worker.job = job
+                worker.cancel.clear()
+                job.status = STATUS_RUNNING
+                job.started = time.time()
+                job.version += 1
+                worker.tasks.put((job.id, job.source, job.output_dir, job.mode, job.options))
+
+    def _finish(self, job, status, error=None):
+        job.status = status
+        job.error = error
+        job.finished = time.time()
+        job.version += 1
+
+    def _worker_done(self, index):
+        worker = self._workers[index]
+        worker.job = None
+        if self._running:
+            self._dispatch()
+
+    def _handle(self, kind, index, value):
+        worker = self._workers[index]
+        if kind == 'ready':
+            worker.ready = True
+            return
+        job = worker.job
+        if job is None or job.id != value[0]:
+            return  # From a job the service already gave up on
+        if kind == 'progress':
+            job.progress = value[1]
+            job.version += 1
+            return
+        if kind == 'done':
+            job.out_path = value[1]
+            job.metrics = value[2]
+            job.progress = 100
+            self._finish(job, STATUS_DONE)
+        elif kind == 'cancelled':
+            self._finish(job, STATUS_CANCELLED)
+        else:
+            self._finish(job, STATUS_FAILED, value[1])
+        self._worker_done(index)
+
+    def _check_workers(self):
+        # Replace crashed workers; their job fails
+        for index, worker in enumerate(self._workers):
+            if self._running and not worker.process.is_alive():
+                if worker.job is not None:
+                    self._finish(worker.job, STATUS_FAILED,
+                                 f'Worker process exited unexpectedly (code {worker.process.exitcode})')
+                self._workers[index] = self._start_worker(index)
+        self._dispatch()
+
+    def _expire(self):
+        if not self.job_ttl:
+            return
+        cutoff = time.time() - self.job_ttl
+        for job in [job for job in self.jobs.values() if job.status in FINISHED and job.finished < cutoff]:
+            del self.jobs[job.id]
+            shutil.rmtree(job.job_dir, ignore_errors=True)
+
+    def _collect(self):
+        # Applies worker events to the jobs; also restarts crashed workers and drops expired jobs
+        last_check = time.monotonic()
+        while self._running:
+            try:
+                kind, index, value = self._events.get(timeout=0.5)
+            except queue.Empty:
+                kind = None
+            with self._changed:
+                if kind is not None:
+                    self._handle(kind, index, value)
+                if time.monotonic() - last_check >= 1:
+                    last_check = time.monotonic()
+                    self._check_workers()
+                    self._expire()
+                self._changed.notify_all()
+
+
+# --- HTTP front end ---
+class _Handler(BaseHTTPRequestHandler):
+    server_version = 'BionicConverter'
+
+    @property
+    def service(self):
+        return self.server.service
+
+    def address_string(self):
+        # Unix socket peers have no address
+        return self.client_address[0] if isinstance(self.client_address, tuple) else 'local'
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def send_json(self, status, body, headers=None):
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def send_error_json(self, status, message, headers=None):
+        self.send_json(status, {'error': message}, headers)
+
+    def route(self):
+        # (job, sub-resource) for /jobs/<id>[/<sub>] paths; job is None for unknown ids
+        parts = [part for part in urlsplit(self.path).path.split('/') if part]
+        if len(parts) in (2, 3) and parts[0] == 'jobs':
+            return self.service.get(parts[1]), (parts[2] if len(parts) == 3 else None)
+        return None, None
+
+    def do_GET(self):
+        path = urlsplit(self.path).path.rstrip('/')
+        if path == '/health':
+            return self.send_json(200, self.service.stats())
+        if path == '/jobs':
+            return self.send_json(200, {'jobs': self.service.list_jobs()})
+        job, sub = self.route()
+        if job is None:
+            return self.send_error_json(404, 'No such job')
+        if sub is None:
+            return self.send_json(200, job.to_dict())
+        if sub == 'progress':
+            return self.stream_progress(job)
+        if sub == 'result':
+            return self.send_result(job)
+        self.send_error_json(404, 'Not found')
+
+    def stream_progress(self, job):
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-ndjson')
+        self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+        version = None
+        while True:
+            info, version = self.service.wait(job, version, timeout=15)
+            try:
+                self.wfile.write(json.dumps(info).encode('utf-8') + b'\n')
+                self.wfile.flush()
+            except OSError:
+                return  # Client went away
+            if info['status'] in FINISHED or not self.service.running:
+                return
+
+    def send_result(self, job):
+        if job.status != STATUS_DONE:
+            return self.send_error_json(409, f'Job is {job.status}')
+        out_path = job.out_path
+        try:
+            f = open(out_path, 'rb')
+        except OSError:
+            return self.send_error_json(410, 'Result is no longer available')
+        with f:
+            self.send_response(200)
+            self.send_header('Content-Type', _CONTENT_TYPES.get(os.path.splitext(out_path)[1].lower(),
+                                                                'application/octet-stream'))
+            self.send_header('Content-Length', str(os.fstat(f.fileno()).st_size))
+            self.send_header('Content-Disposition', f'attachment; filename="{os.path.basename(out_path)}"')
+            self.end_headers()
+            shutil.copyfileobj(f, self.wfile)
+
+    def do_POST(self):
+        if urlsplit(self.path).path.rstrip('/') != '/jobs':
+            return self.send_error_json(404, 'Not found')
+        if not self.service.running:
+            return self.send_error_json(503, 'The conversion service is stopped')
+        if self.service.queue_full():
+            # Refuse before reading the upload
+            return self.send_error_json(503, 'Queue is full', {'Retry-After': '1'})
+        params = {key: values[-1] for key, values in parse_qs(urlsplit(self.path).query).items()}
+        length = self.headers.get('Content-Length')
+        if length is None:
+            return self.send_error_json(411, 'Content-Length required')
+        try:
+            length = int(length)
+        except ValueError:
+            length = -1
+        if length < 0:
+            return self.send_error_json(400, 'Content-Length must be a non-negative integer')
+        job_dir = None
+        try:
+            if self.headers.get('Content-Type', '').split(';')[0].strip() == 'application/json':
+                body = json.loads(self.rfile.read(length) or b'{}')
+                if not isinstance(body, dict):
+                    return self.send_error_json(400, 'The JSON body must be an object')
+                options = body.get('options')
+                if options is not None and not isinstance(options, dict):
+                    return self.send_error_json(400, "'options' must be a JSON object")
+                source = body.get('path')
+                if not isinstance(source, str) or not os.path.isabs(source) or not os.path.isfile(source):
+                    return self.send_error_json(400, "'path' must be the absolute path of an existing file")
+                if not _under_roots(source, self.server.path_roots):
+                    return self.send_error_json(403, "'path' is not under a directory this server converts from")
+                params.update(options or {})
+                job = self.service.submit(source, params, name=params.get('name'))
+            else:
+                if length > self.server.max_upload:
+                    return self.send_error_json(413, f'Upload larger than {self.server.max_upload} bytes')
+                job_id, job_dir = self.service.new_job_dir()
+                source = self.receive_upload(job_dir, params.get('name'), length)
+                job = self.service.submit(source, params, name=params.get('name'), job_id=job_id, job_dir=job_dir)
+        except QueueFull as e:
+            return self.send_error_json(503, str(e), {'Retry-After': '1'})
+        except RuntimeError as e:
+            # The service stopped while the request was being read
+            return self.send_error_json(503, str(e))
+        except (ValueError, KeyError) as e:
+            if job_dir:
+                shutil.rmtree(job_dir, ignore_errors=True)
+            return self.send_error_json(400, str(e))
+        self.send_json(202, job.to_dict(), {'Location': f'/jobs/{job.id}'})
+
+    def receive_upload(self, job_dir, name, length):
+        # Spool the request body to the job directory in blocks; returns the input path
+        first = self.rfile.read(min(length, 1024 * 1024))
+        if not name:
+            name = 'input.epub' if first[:2] == b'PK' else 'input.pdf'
+        name = os.path.basename(name.replace('\\', '/')) or 'input'
+        path = os.path.join(job_dir, name)
+        remaining = length - len(first)
+        with open(path, 'wb') as f:
+            f.write(first)
+            while remaining > 0:
+                block = self.rfile.read(min(remaining, 1024 * 1024))
+                if not block:
+                    raise ValueError('Upload ended early')
+                f.write(block)
+                remaining -= len(block)
+        return path
+
+    def do_DELETE(self):
+        job, sub = self.route()
+        if job is None or sub is not None:
+            return self.send_error_json(404, 'No such job')
+        # A finished job is forgotten; a queued or running one is cancelled and reported
+        finished = job.status in FINISHED
+        self.service.remove(job.id)
+        self.send_json(200, {'id': job.id, 'removed': True} if finished else job.to_dict())
+
+
+class _TCPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+
+class _UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def make_server(service, host=DEFAULT_HOST, port=DEFAULT_PORT, socket_path=None,
+                max_upload=DEFAULT_MAX_UPLOAD_BYTES, verbose=False, path_roots=()):
+    """An HTTP server for ``service`` on host:port, or on a Unix socket at ``socket_path``.
+
+    Port 0 picks a free port (see ``server.server_address``). JSON
+    submissions by path are accepted only for files under ``path_roots``
+    (symlinks resolved); with none, only uploads are.
+    """
+    if socket_path:
+        if os.path.exists(socket_path):
+            os.remove(socket_path)  # Left over from an earlier run
+        server = _UnixServer(socket_path, _Handler)
+    else:
+        server = _TCPServer((host, port), _Handler)
+    server.service = service
+    server.max_upload = max_upload
+    server.verbose = verbose
+    server.path_roots = tuple(os.path.realpath(root) for root in path_roots)
+    return server
+
+
+def _interrupt(signum, frame):
+    raise KeyboardInterrupt
+
+
+def serve(host=DEFAULT_HOST, port=DEFAULT_PORT, socket_path=None, workers=1, max_queue=DEFAULT_MAX_QUEUE,
+          spool_dir=None, cache_dir='', cache_bytes=DEFAULT_MAX_BYTES, job_ttl=DEFAULT_JOB_TTL,
+          max_upload=DEFAULT_MAX_UPLOAD_BYTES, verbose=False, path_roots=()):
+    """Run the daemon until interrupted (KeyboardInterrupt is passed on after shutting down).
+
+    SIGTERM stops it the same way as Ctrl+C.
+    """
+    if threading.current_thread() is threading.main_thread():
+        signal.signal(signal.SIGTERM, _interrupt)
+    service = ConversionService(workers, max_queue, spool_dir=spool_dir, cache_dir=cache_dir,
+                                cache_bytes=cache_bytes, job_ttl=job_ttl, verbose=verbose)
+    service.start()
+    try:
+        server = make_server(service, host, port, socket_path, max_upload=max_upload, verbose=verbose,
+                             path_roots=path_roots)
+        with server:
+            address = socket_path or 'http://%s:%d' % server.server_address[:2]
+            print(f'Listening on {address} with {service.workers} worker processes', file=sys.stderr, flush=True)
+            try:
+                server.serve_forever()
+            finally:
+                if socket_path and os.path.exists(socket_path):
+                    os.remove(socket_path)
+    finally:
+        service.stop()
@@ -0,0 +1,265 @@
+"""Optimize converted PDFs for size.
+
+Presets are cumulative tiers:
+
+- ``fast``: drop unused objects and compress uncompressed streams. Quick
+  even on large files.
+- ``fonts``: also subset embedded fonts to the glyphs used and merge
+  duplicate objects (HTML-rendered lines in other scripts or with custom
+  styling embed the same font many times). This is what shrinking always
+  did, plus subsetting.
+- ``images``: also recompress images, as JPEG or Flate whichever is
+  smaller, and downsample those shown above ``max_dpi``. Images are
+  decoded and encoded in ``workers`` processes.
+
+``optimize_pdf`` reports the bytes saved by each phase. ``shrink_in_process``
+runs it in a child process so a GUI stays responsive (PyMuPDF holds the
+GIL while it saves).
+"""
+import multiprocessing
+import os
+import queue
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import fitz  # PyMuPDF
+
+from .pdf_converter import resolve_workers
+
+PRESET_FAST = 'fast'
+PRESET_FONTS = 'fonts'
+PRESET_IMAGES = 'images'
+PRESETS = (PRESET_FAST, PRESET_FONTS, PRESET_IMAGES)
+DEFAULT_PRESET = PRESET_FONTS
+
+DEFAULT_MAX_DPI = 150
+DEFAULT_JPEG_QUALITY = 75
+
+# Images with less data than this are left alone
+MIN_IMAGE_BYTES = 16 * 1024
+
+
+def _noop(*args):
+    pass
+
+
+def shrunk_output_path(input_path, output_dir):
+    base_name = os.path.splitext(os.path.basename(input_path))[0]
+    if base_name.endswith('_bionic'):
+        base_name = base_name[:-len('_bionic')]
+    return os.path.join(output_dir, f'{base_name}_bionic_shrunk.pdf')
+
+
+def _recompress_images(pdf_path, jobs, jpeg_quality):
+    # Runs in a worker process: re-encode (xref, scale, current_bytes) images of pdf_path.
+    # Returns (xref, data, filter, colorspace, width, height, bytes before) for the ones that got smaller.
+    results = []
+    doc = fitz.open(pdf_path)
+    try:
+        for xref, scale, current_bytes in jobs:
+            try:
+                pix = fitz.Pixmap(doc, xref)
+            except Exception:
+                continue
+            if pix.alpha:
+                pix = fitz.Pixmap(pix, 0)
+            if not pix.colorspace or pix.colorspace.n not in (1, 3):
+                pix = fitz.Pixmap(fitz.csRGB, pix)
+            if scale < 1:
+                pix = fitz.Pixmap(pix, max(1, int(pix.width * scale)), max(1, int(pix.height * scale)), None)
+            if current_bytes is None:
+                # Unfiltered stream: saving with deflate would compress it anyway, so compare against that
+                current_bytes = len(zlib.compress(doc.xref_stream_raw(xref), 6))
+            flate = zlib.compress(pix.samples, 6)
+            jpeg = pix.tobytes('jpeg', jpg_quality=jpeg_quality)
+            data, image_filter = (jpeg, '/DCTDecode') if len(jpeg) < len(flate) else (flate, '/FlateDecode')
+            if len(data) < current_bytes * 0.9:
+                colorspace = '/DeviceGray' if pix.colorspace.n == 1 else '/DeviceRGB'
+                results.append((xref, data, image_filter, colorspace, pix.width, pix.height, current_bytes))
+    finally:
+        doc.close()
+    return results
+
+
+def _image_jobs(doc, max_dpi):
+    # (xref, scale, current compressed size or None) for every image worth re-encoding
+    shown = {}  # xref -> largest displayed size in points
+    for page in doc:
+        for info in page.get_image_info(xrefs=True):
+            xref = info['xref']
+            if xref <= 0:
+                continue
+            bbox = fitz.Rect(info['bbox'])
+            shown[xref] = max(shown.get(xref, 0), bbox.width, bbox.height)
+    jobs = []
+    for xref, points in shown.items():
+        if doc.xref_get_key(xref, 'SMask')[0] != 'null' or doc.xref_get_key(xref, 'ImageMask')[1] == 'true':
+            continue  # Transparency and stencil masks would be lost
+        if doc.xref_get_key(xref, 'BitsPerComponent')[1] not in ('8', '16'):
+            continue  # Bitonal and palette images are already compact
+        length = doc.xref_get_key(xref, 'Length')
+        raw_bytes = int(length[1]) if length[0] == 'int' else len(doc.xref_stream_raw(xref) or b'')
+        if raw_bytes < MIN_IMAGE_BYTES:
+            continue
+        width = int(doc.xref_get_key(xref, 'Width')[1] or 0)
+        height = int(doc.xref_get_key(xref, 'Height')[1] or 0)
+        scale = 1.0
+        if max_dpi and points:
+            dpi = max(width, height) / (points / 72)
+            if dpi > max_dpi * 1.1:
+                scale = max_dpi / dpi
+        filtered = doc.xref_get_key(xref, 'Filter')[0] != 'null'
+        jobs.append((xref, scale, raw_bytes if filtered else None))
+    return jobs
+
+
+def _replace_image(doc, xref, data, image_filter, colorspace, width, height):
+    doc.update_stream(xref, data, compress=False)
+    doc.xref_set_key(xref, 'Filter', image_filter)
+    doc.xref_set_key(xref, 'ColorSpace', colorspace)
+    doc.xref_set_key(xref, 'Width', str(width))
+    doc.xref_set_key(xref, 'Height', str(height))
+    doc.xref_set_key(xref, 'BitsPerComponent', '8')
+    for key in ('DecodeParms', 'Decode'):
+        doc.xref_set_key(xref, key, 'null')
+
+
+def _font_bytes(doc):
+    # Total size of the embedded font programs
+    total = 0
+    for xref in range(1, doc.xref_length()):
+        try:
+            if doc.xref_get_key(xref, 'Type')[1] != '/FontDescriptor':
+                continue
+        except Exception:
+            continue  # Free entry, e.g. a duplicate font removed by bionic.fonts.share_fonts
+        for key in ('FontFile', 'FontFile2', 'FontFile3'):
+            kind, value = doc.xref_get_key(xref, key)
+            if kind == 'xref':
+                total += len(doc.xref_stream_raw(int(value.split()[0])) or b'')
+    return total
+
+
+def optimize_pdf(input_path, out_path, preset=DEFAULT_PRESET, workers=1, max_dpi=DEFAULT_MAX_DPI,
+                 jpeg_quality=DEFAULT_JPEG_QUALITY, progress=None):
+    """Write an optimized copy of ``input_path`` to ``out_path``.
+
+    ``progress`` is called with an int percentage. Returns a report dict:
+    input and output sizes and, per phase, the bytes saved and seconds taken.
+    """
+    if preset not in PRESETS:
+        raise ValueError(f"Unknown optimize preset: {preset}")
+    progress = progress or _noop
+    workers = resolve_workers(workers)
+    input_bytes = os.path.getsize(input_path)
+    phases = []
+    doc = fitz.open(input_path)
+    try:
+        if preset == PRESET_IMAGES:
+            start = time.perf_counter()
+            jobs = _image_jobs(doc, max_dpi)
+            saved = 0
+            # Several batches per worker so progress moves and slow images don't stall one process
+            batch_size = max(1, -(-len(jobs) // (workers * 4)))
+            batches = [jobs[i:i + batch_size] for i in range(0, len(jobs), batch_size)]
+            if workers > 1 and len(batches) > 1:
+                with ProcessPoolExecutor(max_workers=workers) as pool:
+                    futures = [pool.submit(_recompress_images, input_path, batch, jpeg_quality) for batch in batches]
+                    for n, future in enumerate(as_completed(futures)):
+                        for xref, data, image_filter, colorspace, width, height, before in future.result():
+                            _replace_image(doc, xref, data, image_filter, colorspace, width, height)
+                            saved += before - len(data)
+                        progress(int((n + 1) / len(batches) * 50))
+            else:
+                for n, batch in enumerate(batches):
+                    for xref, data, image_filter, colorspace, width, height, before in \
+                            _recompress_images(input_path, batch, jpeg_quality):
+                        _replace_image(doc, xref, data, image_filter, colorspace, width, height)
+                        saved += before - len(data)
+                    progress(int((n + 1) / len(batches) * 50))
+            phases.append({'phase': 'images', 'saved_bytes': saved, 'seconds': time.perf_counter() - start,
+                           'images': len(jobs)})
+        if preset in (PRESET_FONTS, PRESET_IMAGES):
+            start = time.perf_counter()
+            before = _font_bytes(doc)
+            doc.subset_fonts()
+            phases.append({'phase': 'fonts', 'saved_bytes': before - _font_bytes(doc),
+                           'seconds': time.perf_counter() - start})
+            progress(70)
+        start = time.perf_counter()
+        if preset == PRESET_FAST:
+            doc.save(out_path, garbage=1, deflate=True, deflate_images=True, deflate_fonts=True)
+        else:
+            # Full garbage collection merges the duplicate fonts and images left by the converters
+            doc.save(out_path, garbage=4, clean=True, deflate=True, deflate_images=True, deflate_fonts=True,
+                     use_objstms=1)
+    finally:
+        doc.close()
+    output_bytes = os.path.getsize(out_path)
+    earlier = sum(phase['saved_bytes'] for phase in phases)
+    phases.append({'phase': 'save', 'saved_bytes': input_bytes - earlier - output_bytes,
+                   'seconds': time.perf_counter() - start})
+    progress(100)
+    return {'preset': preset, 'input_bytes': input_bytes, 'output_bytes': output_bytes, 'phases': phases}
+
+
+def format_report(report):
+    """One line per phase, for logs and the console."""
+    def mb(size):
+        return f'{size / (1024 * 1024):.1f} MB'
+    lines = [f"{mb(report['input_bytes'])} -> {mb(report['output_bytes'])} ({report['preset']} preset)"]
+    for phase in report['phases']:
+        lines.append(f"  {phase['phase']:<7} saved {mb(phase['saved_bytes']):>9} in {phase['seconds']:.1f}s")
+    return '\n'.join(lines)
+
+
+def shrink_pdf(input_path, output_dir, preset=DEFAULT_PRESET, workers=1, progress=None):
+    """Write an optimized copy of a converted PDF next to it (see ``optimize_pdf``)."""
+    print(f"Shrinking PDF: {input_path}")
+    os.makedirs(output_dir, exist_ok=True)  # Ensure it exists
+    shrunk_out_path = shrunk_output_path(input_path, output_dir)
+    report = optimize_pdf(input_path, shrunk_out_path, preset, workers=workers, progress=progress)
+    print(format_report(report))
+    print(f"PDF shrunk successfully: {shrunk_out_path}")
+    return shrunk_out_path
+
+
+def _shrink_child(messages, input_path, output_dir, preset, workers):
+    # Runs in the child process started by shrink_in_process
+    try:
+        os.makedirs(output_dir, exist_ok=True)
+        out_path = shrunk_output_path(input_path, output_dir)
+        report = optimize_pdf(input_path, out_path, preset, workers=workers,
+                              progress=lambda value: messages.put(('progress', value)))
+        messages.put(('done', (out_path, report)))
+    except Exception as e:
+        messages.put(('error', str(e)))
+
+
+def shrink_in_process(input_path, output_dir, preset=DEFAULT_PRESET, workers=1, progress=None):
+    """Like ``shrink_pdf``, in a separate process; returns (output path, report).
+
+    Progress from the child is relayed to ``progress`` in the calling thread.
+    """
+    progress = progress or _noop
+    context = multiprocessing.get_context('spawn')
+    messages = context.Queue()
+    process = context.Process(target=_shrink_child, args=(messages, input_path, output_dir, preset, workers))
+    process.start()
+    try:
+        while True:
+            try:
+                kind, value = messages.get(timeout=0.5)
+            except queue.Empty:
+                if not process.is_alive():
+                    raise RuntimeError(f'Optimizer process exited unexpectedly (code {process.exitcode})')
+                continue
+            if kind == 'progress':
+                progress(value)
+            elif kind == 'done':
+                return value
+            else:
+                raise RuntimeError(value)
+    finally:
+        process.join()
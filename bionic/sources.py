@@ -0,0 +1,145 @@
+"""Conversion input held in memory and output written to a stream.
+
+Converters take either a file path or the document itself as bytes,
+bytearray, memoryview or ``mmap.mmap`` (e.g. a file mapped read-only).
+PyMuPDF reads such input in place (``fitz.open(stream=memoryview(...))``)
+and EPUB archives are opened through a ``MemoryReader`` over the same
+memory, so nothing is copied to disk. Output can go to any writable binary stream, such as
+``sys.stdout.buffer``, through ``OutputStream``.
+
+This module does not import PyMuPDF, so the cache and the CLI parser
+can use it cheaply.
+"""
+import hashlib
+import io
+import mmap
+import os
+import stat
+import sys
+
+STREAM_TYPES = (bytes, bytearray, memoryview, mmap.mmap)
+
+# Base name for outputs and logs of in-memory input given no name
+DEFAULT_NAME = 'stream'
+
+# The two first bytes of a ZIP archive, and so of an EPUB
+ZIP_MAGIC = b'PK'
+
+
+def is_stream(source):
+    return isinstance(source, STREAM_TYPES)
+
+
+def source_name(source, name=None):
+    """The file name shown for ``source``: ``name`` if given, else the path's base name."""
+    if name:
+        return os.path.basename(name)
+    if is_stream(source):
+        return DEFAULT_NAME
+    return os.path.basename(source)
+
+
+def looks_like_epub(source):
+    return bytes(memoryview(source)[:2]) == ZIP_MAGIC
+
+
+def source_digest(source, digest=None):
+    """Hash the content of a path or in-memory source into ``digest`` (SHA-256 by default)."""
+    digest = digest or hashlib.sha256()
+    if is_stream(source):
+        digest.update(memoryview(source))
+    else:
+        with open(source, 'rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(block)
+    return digest
+
+
+class MemoryReader(io.RawIOBase):
+    """Read-only, seekable file object over a buffer, without copying it."""
+
+    def __init__(self, source):
+        self._view = memoryview(source).cast('B')
+        self._pos = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def readinto(self, buffer):
+        data = self._view[self._pos:self._pos + len(buffer)]
+        buffer[:len(data)] = data
+        self._pos += len(data)
+        return len(data)
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self._pos
+        elif whence == io.SEEK_END:
+            offset += len(self._view)
+        if offset < 0:
+            raise ValueError('negative seek position')
+        self._pos = offset
+        return offset
+
+    def tell(self):
+        return self._pos
+
+    def close(self):
+        self._view.release()
+        super().close()
+
+
+def epub_file(source):
+    # What zipfile.ZipFile accepts for source: a path, or a file object (raw bytes would be taken for a path)
+    if is_stream(source):
+        return MemoryReader(source)
+    return source
+
+
+class OutputStream:
+    """Write-only adapter that lets ``Document.save`` write to any binary stream.
+
+    PyMuPDF saves to the path of file objects that have a ``name`` (stdout
+    is named '<stdout>') and asks for the position, which a pipe cannot
+    tell; this wrapper hides the name and counts the bytes written.
+    """
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.position = 0
+
+    def write(self, data):
+        self.stream.write(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        # Non-incremental saves only write forward
+        if (whence, offset) not in ((io.SEEK_SET, self.position), (io.SEEK_CUR, 0), (io.SEEK_END, 0)):
+            raise io.UnsupportedOperation('output stream is write-only')
+        return self.position
+
+    def truncate(self, size=None):
+        return self.position
+
+    def flush(self):
+        self.stream.flush()
+
+
+def stdin_source():
+    """Standard input as a source: mapped when it is a regular file, otherwise read into memory."""
+    stream = sys.stdin.buffer
+    try:
+        fd = stream.fileno()
+        st = os.fstat(fd)
+        if stat.S_ISREG(st.st_mode) and st.st_size:
+            return mmap.mmap(fd, 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError, io.UnsupportedOperation):
+        pass
+    return stream.read()
@@ -0,0 +1,234 @@
+"""Place bionic text directly on the page instead of using insert_htmlbox.
+
+insert_htmlbox runs the Story HTML layout engine for every line. Here each
+span is written at its original baseline and font size as alternating bold
+and regular runs, with word advances looked up in cached glyph-width tables.
+The text operators go straight into the page's content stream, the same way
+page.insert_text does, but with one stream per page rather than per call
+(fitz.TextWriter re-measures all of its text on every append, which costs
+more than the whole page layout here).
+
+``LineTextWriter`` does the same for the HTML render mode: whole lines in
+the embedded faces of a ``bionic.fonts.FontRegistry``, at the size and
+baseline of each line's dominant source span, with the fit of every line
+on a page worked out at once from the arrays of ``bionic.extract.PageLines``.
+"""
+from functools import lru_cache
+
+import fitz  # PyMuPDF
+import numpy as np
+
+from .reading import bionic_segments
+
+# Base-14 faces used for the output text ("helv" / Helvetica-Bold). They use
+# WinAnsi encoding, so this writer covers Latin text; lines with other
+# characters are left to the caller (see GlyphTextWriter.page_operators).
+REGULAR_FONT = 'helv'
+BOLD_FONT = 'hebo'
+ENCODING = 'cp1252'
+
+_fonts = {}
+_width_tables = {}
+
+
+def get_font(fontname):
+    font = _fonts.get(fontname)
+    if font is None:
+        font = _fonts[fontname] = fitz.Font(fontname)
+    return font
+
+
+def width_table(fontname, size):
+    """Per-(font, size) dict of character -> advance, filled lazily."""
+    key = (fontname, round(size, 2))
+    table = _width_tables.get(key)
+    if table is None:
+        table = _width_tables[key] = {}
+    return table
+
+
+def text_width(fontname, size, text):
+    table = width_table(fontname, size)
+    width = 0.0
+    for char in text:
+        advance = table.get(char)
+        if advance is None:
+            advance = table[char] = get_font(fontname).glyph_advance(ord(char)) * size
+        width += advance
+    return width
+
+
+def encode_text(text):
+    # Characters outside WinAnsi become '?', matching what the font can show
+    return text.encode(ENCODING, 'replace')
+
+
+def encodable(text):
+    # Whether the base-14 faces can show all of text
+    try:
+        text.encode(ENCODING)
+    except UnicodeEncodeError:
+        return False
+    return True
+
+
+@lru_cache(maxsize=65536)
+def measure_run(fontname, size, text):
+    # (hex string operand, advance width) for one run; runs repeat as often as words do
+    encoded = encode_text(text)
+    return encoded.hex(), text_width(fontname, size, encoded.decode(ENCODING))
+
+
+def append_contents(page, data):
+    """Add ``data`` as drawing commands on top of the page's existing content."""
+    doc = page.parent
+    xrefs = page.get_contents()
+    if xrefs:
+        # Isolate the existing content so its graphics state can't leak into ours
+        page.wrap_contents()
+        xrefs = page.get_contents()
+        doc.update_stream(xrefs[-1], doc.xref_stream(xrefs[-1]) + b'\n' + data)
+    else:
+        xref = doc.get_new_xref()
+        doc.update_object(xref, '<<>>')
+        doc.update_stream(xref, data)
+        page.set_contents(xref)
+
+
+class GlyphTextWriter:
+    """Write the text lines of a page (``bionic.extract.TextLine`` with spans) onto a new page."""
+
+    def __init__(self, regular_font=REGULAR_FONT, bold_font=BOLD_FONT):
+        self.regular_font = regular_font
+        self.bold_font = bold_font
+
+    def layout_span(self, span):
+        # Returns [(hex text, fontname)] and the font size that fits the span's width.
+        # Tj advances the text cursor by each run's width, so runs need no positions of their own.
+        size = round(span.size, 2)
+        runs = []
+        width = 0.0
+        for text, bold in bionic_segments(span.text):
+            fontname = self.bold_font if bold else self.regular_font
+            hex_text, advance = measure_run(fontname, size, text)
+            runs.append((hex_text, fontname))
+            width += advance
+        available = span.x1 - span.x0
+        if width > available > 0:
+            # Bold glyphs are wider than the source font; shrink to stay inside the original box
+            size = round(size * available / width, 2)
+        return runs, size
+
+    def page_operators(self, lines):
+        """PDF text operators in page (top-left origin) coordinates; glyphs are flipped back by Tm.
+
+        Lines with characters outside WinAnsi would come out as '?', so they
+        are left out. Returns (operators, indexes of the lines left out).
+        """
+        ops = []
+        skipped = []
+        current_font = None
+        current_color = None
+        for n, line in enumerate(lines):
+            if not all(encodable(span.text) for span in line.spans):
+                skipped.append(n)
+                continue
+            for span in line.spans:
+                if not span.text.strip():
+                    continue
+                color = span.color
+                if color != current_color:
+                    r, g, b = fitz.sRGB_to_pdf(color)
+                    ops.append(f'{r:g} {g:g} {b:g} rg')
+                    current_color = color
+                runs, size = self.layout_span(span)
+                ops.append('1 0 0 -1 %.2f %.2f Tm' % span.origin)
+                for hex_text, fontname in runs:
+                    if (fontname, size) != current_font:
+                        ops.append(f'/{fontname} {size} Tf')
+                        current_font = (fontname, size)
+                    ops.append(f'<{hex_text}>Tj')
+        return ops, skipped
+
+    def write_page(self, new_page, lines):
+        # Returns the indexes of the lines left out, as page_operators does
+        ops, skipped = self.page_operators(lines)
+        self.write_operators(new_page, ops)
+        return skipped
+
+    def write_operators(self, new_page, ops):
+        # Add the output of page_operators to new_page
+        if not ops:
+            return
+        new_page.insert_font(fontname=self.regular_font)
+        new_page.insert_font(fontname=self.bold_font)
+        # Map page coordinates (y down) to PDF user space for any mediabox/rotation
+        a, b, c, d, e, f = ~new_page.transformation_matrix
+        content = f'q {a:g} {b:g} {c:g} {d:g} {e:g} {f:g} cm BT\n' + '\n'.join(ops) + '\nET Q'
+        append_contents(new_page, content.encode('latin-1'))
+
+
+class LineTextWriter:
+    """Write bionic lines in a ``FontRegistry``'s embedded faces at their source font size."""
+
+    def __init__(self, registry):
+        self.registry = registry
+
+    def line_runs(self, text, family):
+        # [(hex glyph ids, face)] of the line's bold and regular runs, and their advance at 1pt
+        registry = self.registry
+        runs = []
+        width = 0.0
+        for segment, bold in bionic_segments(text):
+            face = registry.face(family, bold)
+            hex_ids, advance = registry.encode(face, segment)
+            runs.append((hex_ids, face))
+            width += advance
+        return runs, width
+
+    def page_operators(self, lines, families):
+        """Operators for the lines (``bionic.extract.PageLines``) the faces cover, one family per line.
+
+        Each line starts at its source box and baseline in the size of its
+        dominant span. Bold runs are wider than the source text, so a line
+        may run on to the right edge of its column and only shrinks if it
+        would pass that. Lines with characters the faces lack, or without
+        room for any size, are left out. Returns (operators, faces used,
+        indexes of the lines left out).
+        """
+        ops = []
+        faces = set()
+        skipped = []
+        line_runs = []
+        widths = np.zeros(len(lines))
+        for n, (text, family) in enumerate(zip(lines.text, families)):
+            if self.registry.covers(family, text):
+                runs, widths[n] = self.line_runs(text, family)
+                line_runs.append(runs)
+            else:
+                skipped.append(n)
+                line_runs.append(None)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            fitted = np.where(widths > 0, (lines.column_x1 - lines.x0) / widths, np.inf)
+        sizes = np.round(np.minimum(np.minimum(lines.size, fitted), lines.y1 - lines.y0), 2)
+        resource_name = self.registry.resource_name
+        for n, (runs, x, y, size) in enumerate(zip(line_runs, lines.x0.tolist(), lines.baseline.tolist(),
+                                                   sizes.tolist())):
+            if not runs:
+                continue
+            if size <= 0:
+                skipped.append(n)  # A box with no height or room to the right: left to the caller too
+                continue
+            ops.append('1 0 0 -1 %.2f %.2f Tm' % (x, y))
+            for hex_ids, face in runs:
+                ops.append(f'/{resource_name(face)} {size:g} Tf <{hex_ids}>Tj')
+                faces.add(face)
+        return ops, faces, sorted(skipped)
+
+    def write_operators(self, new_page, ops, faces):
+        if not ops:
+            return
+        self.registry.embed(new_page, sorted(faces))
+        a, b, c, d, e, f = ~new_page.transformation_matrix
+        content = f'q {a:g} {b:g} {c:g} {d:g} {e:g} {f:g} cm BT\n' + '\n'.join(ops) + '\nET Q'
+        append_contents(new_page, content.encode('latin-1'))
@@ -0,0 +1,405 @@
+"""Watch a folder and convert PDFs and EPUBs as they are dropped into it.
+
+``FolderWatcher`` reports files of a directory that are new or changed
+once they have settled: their size and modification time have stayed the
+same for ``settle`` seconds, so a file still being copied in is not
+converted half-written. On Linux it listens to inotify (through ctypes)
+and also rescans now and then, since inotify misses writes made by other
+machines to a network share; elsewhere, or if inotify is unavailable, it
+polls the directory every ``poll_interval`` seconds.
+
+``WatchState`` is a small JSON file recording which content of which file
+was converted with which options, so a restarted watcher skips files it
+already converted (a file that was only touched is recognised by its
+hash) and a file that failed is retried only once it changes.
+``watch_folder`` ties the two together for the command line.
+"""
+import ctypes
+import ctypes.util
+import json
+import os
+import select
+import stat
+import struct
+import tempfile
+import threading
+import time
+
+from .sources import source_digest
+
+SUPPORTED_EXTENSIONS = ('.pdf', '.epub')
+
+DEFAULT_SETTLE = 2.0         # Seconds a file must stay unchanged before it is converted
+DEFAULT_POLL_INTERVAL = 2.0  # Seconds between directory scans when polling
+DEFAULT_RESCAN_INTERVAL = 60.0  # Seconds between safety rescans when inotify is used
+
+STATE_FILE_NAME = '.bionic-watch.json'
+STATE_VERSION = 1
+
+BACKEND_INOTIFY = 'inotify'
+BACKEND_POLLING = 'polling'
+
+
+def is_watched_name(name, extensions=SUPPORTED_EXTENSIONS):
+    # Hidden files and Office-style lock files ('~$x.pdf') are never inputs
+    return name.lower().endswith(extensions) and not name.startswith(('.', '~$'))
+
+
+def file_stamp(path):
+    """(size, mtime in ns) of ``path``, or None if it is gone or not a regular file."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    if not stat.S_ISREG(st.st_mode):
+        return None
+    return (st.st_size, st.st_mtime_ns)
+
+
+class _Inotify:
+    """Just enough of the Linux inotify API, through ctypes, to watch one directory."""
+
+    IN_MODIFY = 0x00000002
+    IN_ATTRIB = 0x00000004
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_FROM = 0x00000040
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_DELETE = 0x00000200
+    IN_DELETE_SELF = 0x00000400
+    IN_MOVE_SELF = 0x00000800
+    IN_Q_OVERFLOW = 0x00004000
+    IN_IGNORED = 0x00008000
+    IN_NONBLOCK = 0o4000
+    IN_CLOEXEC = 0o2000000
+
+    WATCH_MASK = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+                  | IN_DELETE_SELF | IN_MOVE_SELF)
+    # The directory itself went away, or events were dropped: the caller must rescan
+    RESCAN_MASK = IN_Q_OVERFLOW | IN_IGNORED | IN_DELETE_SELF | IN_MOVE_SELF
+
+    EVENT = struct.Struct('iIII')  # wd, mask, cookie, name length
+
+    def __init__(self, directory):
+        libc_name = ctypes.util.find_library('c')
+        libc = ctypes.CDLL(libc_name, use_errno=True)
+        if not hasattr(libc, 'inotify_init1'):
+            raise OSError('inotify is not available')
+        self.fd = libc.inotify_init1(self.IN_NONBLOCK | self.IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+        wd = libc.inotify_add_watch(self.fd, os.fsencode(directory), self.WATCH_MASK)
+        if wd < 0:
+            errno = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(errno, f'Could not watch {directory}')
+
+    def read(self, timeout):
+        """Names of entries with events within ``timeout`` seconds; None if a full rescan is needed."""
+        ready, _, _ = select.select([self.fd], [], [], max(0.0, timeout))
+        if not ready:
+            return set()
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return set()
+        names = set()
+        offset = 0
+        while offset + self.EVENT.size <= len(data):
+            _, mask, _, length = self.EVENT.unpack_from(data, offset)
+            offset += self.EVENT.size
+            name = data[offset:offset + length].rstrip(b'\0')
+            offset += length
+            if mask & self.RESCAN_MASK:
+                return None
+            if name:
+                names.add(os.fsdecode(name))
+        return names
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+
+class FolderWatcher:
+    """Settled new and changed files of one directory (not its subdirectories).
+
+    Call ``start`` once, then ``wait`` repeatedly; every file present at
+    start is reported once it has settled, so the caller can check it
+    against its ``WatchState``.
+    """
+
+    def __init__(self, directory, settle=DEFAULT_SETTLE, poll_interval=DEFAULT_POLL_INTERVAL,
+                 rescan_interval=DEFAULT_RESCAN_INTERVAL, use_inotify=True, extensions=SUPPORTED_EXTENSIONS):
+        self.directory = os.path.abspath(directory)
+        self.settle = settle
+        self.poll_interval = poll_interval
+        self.rescan_interval = rescan_interval
+        self.use_inotify = use_inotify
+        self.extensions = extensions
+        self.backend = None
+        self._inotify = None
+        self._known = {}    # name -> stamp at the last scan
+        self._pending = {}  # name -> (stamp, time it was last seen changing)
+        self._last_scan = 0.0
+
+    def start(self):
+        if not os.path.isdir(self.directory):
+            raise FileNotFoundError(f'Not a directory: {self.directory}')
+        if self.use_inotify:
+            try:
+                self._inotify = _Inotify(self.directory)
+            except (OSError, AttributeError, TypeError) as e:
+                print(f'inotify unavailable ({e}); polling {self.directory} every {self.poll_interval:g}s')
+                self._inotify = None
+        self.backend = BACKEND_INOTIFY if self._inotify else BACKEND_POLLING
+        self._scan(time.monotonic())
+
+    def close(self):
+        if self._inotify:
+            self._inotify.close()
+            self._inotify = None
+
+    def _note(self, name, now):
+        # Record a possible change; the settle timer restarts whenever the stamp changes
+        stamp = file_stamp(os.path.join(self.directory, name))
+        if stamp is None:
+            self._pending.pop(name, None)
+            self._known.pop(name, None)
+            return
+        pending = self._pending.get(name)
+        if pending is None or pending[0] != stamp:
+            self._pending[name] = (stamp, now)
+
+    def _scan(self, now):
+        self._last_scan = now
+        try:
+            entries = list(os.scandir(self.directory))
+        except OSError as e:
+            print(f'Could not scan {self.directory}: {e}')
+            return
+        seen = {}
+        for entry in entries:
+            if not is_watched_name(entry.name, self.extensions):
+                continue
+            try:
+                if not entry.is_file():
+                    continue
+                st = entry.stat()
+            except OSError:
+                continue
+            stamp = (st.st_size, st.st_mtime_ns)
+            seen[entry.name] = stamp
+            if self._known.get(entry.name) != stamp:
+                self._note(entry.name, now)
+        for name in set(self._known) - set(seen):
+            self._pending.pop(name, None)
+        self._known = seen
+
+    def _settled(self, now):
+        ready = []
+        for name, (stamp, changed) in list(self._pending.items()):
+            if now - changed < self.settle:
+                continue
+            current = file_stamp(os.path.join(self.directory, name))
+            if current is None:
+                del self._pending[name]
+            elif current != stamp:
+                self._pending[name] = (current, now)
+            else:
+                del self._pending[name]
+                self._known[name] = stamp
+                ready.append(os.path.join(self.directory, name))
+        return sorted(ready)
+
+    def _next_deadline(self, now):
+        # When the next pending file could settle, or the next scan is due
+        interval = self.rescan_interval if self._inotify else self.poll_interval
+        deadline = self._last_scan + interval
+        for _, changed in self._pending.values():
+            deadline = min(deadline, changed + self.settle)
+        return deadline
+
+    def wait(self, timeout=None):
+        """Block until files have settled or ``timeout`` seconds passed; returns their paths."""
+        end = None if timeout is None else time.monotonic() + timeout
+        while True:
+            now = time.monotonic()
+            ready = self._settled(now)
+            if ready or (end is not None and now >= end):
+                return ready
+            deadline = self._next_deadline(now)
+            if end is not None:
+                deadline = min(deadline, end)
+            delay = max(0.05, deadline - now)
+            if self._inotify:
+                names = self._inotify.read(delay)
+                now = time.monotonic()
+                if names is None:
+                    self._scan(now)
+                    continue
+                for name in names:
+                    if is_watched_name(name, self.extensions):
+                        self._note(name, now)
+                if now - self._last_scan >= self.rescan_interval:
+                    self._scan(now)
+            else:
+                time.sleep(delay)
+                now = time.monotonic()
+                if now - self._last_scan >= self.poll_interval:
+                    self._scan(now)
+
+    @property
+    def pending_count(self):
+        return len(self._pending)
+
+
+class WatchState:
+    """Persistent record of the files a watcher converted, kept as JSON at ``path``.
+
+    Each entry is keyed by the input's absolute path and holds its stamp,
+    content hash, the options it was converted with, and the output path
+    or error. Safe to use from several threads.
+    """
+
+    def __init__(self, path):
+        self.path = os.path.abspath(path)
+        self._lock = threading.Lock()
+        self.entries = {}
+        self.load()
+
+    def load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            print(f'Ignoring unreadable watch state {self.path}: {e}')
+            return
+        if data.get('version') == STATE_VERSION:
+            self.entries = data.get('files', {})
+
+    def save(self):
+        with self._lock:
+            data = json.dumps({'version': STATE_VERSION, 'files': self.entries}, indent=1, sort_keys=True)
+        directory = os.path.dirname(self.path)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.bionic-watch-', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(data)
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def is_output(self, file_path):
+        # Outputs written into the watched folder itself must not be converted again
+        file_path = os.path.abspath(file_path)
+        with self._lock:
+            return any(entry.get('output') == file_path for entry in self.entries.values())
+
+    def check(self, file_path, options):
+        """``(stamp, content hash)`` of ``file_path`` if it needs converting with ``options``, else None.
+
+        Pass the result to ``record`` once converted, so a change made
+        during the conversion is picked up next time. A file whose stamp
+        changed but whose content did not (a touch, a copy of the same
+        file) is marked current instead.
+        """
+        file_path = os.path.abspath(file_path)
+        stamp = file_stamp(file_path)
+        if stamp is None or self.is_output(file_path):
+            return None
+        with self._lock:
+            entry = self.entries.get(file_path)
+        if entry and entry.get('options') == options and tuple(entry.get('stamp', ())) == stamp:
+            return None
+        digest = source_digest(file_path).hexdigest()
+        if entry and entry.get('options') == options and entry.get('sha256') == digest:
+            with self._lock:
+                entry['stamp'] = list(stamp)
+            self.save()
+            return None
+        return stamp, digest
+
+    def record(self, file_path, fingerprint, options, output=None, error=None):
+        """Remember that ``file_path`` as ``check`` saw it (``fingerprint``) was converted, or failed."""
+        file_path = os.path.abspath(file_path)
+        stamp, digest = fingerprint
+        with self._lock:
+            self.entries[file_path] = {
+                'stamp': list(stamp),
+                'sha256': digest,
+                'options': options,
+                'output': os.path.abspath(output) if output else None,
+                'error': error,
+                'converted': time.time(),
+            }
+        self.save()
+
+    def prune(self, directory):
+        """Forget inputs in ``directory`` that no longer exist; returns how many."""
+        directory = os.path.abspath(directory)
+        with self._lock:
+            gone = [path for path in self.entries
+                    if os.path.dirname(path) == directory and not os.path.exists(path)]
+            for path in gone:
+                del self.entries[path]
+        if gone:
+            self.save()
+        return len(gone)
+
+
+def default_state_path(output_dir):
+    return os.path.join(output_dir, STATE_FILE_NAME)
+
+
+def watch_options(output_dir, mode=None, pdf_to_epub=False, output_format='EPUB', render_mode='html',
+                  image_mode='raster', raster_dpi=None, match_fonts=False, optimize=None, max_image_px=None):
+    # The settings recorded with each converted file; a file converted with other settings is converted again.
+    # The GUI and the command line build them the same way so they can share a state file.
+    return {'output_dir': os.path.abspath(output_dir), 'mode': mode, 'pdf_to_epub': pdf_to_epub,
+            'format': output_format.upper(), 'render': render_mode, 'images': image_mode, 'dpi': raster_dpi,
+            'match_fonts': match_fonts, 'optimize': optimize, 'max_image_px': max_image_px}
+
+
+def watch_folder(watcher, state, convert, options, once=False, stop=None, log=print):
+    """Convert settled files from ``watcher`` with ``convert(path)`` until ``stop`` is set.
+
+    ``convert`` returns the output path and raises on failure; failures are
+    recorded so the file is retried only after it changes. With ``once``
+    it returns after the files already in the folder have been handled.
+    Returns the number of files converted.
+    """
+    stop = stop or threading.Event()
+    state.prune(watcher.directory)
+    watcher.start()
+    log(f'Watching {watcher.directory} ({watcher.backend})')
+    converted = 0
+    try:
+        while not stop.is_set():
+            if once and not watcher.pending_count:
+                break
+            for file_path in watcher.wait(timeout=0.5):
+                if stop.is_set():
+                    break
+                fingerprint = state.check(file_path, options)
+                if fingerprint is None:
+                    continue
+                log(f'Converting {os.path.basename(file_path)}')
+                try:
+                    out_path = convert(file_path)
+                except Exception as e:
+                    log(f'Failed {os.path.basename(file_path)}: {e}')
+                    state.record(file_path, fingerprint, options, error=str(e))
+                    continue
+                state.record(file_path, fingerprint, options, output=out_path)
+                converted += 1
+                log(f'Converted {os.path.basename(file_path)} -> {out_path}')
+    finally:
+        watcher.close()
+    return converted
@@ -1,29 +1,43 @@
 import sys
 import os
+import time
+
+# --profile-startup prints an import-time report and the time to the first window (see BionicPreserveApp.on_shown)
+STARTUP_TIME = time.perf_counter()
+import_timer = None
+if '--profile-startup' in sys.argv:
+    from bionic.metrics import ImportTimer
+    import_timer = ImportTimer()
+    import_timer.install()
 
 def resource_path(relative_path):
     if hasattr(sys, '_MEIPASS'):
         return os.path.join(sys._MEIPASS, relative_path)
     return os.path.join(os.path.abspath("."), relative_path)
 
-import time 
 # Add QLineEdit, QHBoxLayout
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QPushButton, QFileDialog, 
                              QLabel, QVBoxLayout, QWidget, QProgressBar, QDialog, 
-                             QLineEdit, QHBoxLayout, QMessageBox, QInputDialog, QComboBox) # Added QLineEdit, QHBoxLayout, QInputDialog, QComboBox
-from PyQt5.QtCore import QThread, pyqtSignal, QUrl, QTimer, Qt  # Updated import for Qt
+                             QLineEdit, QHBoxLayout, QMessageBox, QInputDialog, QComboBox, QSpinBox,
+                             QTableWidget, QTableWidgetItem, QHeaderView, QCheckBox) # Added QLineEdit, QHBoxLayout, QInputDialog, QComboBox, QSpinBox, table widgets for batch jobs, QCheckBox
+from PyQt5.QtCore import QThread, pyqtSignal, QUrl, QTimer, Qt, QObject  # Updated import for Qt
 from PyQt5.QtGui import QIcon, QDesktopServices, QMovie  # Import QIcon for setting the window icon, QDesktopServices for opening URLs, QMovie for GIFs
-import fitz  # PyMuPDF
-import ebooklib
-from ebooklib import epub
-from bs4 import BeautifulSoup
-
-import warnings
-warnings.filterwarnings("ignore", category=UserWarning, module="ebooklib")
-warnings.filterwarnings("ignore", category=FutureWarning, module="ebooklib")
+from bionic.reading import bionic_reading
+from bionic.cache import ConversionCache
+from bionic.control import ConversionCancelled, JobControl
+from bionic.metrics import format_summary, profile_run
+from bionic.page_ranges import split_ranges
+from bionic.watch import SUPPORTED_EXTENSIONS, FolderWatcher, WatchState, default_state_path, watch_options
 
 import json
 
+# The converter modules pull in PyMuPDF, lxml and NumPy. They are imported when a conversion
+# starts, and preloaded by ModulePreloadThread once the window is up so the first Convert does not wait
+PRELOAD_MODULES = ('bionic.pdf_converter', 'bionic.epub_converter', 'bionic.pdf_to_epub', 'bionic.shrink')
+
+# bionic.shrink.DEFAULT_PRESET, kept here so startup does not import PyMuPDF
+DEFAULT_SHRINK_PRESET = 'fonts'
+
 SETTINGS_FILE = 'settings.json'
 
 def load_settings():
@@ -42,131 +56,88 @@ def save_settings(settings):
     except Exception:
         pass
 
-# Modify PDFConverterThread to accept output directory
+# Thin QThread wrappers around the headless converters in the bionic package
+def run_converter(converter, cache=None, profile_mode=None):
+    # Returns the output path, served from the conversion cache when possible.
+    # profile_mode ('cprofile' or 'tracemalloc') always converts, writing the report next to the output
+    if profile_mode:
+        out_base = os.path.splitext(converter.output_path())[0]
+        return profile_run(converter.run, profile_mode, out_base)
+    if cache:
+        return cache.run(converter)
+    return converter.run()
+
+# Result a converter thread emits when its conversion was cancelled; the checkpoint is kept
+CANCELLED_RESULT = 'Cancelled'
+
+def conversion_cache(settings):
+    # The persistent conversion cache, unless disabled in the settings
+    if not settings.get('use_cache', True):
+        return None
+    return ConversionCache(settings.get('cache_dir') or None,
+                           max_bytes=int(settings.get('cache_max_mb', 1024) * 1024 * 1024))
+
 class PDFConverterThread(QThread):
     progress = pyqtSignal(int)
     finished = pyqtSignal(str)
     saving = pyqtSignal()
-    # Add output_dir parameter
-    def __init__(self, file_path, bionic_reading_func, output_dir): 
+    metrics = pyqtSignal(dict)  # Stage timings and page counts, see bionic.metrics
+    # workers > 1 converts page ranges in parallel processes (bionic_reading_func must be picklable)
+    # render_mode 'text' places glyphs directly instead of fitting each line like HTML;
+    # match_fonts picks a serif/sans/mono face per line in the 'html' mode
+    # image_mode 'vector' keeps images/drawings of mixed pages instead of rasterizing them
+    # chunk_pages: converted pages are written to disk every N pages to keep memory bounded
+    # pages: convert only these pages, e.g. "1-20,45,100-" (see bionic.page_ranges)
+    # cache: a ConversionCache to reuse earlier results and pages from (None converts from scratch)
+    # metrics_log: JSON-lines file for per-page stage timings; profile_mode: see run_converter
+    def __init__(self, file_path, bionic_reading_func, output_dir, workers=1, render_mode='html',
+                 image_mode='raster', raster_dpi=None, chunk_pages=100, cache=None,
+                 metrics_log=None, profile_mode=None, optimize=None, match_fonts=False, pages=None):
         super().__init__()
-        self.file_path = file_path
-        self.bionic_reading = bionic_reading_func
-        self.output_dir = output_dir # Store output directory
-
-    def int_to_rgb_tuple(self, color_int):
-        r = (color_int >> 16) & 0xFF
-        g = (color_int >> 8) & 0xFF
-        b = color_int & 0xFF
-        return (r / 255.0, g / 255.0, b / 255.0)
-
-    def map_font(self, font_name):
-        # Map any font to a standard PyMuPDF font
-        # Common options: "helv" (Helvetica), "times", "courier"
-        return "helv"
+        self.cache = cache
+        self.profile_mode = profile_mode
+        self.control = JobControl()  # Pause/cancel from the GUI thread
+        from bionic.pdf_converter import PDFConverter
+        self.converter = PDFConverter(file_path, output_dir, bionic_reading=bionic_reading_func,
+                                      progress=self.progress.emit, saving=self.saving.emit,
+                                      workers=workers, render_mode=render_mode,
+                                      image_mode=image_mode, raster_dpi=raster_dpi,
+                                      chunk_pages=chunk_pages or None,
+                                      metrics=self.metrics.emit, metrics_log=metrics_log,
+                                      control=self.control, optimize=optimize, match_fonts=match_fonts,
+                                      pages=pages)
 
     def run(self):
-        import fitz, os, traceback
+        import traceback
         try:
-            print('PDF conversion started')
-            doc = fitz.open(self.file_path)
-            # Use the provided output directory
-            out_dir = self.output_dir 
-            os.makedirs(out_dir, exist_ok=True) # Ensure it exists
-            base_name = os.path.splitext(os.path.basename(self.file_path))[0]
-            out_path = os.path.join(out_dir, f'{base_name}_bionic.pdf')
-            new_doc = fitz.open()
-            total = len(doc)
-            for i, page in enumerate(doc):
-                text_dict = page.get_text('dict')
-                has_text = any(block['type'] == 0 and any(line['spans'] for line in block['lines']) for block in text_dict['blocks'])
-                has_images = bool(page.get_images(full=True))
-                if has_text and has_images:
-                    new_page = new_doc.new_page(width=page.rect.width, height=page.rect.height)
-                    pix = page.get_pixmap()
-                    img_rect = fitz.Rect(0, 0, page.rect.width, page.rect.height)
-                    new_page.insert_image(img_rect, pixmap=pix)
-                    for block in text_dict['blocks']:
-                        if block['type'] != 0:
-                            continue
-                        for line in block['lines']:
-                            y0 = min(span['bbox'][1] for span in line['spans'])
-                            y1 = max(span['bbox'][3] for span in line['spans'])
-                            x0 = min(span['bbox'][0] for span in line['spans'])
-                            x1 = max(span['bbox'][2] for span in line['spans'])
-                            line_text = ''.join(span['text'] for span in line['spans'])
-                            bionic_html = f'<span style="font-size:12pt">{self.bionic_reading(line_text)}</span>'
-                            try:
-                                new_page.insert_htmlbox(fitz.Rect(x0, y0, x1, y1), bionic_html)
-                            except Exception as e:
-                                print(f"Error inserting htmlbox on page {i}: {e}")
-                elif has_images:
-                    new_doc.insert_pdf(doc, from_page=i, to_page=i)
-                elif has_text:
-                    new_page = new_doc.new_page(width=page.rect.width, height=page.rect.height)
-                    for block in text_dict['blocks']:
-                        if block['type'] != 0:
-                            continue
-                        for line in block['lines']:
-                            y0 = min(span['bbox'][1] for span in line['spans'])
-                            y1 = max(span['bbox'][3] for span in line['spans'])
-                            x0 = min(span['bbox'][0] for span in line['spans'])
-                            x1 = max(span['bbox'][2] for span in line['spans'])
-                            line_text = ''.join(span['text'] for span in line['spans'])
-                            bionic_html = f'<span style="font-size:12pt">{self.bionic_reading(line_text)}</span>'
-                            try:
-                                new_page.insert_htmlbox(fitz.Rect(x0, y0, x1, y1), bionic_html)
-                            except Exception as e:
-                                print(f"Error inserting htmlbox on page {i}: {e}")
-                else:
-                    new_doc.new_page(width=page.rect.width, height=page.rect.height)
-                # Only emit progress up to 99% during processing
-                self.progress.emit(int((i+1)/total*99))
-            # Signal that saving is about to start before the potentially long operation
-            self.saving.emit()
-            print('Saving PDF...')
-            try:
-                # Save with default options (faster, larger file)
-                new_doc.save(out_path, garbage=0) 
-                print('PDF saved successfully')
-            except Exception as e:
-                print(f"Error saving PDF: {e}")
-                self.finished.emit(f"Error saving PDF: {e}")
-                return
-            finally:
-                new_doc.close()
-                doc.close()
-            self.finished.emit(out_path)
+            self.finished.emit(run_converter(self.converter, self.cache, self.profile_mode))
+        except ConversionCancelled:
+            self.finished.emit(CANCELLED_RESULT)
         except Exception as e:
             print(f"Exception in PDF conversion: {e}\n{traceback.format_exc()}")
             self.finished.emit(f"Exception in PDF conversion: {e}")
 
-# Modify PDFShrinkThread to accept output directory (though it uses input file's dir)
 class PDFShrinkThread(QThread):
+    progress = pyqtSignal(int)
     finished = pyqtSignal(str) 
-    # Add output_dir parameter (used to determine where the shrunk file goes)
-    def __init__(self, input_path, output_dir): 
+    report = pyqtSignal(dict)  # Sizes and bytes saved per phase, see bionic.shrink.optimize_pdf
+    # output_dir determines where the shrunk file goes; the optimizer runs in its own process
+    # so the window stays responsive. preset: 'fast', 'fonts' or 'images' (bionic.shrink)
+    def __init__(self, input_path, output_dir, preset=DEFAULT_SHRINK_PRESET, workers=1): 
         super().__init__()
         self.input_path = input_path
-        self.output_dir = output_dir # Store output directory for shrunk file
+        self.output_dir = output_dir
+        self.preset = preset
+        self.workers = workers
 
     def run(self):
-        import fitz, os, traceback
+        import traceback
         try:
-            print(f"Shrinking PDF: {self.input_path}")
-            base_name = os.path.splitext(os.path.basename(self.input_path))[0]
-            if base_name.endswith('_bionic'):
-                 base_name = base_name[:-len('_bionic')]
-            # Use the provided output directory for the shrunk file
-            out_dir = self.output_dir 
-            os.makedirs(out_dir, exist_ok=True) # Ensure it exists
-            shrunk_out_path = os.path.join(out_dir, f'{base_name}_bionic_shrunk.pdf') 
-
-            doc = fitz.open(self.input_path)
-            doc.save(shrunk_out_path, deflate=True, garbage=4, clean=True) 
-            doc.close()
-            print(f"PDF shrunk successfully: {shrunk_out_path}")
-            self.finished.emit(shrunk_out_path)
+            from bionic.shrink import shrink_in_process
+            out_path, report = shrink_in_process(self.input_path, self.output_dir, self.preset, self.workers,
+                                                 progress=self.progress.emit)
+            self.report.emit(report)
+            self.finished.emit(out_path)
         except Exception as e:
             error_msg = f"Error shrinking PDF: {e}"
             print(f"{error_msg}\n{traceback.format_exc()}")
@@ -176,65 +147,28 @@ class EpubConverterThread(QThread):
     progress = pyqtSignal(int)
     finished = pyqtSignal(str)
     saving = pyqtSignal()
-    def __init__(self, file_path, bionic_reading_func, output_dir, output_format):
+    metrics = pyqtSignal(dict)
+    # chapters: convert only these chapters, e.g. "3-5" (see bionic.page_ranges)
+    def __init__(self, file_path, bionic_reading_func, output_dir, output_format, cache=None, chunk_pages=100,
+                 metrics_log=None, profile_mode=None, optimize=None, chapters=None):
         super().__init__()
-        self.file_path = file_path
-        self.bionic_reading = bionic_reading_func
-        self.output_dir = output_dir
-        self.output_format = output_format  # 'EPUB' or 'PDF'
+        self.cache = cache
+        self.profile_mode = profile_mode
+        self.control = JobControl()
+        from bionic.epub_converter import EpubConverter
+        self.converter = EpubConverter(file_path, output_dir, output_format=output_format,
+                                       bionic_reading=bionic_reading_func,
+                                       progress=self.progress.emit, saving=self.saving.emit,
+                                       chunk_pages=chunk_pages or None,
+                                       metrics=self.metrics.emit, metrics_log=metrics_log,
+                                       control=self.control, optimize=optimize, chapters=chapters)
 
     def run(self):
-        import os, traceback
+        import traceback
         try:
-            book = epub.read_epub(self.file_path)
-            total_items = len([item for item in book.get_items() if item.get_type() == ebooklib.ITEM_DOCUMENT])
-            processed = 0
-            def bionic_html(text):
-                def style_word(word):
-                    if len(word) < 3:
-                        return '<span style="font-weight:bold">{}</span>'.format(word)
-                    split = (len(word) + 1) // 2
-                    return '<span style="font-weight:bold">{}</span>{word[split:]}'
-                words = text.split(' ')
-                return ' '.join([style_word(w) if w.isalpha() else w for w in words])
-            for item in book.get_items():
-                if item.get_type() == ebooklib.ITEM_DOCUMENT:
-                    soup = BeautifulSoup(item.get_content(), 'html.parser')
-                    for tag in soup.find_all(['p', 'span', 'li']):
-                        if tag.string and tag.string.strip():
-                            tag.string.replace_with(BeautifulSoup(bionic_html(tag.string), 'html.parser'))
-                    item.set_content(str(soup).encode('utf-8'))
-                    processed += 1
-                    self.progress.emit(int(processed / total_items * 90))
-            # Save as EPUB
-            base_name = os.path.splitext(os.path.basename(self.file_path))[0]
-            os.makedirs(self.output_dir, exist_ok=True)
-            if self.output_format == 'EPUB':
-                out_path = os.path.join(self.output_dir, f'{base_name}_bionic.epub')
-                self.saving.emit()
-                epub.write_epub(out_path, book)
-                self.finished.emit(out_path)
-            else:
-                # Convert to PDF: extract all text, apply bionic reading, and save as PDF
-                from PyQt5.QtGui import QTextDocument
-                from PyQt5.QtPrintSupport import QPrinter
-                from PyQt5.QtCore import QBuffer, QByteArray
-                from PyQt5.QtWidgets import QApplication
-                # Concatenate all text content
-                all_html = ''
-                for item in book.get_items():
-                    if item.get_type() == ebooklib.ITEM_DOCUMENT:
-                        all_html += item.get_content().decode('utf-8') + '<br/>'
-                # Use QTextDocument to render HTML to PDF
-                doc = QTextDocument()
-                doc.setHtml(all_html)
-                out_path = os.path.join(self.output_dir, f'{base_name}_bionic.pdf')
-                self.saving.emit()
-                printer = QPrinter()
-                printer.setOutputFormat(QPrinter.PdfFormat)
-                printer.setOutputFileName(out_path)
-                doc.print_(printer)
-                self.finished.emit(out_path)
+            self.finished.emit(run_converter(self.converter, self.cache, self.profile_mode))
+        except ConversionCancelled:
+            self.finished.emit(CANCELLED_RESULT)
         except Exception as e:
             self.finished.emit(f'Error: {e}\n{traceback.format_exc()}')
 
@@ -242,90 +176,579 @@ class ExperimentalPDFToEPUBThread(QThread):
     progress = pyqtSignal(int)
     finished = pyqtSignal(str)
     saving = pyqtSignal()
-    def __init__(self, file_path, bionic_reading_func, output_dir):
+    metrics = pyqtSignal(dict)
+    # max_image_px: scale larger images down (in `workers` processes) before embedding them
+    def __init__(self, file_path, bionic_reading_func, output_dir, cache=None, max_image_px=None, workers=1,
+                 metrics_log=None, profile_mode=None, pages=None):
         super().__init__()
-        self.file_path = file_path
-        self.bionic_reading = bionic_reading_func
-        self.output_dir = output_dir
+        self.cache = cache
+        self.profile_mode = profile_mode
+        self.control = JobControl()
+        from bionic.pdf_to_epub import PDFToEpubConverter
+        self.converter = PDFToEpubConverter(file_path, output_dir, bionic_reading=bionic_reading_func,
+                                            progress=self.progress.emit, saving=self.saving.emit,
+                                            max_image_px=max_image_px, workers=workers,
+                                            metrics=self.metrics.emit, metrics_log=metrics_log,
+                                            control=self.control, pages=pages)
 
     def run(self):
-        import fitz, os, traceback, base64
-        from ebooklib import epub
-        from bs4 import BeautifulSoup
+        import traceback
         try:
-            doc = fitz.open(self.file_path)
-            book = epub.EpubBook()
-            book.set_identifier(os.path.basename(self.file_path))
-            book.set_title(os.path.splitext(os.path.basename(self.file_path))[0] + ' (Bionic)')
-            book.set_language('en')
-            chapters = []
-            image_items = []
-            total = len(doc)
-            for i, page in enumerate(doc):
-                html = '<html><body>'
-                # Extract images
-                img_tags = []
-                for img_index, img in enumerate(page.get_images(full=True)):
-                    xref = img[0]
-                    base_image = doc.extract_image(xref)
-                    img_bytes = base_image['image']
-                    img_ext = base_image['ext']
-                    img_id = f"img_{i}_{img_index}.{img_ext}"
-                    img_path = os.path.join(self.output_dir, img_id)
-                    with open(img_path, 'wb') as f:
-                        f.write(img_bytes)
-                    # Add image to EPUB
-                    epub_img = epub.EpubImage()
-                    epub_img.file_name = img_id
-                    epub_img.media_type = f"image/{img_ext}"
-                    epub_img.content = img_bytes
-                    book.add_item(epub_img)
-                    img_tags.append(f'<img src="{img_id}" style="max-width:100%;max-height:400px;display:block;margin:auto;"/>')
-                # Extract text
-                text = page.get_text("text")
-                bionic_html = self.bionic_reading(text).replace("\n", "<br>")
-                html += ''.join(img_tags)
-                html += f'<div style="margin-top:10px">{bionic_html}</div>'
-                html += '</body></html>'
-                chapter = epub.EpubHtml(title=f'Page {i+1}', file_name=f'page_{i+1}.xhtml', lang='en')
-                chapter.set_content(html)
-                book.add_item(chapter)
-                chapters.append(chapter)
-                self.progress.emit(int((i+1)/total*90))
-            # Assemble spine and TOC
-            book.toc = tuple(chapters)
-            book.spine = ['nav'] + chapters
-            book.add_item(epub.EpubNcx())
-            book.add_item(epub.EpubNav())
-            # Save EPUB
-            os.makedirs(self.output_dir, exist_ok=True)
-            out_path = os.path.join(self.output_dir, os.path.splitext(os.path.basename(self.file_path))[0] + '_bionic_images.epub')
-            self.saving.emit()
-            epub.write_epub(out_path, book)
-            # Clean up temporary image files
-            for img_file in os.listdir(self.output_dir):
-                if img_file.startswith("img_") and img_file.split(".")[-1].lower() in ["png", "jpg", "jpeg"]:
-                    try:
-                        os.remove(os.path.join(self.output_dir, img_file))
-                    except Exception:
-                        pass
-            self.finished.emit(out_path)
+            self.finished.emit(run_converter(self.converter, self.cache, self.profile_mode))
+        except ConversionCancelled:
+            self.finished.emit(CANCELLED_RESULT)
         except Exception as e:
             self.finished.emit(f'Error: {e}\n{traceback.format_exc()}')
 
+
+def is_error_result(result):
+    # Converter threads report failures (and cancellation) as a message instead of an output path
+    return result == CANCELLED_RESULT or result.lower().startswith('error') or result.lower().startswith('exception')
+
+def create_converter_thread(file_path, output_dir, pdf_to_epub=False, epub_output_format='EPUB', workers=1,
+                            render_mode='html', image_mode='raster', raster_dpi=None, chunk_pages=100, cache=None,
+                            max_image_px=None, metrics_log=None, profile_mode=None, optimize=None, match_fonts=False,
+                            pages=None):
+    # optimize: bionic.shrink preset applied to PDF output as it is written (None = off)
+    # pages: page selection for PDF input, chapter selection for EPUB input (None = everything)
+    # Pick the converter for a file by extension, the same way the main window does
+    if file_path.lower().endswith('.pdf') and pdf_to_epub:
+        return ExperimentalPDFToEPUBThread(file_path, bionic_reading, output_dir, cache, max_image_px, workers,
+                                           metrics_log, profile_mode, pages)
+    elif file_path.lower().endswith('.epub'):
+        return EpubConverterThread(file_path, bionic_reading, output_dir, epub_output_format, cache, chunk_pages,
+                                   metrics_log, profile_mode, optimize, pages)
+    else:
+        return PDFConverterThread(file_path, bionic_reading, output_dir, workers, render_mode,
+                                  image_mode, raster_dpi, chunk_pages, cache, metrics_log, profile_mode, optimize,
+                                  match_fonts, pages)
+
+# --- Batch Conversion Queue ---
+class ConversionQueue(QObject):
+    """Runs queued conversions, at most max_concurrent at once, in warm worker processes.
+
+    PyMuPDF holds the GIL and is not safe to use from several threads, so
+    jobs go to a bionic.server.ConversionService (started with the first
+    job) instead of converter threads: parallel jobs then really run in
+    parallel, and a crash takes down one worker, not the app. Each job is
+    a dict with the input path, output directory, status ('Queued',
+    'Running', 'Done', 'Failed', 'Cancelled'), progress and result. A
+    failed job is recorded and the queue moves on to the next one.
+    """
+    job_changed = pyqtSignal(int)  # Index of the job whose status/progress changed
+    job_finished = pyqtSignal(int)  # Index of a job that just ended (Done, Failed or Cancelled)
+    all_finished = pyqtSignal()
+
+    POLL_MS = 200  # How often running jobs are checked for progress
+
+    def __init__(self, max_concurrent=2, parent=None):
+        super().__init__(parent)
+        self.max_concurrent = max_concurrent
+        self.render_mode = 'html'
+        self.image_mode = 'raster'
+        self.raster_dpi = None
+        self.match_fonts = False
+        self.chunk_pages = 100
+        self.cache = None  # ConversionCache whose directory and size limit the workers use (None = off)
+        self.max_image_px = None
+        self.metrics_log = None
+        self.optimize = None
+        self.jobs = []
+        self.running = False
+        self.service = None
+        self.poll_timer = QTimer(self)
+        self.poll_timer.setInterval(self.POLL_MS)
+        self.poll_timer.timeout.connect(self._poll)
+
+    def add_job(self, file_path, output_dir, pdf_to_epub=False, epub_output_format='EPUB'):
+        self.jobs.append({
+            'file_path': file_path,
+            'output_dir': output_dir,
+            'pdf_to_epub': pdf_to_epub,
+            'epub_output_format': epub_output_format,
+            'status': 'Queued',
+            'progress': 0,
+            'result': '',
+            'metrics': None,  # Summary from bionic.metrics once the job has finished
+            'service_job': None,  # bionic.server.Job while running
+        })
+        return len(self.jobs) - 1
+
+    def active_count(self):
+        return sum(1 for job in self.jobs if job['status'] == 'Running')
+
+    def pending_count(self):
+        return sum(1 for job in self.jobs if job['status'] == 'Queued')
+
+    def start(self):
+        self.running = True
+        self._schedule()
+
+    def stop(self):
+        # Let running jobs finish, but don't start new ones
+        self.running = False
+
+    def cancel_running(self):
+        # Stop starting jobs and cancel the running ones; their checkpoints let a later run resume
+        self.running = False
+        for job in self.jobs:
+            if job['status'] == 'Running' and job['service_job']:
+                self.service.cancel(job['service_job'].id)
+
+    def clear_finished(self):
+        self.jobs = [job for job in self.jobs if job['status'] in ('Queued', 'Running')]
+
+    def set_max_concurrent(self, value):
+        self.max_concurrent = value
+        if self.service:
+            self.service.add_workers(value)
+        if self.running:
+            self._schedule()  # Fill any newly available slots
+
+    def set_cache(self, cache):
+        # The workers open the cache when they start: restart them once idle
+        self.cache = cache
+        if self.service and not self.active_count():
+            self.shutdown()
+
+    def shutdown(self):
+        # Stop the worker processes; the next job starts them again
+        self.poll_timer.stop()
+        if self.service:
+            self.service.stop()
+            self.service = None
+
+    def _ensure_service(self):
+        if self.service is None:
+            from bionic.server import ConversionService
+            cache_dir = self.cache.cache_dir if self.cache else None
+            cache_bytes = self.cache.max_bytes if self.cache else 0
+            # Converter log lines go to this console, as they did from converter threads
+            self.service = ConversionService(self.max_concurrent, max_queue=self.max_concurrent, cache_dir=cache_dir,
+                                             cache_bytes=cache_bytes, job_ttl=0, verbose=True)
+            self.service.start()
+        return self.service
+
+    def _job_mode(self, job):
+        # Converter mode and keyword arguments, chosen by extension like create_converter_thread
+        from bionic.converters import MODE_EPUB, MODE_PDF, MODE_PDF_TO_EPUB
+        if job['file_path'].lower().endswith('.pdf') and job['pdf_to_epub']:
+            return MODE_PDF_TO_EPUB, {'max_image_px': self.max_image_px, 'metrics_log': self.metrics_log}
+        if job['file_path'].lower().endswith('.epub'):
+            return MODE_EPUB, {'output_format': job['epub_output_format'], 'chunk_pages': self.chunk_pages or None,
+                               'metrics_log': self.metrics_log, 'optimize': self.optimize}
+        return MODE_PDF, {'render_mode': self.render_mode, 'image_mode': self.image_mode,
+                          'raster_dpi': self.raster_dpi, 'chunk_pages': self.chunk_pages or None,
+                          'metrics_log': self.metrics_log, 'optimize': self.optimize,
+                          'match_fonts': self.match_fonts}
+
+    def _schedule(self):
+        for index, job in enumerate(self.jobs):
+            if not self.running or self.active_count() >= self.max_concurrent:
+                break
+            if job['status'] == 'Queued':
+                self._start_job(index, job)
+        if self.active_count() == 0 and self.pending_count() == 0:
+            self.running = False
+            self.poll_timer.stop()
+            self.all_finished.emit()
+
+    def _start_job(self, index, job):
+        mode, options = self._job_mode(job)
+        try:
+            os.makedirs(job['output_dir'], exist_ok=True)
+            job['service_job'] = self._ensure_service().submit(
+                os.path.abspath(job['file_path']), {'mode': mode}, options=options,
+                output_dir=os.path.abspath(job['output_dir']))
+        except Exception as e:
+            job['status'] = 'Failed'
+            job['result'] = f'Error: {e}'
+            print(f"Batch job failed: {job['file_path']}: {e}")
+            self.job_changed.emit(index)
+            self.job_finished.emit(index)
+            return
+        job['status'] = 'Running'
+        self.poll_timer.start()
+        self.job_changed.emit(index)
+
+    def _index_of(self, job):
+        for index, candidate in enumerate(self.jobs):
+            if candidate is job:
+                return index
+        return -1
+
+    def _poll(self):
+        # Progress and results of the running jobs, from the service
+        from bionic.server import STATUS_CANCELLED, STATUS_DONE, FINISHED
+        for job in [job for job in self.jobs if job['status'] == 'Running']:
+            service_job = job['service_job']
+            status = service_job.status
+            if status in FINISHED:
+                job['metrics'] = service_job.metrics
+                if status == STATUS_DONE:
+                    result = service_job.out_path
+                elif status == STATUS_CANCELLED:
+                    result = CANCELLED_RESULT
+                else:
+                    result = f'Error: {service_job.error}'
+                self.service.remove(service_job.id)
+                self._on_job_finished(job, result)
+            elif service_job.progress != job['progress']:
+                job['progress'] = service_job.progress
+                index = self._index_of(job)
+                if index >= 0:
+                    self.job_changed.emit(index)
+
+    def _on_job_finished(self, job, result):
+        job['service_job'] = None
+        job['result'] = result
+        if result == CANCELLED_RESULT:
+            job['status'] = 'Cancelled'
+        elif is_error_result(result):
+            job['status'] = 'Failed'
+            print(f"Batch job failed: {job['file_path']}: {result}")
+        else:
+            job['status'] = 'Done'
+            job['progress'] = 100
+        index = self._index_of(job)
+        if index >= 0:
+            self.job_changed.emit(index)
+            self.job_finished.emit(index)
+        self._schedule()
+
+class FolderWatchThread(QThread):
+    """Watches a folder (bionic.watch) and emits files that settled and still need converting.
+
+    The fingerprint emitted with each path goes back to ``state.record``
+    once the file's conversion has finished.
+    """
+    file_ready = pyqtSignal(str, object)  # Path, fingerprint from WatchState.check
+    failed = pyqtSignal(str)
+
+    def __init__(self, folder, state, options):
+        super().__init__()
+        self.watcher = FolderWatcher(folder)
+        self.state = state
+        self.options = options
+        self._stop = False
+
+    def stop(self):
+        self._stop = True
+        self.wait()
+
+    def run(self):
+        try:
+            self.state.prune(self.watcher.directory)
+            self.watcher.start()
+            print(f"Watching {self.watcher.directory} ({self.watcher.backend})")
+            while not self._stop:
+                for file_path in self.watcher.wait(timeout=0.5):
+                    fingerprint = self.state.check(file_path, self.options)
+                    if fingerprint is not None:
+                        self.file_ready.emit(file_path, fingerprint)
+        except Exception as e:
+            print(f"Folder watch stopped: {e}")
+            self.failed.emit(str(e))
+        finally:
+            self.watcher.close()
+
+class BatchDialog(QDialog):
+    COLUMNS = ['File', 'Status', 'Progress', 'Output']
+
+    def __init__(self, parent, settings, output_dir='', pdf_to_epub=False):
+        super().__init__(parent)
+        self.settings = settings
+        self.setWindowTitle('Batch Conversion')
+        self.resize(700, 400)
+        self.queue = ConversionQueue(self.settings.get('batch_max_jobs', 2), self)
+        self.queue.render_mode = self.settings.get('pdf_render_mode', 'html')
+        self.queue.image_mode = self.settings.get('pdf_image_mode', 'raster')
+        self.queue.raster_dpi = self.settings.get('raster_dpi')
+        self.queue.match_fonts = self.settings.get('match_fonts', False)
+        self.queue.chunk_pages = self.settings.get('pdf_chunk_pages', 100)
+        self.queue.cache = conversion_cache(self.settings)
+        self.queue.max_image_px = self.settings.get('epub_max_image_px')
+        self.queue.metrics_log = self.settings.get('metrics_log')
+        if self.settings.get('optimize_inline', False):
+            self.queue.optimize = self.settings.get('shrink_preset', DEFAULT_SHRINK_PRESET)
+        self.queue.job_changed.connect(self.update_row)
+        self.queue.job_finished.connect(self.on_job_finished)
+        self.queue.all_finished.connect(self.on_all_finished)
+        # Folder watch: new and changed files are queued as they settle (see bionic.watch)
+        self.watch_thread = None
+        self.watch_state = None
+        self.watch_options = None
+        self.watch_output_dir = None
+        self.watch_deferred = {}  # Path -> fingerprint of files that changed while being converted
+
+        layout = QVBoxLayout()
+        add_layout = QHBoxLayout()
+        self.add_files_btn = QPushButton('Add Files...')
+        self.add_files_btn.clicked.connect(self.add_files)
+        self.add_folder_btn = QPushButton('Add Folder...')
+        self.add_folder_btn.clicked.connect(self.add_folder)
+        self.watch_btn = QPushButton('Watch Folder...')
+        self.watch_btn.setToolTip("Convert PDFs and EPUBs dropped into a folder as they arrive. "
+                                  "Files already converted are remembered across restarts.")
+        self.watch_btn.clicked.connect(self.toggle_watch)
+        add_layout.addWidget(self.add_files_btn)
+        add_layout.addWidget(self.add_folder_btn)
+        add_layout.addWidget(self.watch_btn)
+        layout.addLayout(add_layout)
+        self.watch_label = QLabel('')
+        layout.addWidget(self.watch_label)
+
+        # Output directory for all jobs; empty means 'converted' next to each file
+        output_layout = QHBoxLayout()
+        self.output_dir_edit = QLineEdit(output_dir)
+        self.output_dir_edit.setPlaceholderText("Default: 'converted' folder next to each input file")
+        browse_btn = QPushButton('Browse...')
+        browse_btn.clicked.connect(self.browse_output_dir)
+        output_layout.addWidget(self.output_dir_edit)
+        output_layout.addWidget(browse_btn)
+        layout.addLayout(output_layout)
+
+        options_layout = QHBoxLayout()
+        options_layout.addWidget(QLabel('Parallel jobs:'))
+        self.concurrency_spin = QSpinBox()
+        self.concurrency_spin.setRange(1, max(1, os.cpu_count() or 1))
+        self.concurrency_spin.setValue(min(self.queue.max_concurrent, self.concurrency_spin.maximum()))
+        self.concurrency_spin.valueChanged.connect(self.on_concurrency_changed)
+        options_layout.addWidget(self.concurrency_spin)
+        options_layout.addWidget(QLabel('EPUB output:'))
+        self.epub_format_combo = QComboBox()
+        self.epub_format_combo.addItems(['EPUB', 'PDF'])
+        options_layout.addWidget(self.epub_format_combo)
+        self.pdf_mode_combo = QComboBox()
+        self.pdf_mode_combo.addItem("PDF to PDF")
+        self.pdf_mode_combo.addItem("PDF to EPUB (preserve images, experimental)")
+        self.pdf_mode_combo.setCurrentIndex(1 if pdf_to_epub else 0)
+        options_layout.addWidget(self.pdf_mode_combo)
+        layout.addLayout(options_layout)
+
+        self.table = QTableWidget(0, len(self.COLUMNS))
+        self.table.setHorizontalHeaderLabels(self.COLUMNS)
+        self.table.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
+        self.table.horizontalHeader().setSectionResizeMode(3, QHeaderView.Stretch)
+        self.table.setEditTriggers(QTableWidget.NoEditTriggers)
+        layout.addWidget(self.table)
+
+        self.summary_label = QLabel('')
+        layout.addWidget(self.summary_label)
+
+        buttons_layout = QHBoxLayout()
+        self.start_btn = QPushButton('Start')
+        self.start_btn.clicked.connect(self.start_queue)
+        self.stop_btn = QPushButton('Stop After Running Jobs')
+        self.stop_btn.clicked.connect(self.stop_queue)
+        self.cancel_btn = QPushButton('Cancel Running Jobs')
+        self.cancel_btn.setToolTip("Cancel the running jobs; converting the same file again resumes where it stopped.")
+        self.cancel_btn.clicked.connect(self.queue.cancel_running)
+        self.clear_btn = QPushButton('Clear Finished')
+        self.clear_btn.clicked.connect(self.clear_finished)
+        buttons_layout.addWidget(self.start_btn)
+        buttons_layout.addWidget(self.stop_btn)
+        buttons_layout.addWidget(self.cancel_btn)
+        buttons_layout.addWidget(self.clear_btn)
+        layout.addLayout(buttons_layout)
+        self.setLayout(layout)
+        self.update_summary()
+
+    def browse_output_dir(self):
+        start_dir = self.output_dir_edit.text() or os.path.expanduser("~")
+        directory = QFileDialog.getExistingDirectory(self, "Select Output Directory", start_dir)
+        if directory:
+            self.output_dir_edit.setText(os.path.normpath(directory))
+
+    def output_dir_for(self, file_path):
+        chosen_dir = self.output_dir_edit.text().strip()
+        if chosen_dir:
+            return os.path.normpath(chosen_dir)
+        return os.path.normpath(os.path.join(os.path.dirname(file_path), 'converted'))
+
+    def add_files(self):
+        file_paths, _ = QFileDialog.getOpenFileNames(self, 'Add Files', '', 'PDF or EPUB Files (*.pdf *.epub)')
+        self.add_paths(file_paths)
+
+    def add_folder(self):
+        directory = QFileDialog.getExistingDirectory(self, 'Add Folder')
+        if directory:
+            self.add_paths(sorted(os.path.join(directory, name) for name in os.listdir(directory)
+                                  if name.lower().endswith(SUPPORTED_EXTENSIONS)))
+
+    def add_paths(self, file_paths):
+        pdf_to_epub = self.pdf_mode_combo.currentIndex() == 1
+        epub_output_format = self.epub_format_combo.currentText()
+        waiting = {(os.path.normpath(job['file_path']), job['pdf_to_epub'], job['epub_output_format'])
+                   for job in self.queue.jobs if job['status'] in ('Queued', 'Running')}
+        for file_path in file_paths:
+            key = (os.path.normpath(file_path), pdf_to_epub, epub_output_format)
+            if key in waiting:
+                continue  # Same file and mode already waiting in the queue
+            waiting.add(key)
+            index = self.queue.add_job(file_path, self.output_dir_for(file_path),
+                                       pdf_to_epub=pdf_to_epub, epub_output_format=epub_output_format)
+            self.table.insertRow(index)
+            self.update_row(index)
+        self.update_summary()
+
+    def toggle_watch(self):
+        if self.watch_thread:
+            self.stop_watching()
+            return
+        start_dir = self.settings.get('watch_folder') or os.path.expanduser("~")
+        folder = QFileDialog.getExistingDirectory(self, 'Watch Folder', start_dir)
+        if folder:
+            self.start_watching(os.path.normpath(folder))
+
+    def start_watching(self, folder):
+        # Output goes where a file from the folder would go: the chosen directory, else 'converted' inside it
+        chosen_dir = self.output_dir_edit.text().strip()
+        output_dir = os.path.normpath(chosen_dir or os.path.join(folder, 'converted'))
+        try:
+            os.makedirs(output_dir, exist_ok=True)
+        except OSError as e:
+            QMessageBox.warning(self, 'Watch Folder', f"Could not create the output directory:\n{output_dir}\n\n{e}")
+            return
+        self.watch_options = watch_options(output_dir, pdf_to_epub=self.pdf_mode_combo.currentIndex() == 1,
+                                           output_format=self.epub_format_combo.currentText(),
+                                           render_mode=self.queue.render_mode, image_mode=self.queue.image_mode,
+                                           raster_dpi=self.queue.raster_dpi, match_fonts=self.queue.match_fonts,
+                                           optimize=self.queue.optimize, max_image_px=self.queue.max_image_px)
+        self.watch_state = WatchState(default_state_path(output_dir))
+        self.watch_output_dir = output_dir
+        self.watch_thread = FolderWatchThread(folder, self.watch_state, self.watch_options)
+        self.watch_thread.file_ready.connect(self.on_watched_file)
+        self.watch_thread.failed.connect(self.on_watch_failed)
+        self.watch_thread.start()
+        self.settings['watch_folder'] = folder
+        save_settings(self.settings)
+        self.watch_btn.setText('Stop Watching')
+        self.watch_label.setText(f'Watching {folder} -> {output_dir}')
+
+    def stop_watching(self):
+        if self.watch_thread:
+            self.watch_thread.stop()
+            self.watch_thread = None
+        self.watch_deferred.clear()
+        self.watch_btn.setText('Watch Folder...')
+        self.watch_label.setText('')
+
+    def on_watch_failed(self, message):
+        self.stop_watching()
+        QMessageBox.warning(self, 'Watch Folder', f"Stopped watching the folder:\n{message}")
+
+    def on_watched_file(self, file_path, fingerprint):
+        file_path = os.path.normpath(file_path)
+        for job in self.queue.jobs:
+            if job.get('watch') and os.path.normpath(job['file_path']) == file_path:
+                if job['status'] == 'Queued':
+                    job['watch'] = (self.watch_state, self.watch_options, fingerprint)  # Convert the latest content
+                    return
+                if job['status'] == 'Running':
+                    self.watch_deferred[file_path] = fingerprint  # Queued again once this run has finished
+                    return
+        index = self.queue.add_job(file_path, self.watch_output_dir, pdf_to_epub=self.watch_options['pdf_to_epub'],
+                                   epub_output_format=self.watch_options['format'])
+        self.queue.jobs[index]['watch'] = (self.watch_state, self.watch_options, fingerprint)
+        self.table.insertRow(index)
+        self.update_row(index)
+        self.queue.start()
+
+    def on_job_finished(self, index):
+        job = self.queue.jobs[index]
+        if not job.get('watch'):
+            return
+        state, options, fingerprint = job['watch']
+        # A cancelled file is not recorded, so watching the folder again converts it
+        if job['status'] == 'Done':
+            state.record(job['file_path'], fingerprint, options, output=job['result'])
+        elif job['status'] == 'Failed':
+            state.record(job['file_path'], fingerprint, options, error=job['result'])
+        deferred = self.watch_deferred.pop(os.path.normpath(job['file_path']), None)
+        if deferred is not None and self.watch_thread:
+            self.on_watched_file(job['file_path'], deferred)
+
+    def update_row(self, index):
+        job = self.queue.jobs[index]
+        values = [os.path.basename(job['file_path']), job['status'], f"{job['progress']}%", job['result']]
+        for column, value in enumerate(values):
+            item = QTableWidgetItem(value)
+            if column == 0:
+                item.setToolTip(job['file_path'])
+            elif column == 3:
+                item.setToolTip(value)
+            self.table.setItem(index, column, item)
+        self.update_summary()
+
+    def update_summary(self):
+        counts = {}
+        for job in self.queue.jobs:
+            counts[job['status']] = counts.get(job['status'], 0) + 1
+        self.summary_label.setText(', '.join(f'{status}: {counts.get(status, 0)}'
+                                             for status in ('Queued', 'Running', 'Done', 'Failed', 'Cancelled')))
+
+    def on_concurrency_changed(self, value):
+        self.queue.set_max_concurrent(value)
+        self.settings['batch_max_jobs'] = value
+        save_settings(self.settings)
+
+    def start_queue(self):
+        self.queue.start()
+
+    def stop_queue(self):
+        self.queue.stop()
+
+    def clear_finished(self):
+        self.queue.clear_finished()
+        self.table.setRowCount(len(self.queue.jobs))
+        for index in range(len(self.queue.jobs)):
+            self.update_row(index)
+        self.update_summary()
+
+    def on_all_finished(self):
+        self.update_summary()
+
+    def closeEvent(self, event):
+        if self.queue.active_count():
+            QMessageBox.information(self, 'Batch Conversion', 'Please wait for the running jobs to finish.')
+            self.queue.stop()
+            event.ignore()
+            return
+        super().closeEvent(event)
+# --- End Batch Conversion Queue ---
+
+class ModulePreloadThread(QThread):
+    # Imports the converter modules in the background; a conversion started meanwhile waits on the import lock
+    def __init__(self, modules=PRELOAD_MODULES):
+        super().__init__()
+        self.modules = modules
+
+    def run(self):
+        import importlib
+        for name in self.modules:
+            try:
+                importlib.import_module(name)
+            except Exception as e:
+                print(f"Could not preload {name}: {e}")
+
 class BionicPreserveApp(QMainWindow):
     def __init__(self):
+        self.init_time = time.perf_counter()
         super().__init__()
         self.settings = load_settings()
         self.dark_mode = self.settings.get('dark_mode', False)
         self.setWindowTitle('Bionic Writing PDF Converter')
         # --- Add Icon ---
         # Make sure 'icon.png' or 'icon.ico' exists in the same directory
+        # One QIcon for the window and the buttons: each QIcon decodes the (large) image again
+        self.app_icon = QIcon()
         icon_path = resource_path('icon.png')
         if not os.path.exists(icon_path):
             icon_path = resource_path('icon.ico')  # Fallback for .ico
         if os.path.exists(icon_path):
-            self.setWindowIcon(QIcon(icon_path))
+            self.app_icon = QIcon(icon_path)
+            self.setWindowIcon(self.app_icon)
         else:
             print("Warning: icon.png or icon.ico not found. No application icon set.")
         # --- End Add Icon ---
@@ -361,12 +784,16 @@ class BionicPreserveApp(QMainWindow):
 
         self.init_ui()
         self.apply_theme(self.dark_mode)
+        self.ready_time = time.perf_counter()
 
     def init_ui(self):
         main_layout = QVBoxLayout() # Renamed layout to main_layout
         self.label = QLabel('Select a PDF to apply bionic reading style.')
         self.open_btn = QPushButton('Open PDF')
         self.open_btn.clicked.connect(self.open_pdf)
+        self.batch_btn = QPushButton('Batch Convert...')
+        self.batch_btn.setToolTip("Convert several files or a whole folder, several at a time, or watch a folder for new files.")
+        self.batch_btn.clicked.connect(self.open_batch_dialog)
         
         # --- Output Directory Widgets ---
         output_label = QLabel("Output Directory:")
@@ -392,6 +819,18 @@ class BionicPreserveApp(QMainWindow):
         self.progress_bar.setValue(0)
         self.progress_bar.setTextVisible(False) 
 
+        # Pause/Cancel for the running conversion; a cancelled PDF conversion resumes on the next Convert
+        control_layout = QHBoxLayout()
+        self.pause_btn = QPushButton('Pause')
+        self.pause_btn.clicked.connect(self.toggle_pause)
+        self.cancel_btn = QPushButton('Cancel')
+        self.cancel_btn.setToolTip("Stop the conversion. Converting the same file again continues where it stopped.")
+        self.cancel_btn.clicked.connect(self.cancel_conversion)
+        self.pause_btn.setEnabled(False)  # Enabled while a conversion runs
+        self.cancel_btn.setEnabled(False)
+        control_layout.addWidget(self.pause_btn)
+        control_layout.addWidget(self.cancel_btn)
+
         self.timer_label = QLabel('') 
         self.shrink_label = QLabel('') 
         self.shrink_btn = QPushButton('Shrink Last Converted PDF')
@@ -409,12 +848,8 @@ class BionicPreserveApp(QMainWindow):
         self.gif_label.setAlignment(Qt.AlignCenter)  # Center align the GIF
         main_layout.addWidget(self.gif_label)  # Add the GIF label under the progress bar
 
-        # Set initial GIF to hacker-man-hacker.gif
-        self.loading_gif = QMovie(resource_path('hacker-man-hacker.gif'))
-        self.finished_gif = QMovie(resource_path('finished-elijah-wood.gif'))
-        self.idle_gif = QMovie(resource_path('patrick-star-to-do-list.gif'))
-        self.gif_label.setMovie(self.idle_gif)
-        self.idle_gif.start()
+        # GIFs are loaded the first time they are shown; the idle one once the window is up (see on_shown)
+        self.gifs = {}
 
         # Add dark mode toggle as a small icon-only button
         self.dark_mode_btn = QPushButton()
@@ -437,21 +872,90 @@ class BionicPreserveApp(QMainWindow):
         self.experimental_combo.setToolTip("Experimental: Try PDF to EPUB with images preserved per page.")
         main_layout.addWidget(self.experimental_combo)
 
+        # Number of processes used for PDF to PDF conversion
+        workers_layout = QHBoxLayout()
+        workers_label = QLabel("PDF worker processes:")
+        self.workers_spin = QSpinBox()
+        self.workers_spin.setRange(1, os.cpu_count() or 1)
+        self.workers_spin.setValue(min(self.settings.get('pdf_workers', 1), self.workers_spin.maximum()))
+        self.workers_spin.setToolTip("Convert PDF pages in parallel using this many processes.")
+        self.workers_spin.valueChanged.connect(self.on_workers_changed)
+        workers_layout.addWidget(workers_label)
+        workers_layout.addWidget(self.workers_spin)
+        main_layout.addLayout(workers_layout)
+
+        # Convert only part of the document
+        pages_layout = QHBoxLayout()
+        pages_label = QLabel("Pages / chapters:")
+        self.pages_edit = QLineEdit()
+        self.pages_edit.setPlaceholderText("All (e.g. 1-20,45,100-)")
+        self.pages_edit.setToolTip("Convert only these pages of a PDF, or these chapters of an EPUB.")
+        pages_layout.addWidget(pages_label)
+        pages_layout.addWidget(self.pages_edit)
+        main_layout.addLayout(pages_layout)
+
+        # How bionic text is drawn into PDF output
+        self.render_combo = QComboBox()
+        self.render_combo.addItem("PDF text: accurate layout (HTML, slower)", 'html')
+        self.render_combo.addItem("PDF text: fast direct glyphs (Latin text)", 'text')
+        self.render_combo.setCurrentIndex(max(0, self.render_combo.findData(self.settings.get('pdf_render_mode', 'html'))))
+        self.render_combo.setToolTip("Fast mode writes each word at the original font size without the HTML layout engine.")
+        self.render_combo.currentIndexChanged.connect(self.on_render_mode_changed)
+        main_layout.addWidget(self.render_combo)
+
+        # How PDF pages with both text and images are rebuilt
+        self.image_mode_combo = QComboBox()
+        self.image_mode_combo.addItem("Mixed pages: rasterize (compatible)", 'raster')
+        self.image_mode_combo.addItem("Mixed pages: keep vector images (smaller, sharper)", 'vector')
+        self.image_mode_combo.setCurrentIndex(max(0, self.image_mode_combo.findData(self.settings.get('pdf_image_mode', 'raster'))))
+        self.image_mode_combo.setToolTip("Keep the original images and drawings and only replace the text layer.")
+        self.image_mode_combo.currentIndexChanged.connect(self.on_image_mode_changed)
+        main_layout.addWidget(self.image_mode_combo)
+
+        # How hard to optimize PDF output, and whether to do it while converting
+        shrink_layout = QHBoxLayout()
+        self.shrink_preset_combo = QComboBox()
+        self.shrink_preset_combo.addItem("Shrink: fast (remove unused objects)", 'fast')
+        self.shrink_preset_combo.addItem("Shrink: subset fonts, merge duplicates", 'fonts')
+        self.shrink_preset_combo.addItem("Shrink: fonts + recompress/downsample images", 'images')
+        self.shrink_preset_combo.setCurrentIndex(max(0, self.shrink_preset_combo.findData(
+            self.settings.get('shrink_preset', DEFAULT_SHRINK_PRESET))))
+        self.shrink_preset_combo.setToolTip("Image recompression uses the PDF worker processes.")
+        self.shrink_preset_combo.currentIndexChanged.connect(self.on_shrink_preset_changed)
+        self.optimize_checkbox = QCheckBox("Optimize while converting")
+        self.optimize_checkbox.setChecked(self.settings.get('optimize_inline', False))
+        self.optimize_checkbox.setToolTip("Apply the shrink preset to PDF output as it is saved, instead of shrinking afterwards.")
+        self.optimize_checkbox.toggled.connect(self.on_optimize_toggled)
+        shrink_layout.addWidget(self.shrink_preset_combo)
+        shrink_layout.addWidget(self.optimize_checkbox)
+
+        # Reuse earlier conversions of unchanged files and pages
+        cache_layout = QHBoxLayout()
+        self.cache_checkbox = QCheckBox("Reuse cached conversions")
+        self.cache_checkbox.setChecked(self.settings.get('use_cache', True))
+        self.cache_checkbox.setToolTip("Unchanged files are returned instantly and only edited PDF pages are converted again.")
+        self.cache_checkbox.toggled.connect(self.on_cache_toggled)
+        self.clear_cache_btn = QPushButton("Clear Cache")
+        self.clear_cache_btn.clicked.connect(self.clear_cache)
+        cache_layout.addWidget(self.cache_checkbox)
+        cache_layout.addStretch()
+        cache_layout.addWidget(self.clear_cache_btn)
+        main_layout.addLayout(cache_layout)
+
         main_layout.addWidget(self.label)
         main_layout.addWidget(self.open_btn)
+        main_layout.addWidget(self.batch_btn)
         main_layout.addWidget(output_label) # Add output label
         main_layout.addLayout(output_layout) # Add output HBox layout
         main_layout.addWidget(self.convert_btn)
         main_layout.addWidget(self.progress_bar)
+        main_layout.addLayout(control_layout)
         main_layout.addWidget(self.timer_label) 
         main_layout.addWidget(self.shrink_label) 
         main_layout.addWidget(self.shrink_btn)   
+        main_layout.addLayout(shrink_layout)
         main_layout.addWidget(self.open_folder_btn) 
 
-        # Add disclaimer label for shrinking
-        self.disclaimer_label = QLabel("Note: The app might be unresponsive during shrinking.")
-        self.disclaimer_label.setStyleSheet("color: gray; font-size: 10pt;")
-        main_layout.addWidget(self.disclaimer_label)
 
         container = QWidget()
         container.setLayout(main_layout)
@@ -459,10 +963,10 @@ class BionicPreserveApp(QMainWindow):
         self.selected_file = None
 
         # Add icons to buttons
-        self.open_btn.setIcon(QIcon("icon.png"))
-        self.convert_btn.setIcon(QIcon("icon.png"))
-        self.shrink_btn.setIcon(QIcon("icon.png"))
-        self.open_folder_btn.setIcon(QIcon("icon.png"))
+        self.open_btn.setIcon(self.app_icon)
+        self.convert_btn.setIcon(self.app_icon)
+        self.shrink_btn.setIcon(self.app_icon)
+        self.open_folder_btn.setIcon(self.app_icon)
 
         # Call update_button_states at the end to set initial state
         self.update_button_states()
@@ -561,6 +1065,12 @@ class BionicPreserveApp(QMainWindow):
     def start_conversion(self):
         if not self.selected_file:
             return
+        pages = self.pages_edit.text().strip() or None
+        try:
+            split_ranges(pages)
+        except ValueError as e:
+            QMessageBox.warning(self, "Page Selection", str(e))
+            return
         
         output_dir = self.get_output_directory() # Get chosen/default directory
         self.last_output_dir = output_dir # Store the actual directory being used
@@ -581,45 +1091,85 @@ class BionicPreserveApp(QMainWindow):
         self.start_time = time.time() 
         self.timer.start(1000) 
         
-        # Experimental PDF to EPUB (preserve images)
-        if self.selected_file.lower().endswith('.pdf') and self.is_experimental_pdf2epub():
-            self.converter_thread = ExperimentalPDFToEPUBThread(
-                self.selected_file,
-                self.bionic_reading,
-                output_dir
-            )
-        elif self.selected_file.lower().endswith('.epub'):
-            self.converter_thread = EpubConverterThread(
-                self.selected_file,
-                self.bionic_reading,
-                output_dir,
-                getattr(self, 'selected_epub_output_format', 'EPUB')
-            )
-        else:
-            self.converter_thread = PDFConverterThread(self.selected_file, self.bionic_reading, output_dir)
+        # Experimental PDF to EPUB (preserve images), EPUB or standard PDF conversion
+        self.converter_thread = create_converter_thread(
+            self.selected_file,
+            output_dir,
+            pdf_to_epub=self.is_experimental_pdf2epub(),
+            epub_output_format=getattr(self, 'selected_epub_output_format', None) or 'EPUB',
+            workers=self.workers_spin.value(),
+            render_mode=self.selected_render_mode(),
+            image_mode=self.selected_image_mode(),
+            raster_dpi=self.settings.get('raster_dpi'),
+            chunk_pages=self.settings.get('pdf_chunk_pages', 100),
+            cache=conversion_cache(self.settings),
+            max_image_px=self.settings.get('epub_max_image_px'),
+            metrics_log=self.settings.get('metrics_log'),
+            profile_mode=self.settings.get('profile_mode'),
+            optimize=self.selected_shrink_preset() if self.optimize_checkbox.isChecked() else None,
+            match_fonts=self.settings.get('match_fonts', False),
+            pages=pages
+        )
         self.converter_thread.progress.connect(self.on_progress_update)
+        self.converter_thread.metrics.connect(self.on_conversion_metrics)
         self.converter_thread.finished.connect(self.on_conversion_finished)
         self.converter_thread.saving.connect(self.on_saving_started)
         self.converter_thread.started.connect(self.show_loading_gif)  # Update GIF during conversion
         self.converter_thread.finished.connect(self.show_finished_gif)  # Update GIF when conversion is complete
         self.converter_thread.start()
+        self.pause_btn.setEnabled(True)
+        self.cancel_btn.setEnabled(True)
 
     def on_progress_update(self, value):
         self.progress_bar.setValue(value)
         self.progress_bar.setFormat(f"{value}%")
         self.progress_bar.setTextVisible(True)
 
+    def on_conversion_metrics(self, summary):
+        # Stage breakdown of the finished conversion: console log plus a tooltip on the elapsed time
+        report = format_summary(summary)
+        print(report)
+        self.timer_label.setToolTip(report)
+
+    def toggle_pause(self):
+        control = self.converter_thread.control
+        if control.paused:
+            control.resume()
+            self.pause_btn.setText('Pause')
+            self.label.setText(f'Converting: {os.path.basename(self.selected_file)}...')
+        else:
+            control.pause()
+            self.pause_btn.setText('Resume')
+            self.label.setText('Paused (after the current page).')
+
+    def cancel_conversion(self):
+        self.converter_thread.control.cancel()
+        self.pause_btn.setText('Pause')
+        self.cancel_btn.setEnabled(False)
+        self.pause_btn.setEnabled(False)
+        self.label.setText('Cancelling...')
+
     def on_saving_started(self):
         self.label.setText('Saving PDF... This may take a moment.')
         self.progress_bar.setValue(99)
 
     def on_conversion_finished(self, out_path):
         self.timer.stop() 
+        self.pause_btn.setText('Pause')
+        self.pause_btn.setEnabled(False)
+        self.cancel_btn.setEnabled(False)
+        if out_path == CANCELLED_RESULT:
+            # Keep the file selected so Convert resumes from the checkpoint
+            self.label.setText(f'Cancelled: {os.path.basename(self.selected_file)}. Convert again to resume.')
+            self.progress_bar.setValue(0)
+            self.timer_label.setText('Elapsed: --:--')
+            self.update_button_states()
+            return
         self.selected_file = None # Reset selected file after conversion
         self.progress_bar.setTextVisible(True)
         self.progress_bar.setFormat("100%")
         
-        if out_path.lower().startswith('error') or out_path.lower().startswith('exception'):
+        if is_error_result(out_path):
             # ... error handling ...
             self.label.setText("Conversion Failed.") 
             self.shrink_label.setText(out_path) 
@@ -653,13 +1203,13 @@ class BionicPreserveApp(QMainWindow):
         output_dir = self.get_output_directory() 
         self.last_output_dir = output_dir # Store the actual directory being used
 
-        # Update label and set wait cursor BEFORE starting thread
-        self.shrink_label.setText('Shrinking PDF... App may be unresponsive. Please wait.')
-        QApplication.setOverrideCursor(Qt.WaitCursor) # Set wait cursor
+        self.shrink_label.setText('Shrinking PDF...')
+        self.shrink_report = None
 
-        # ... disable buttons, set progress bar indeterminate, start timer ...
-        self.progress_bar.setRange(0, 0) 
-        self.progress_bar.setTextVisible(False)
+        # ... disable buttons, reset progress bar, start timer ...
+        self.progress_bar.setRange(0, 100) 
+        self.progress_bar.setValue(0)
+        self.progress_bar.setTextVisible(True)
         self.shrink_btn.setEnabled(False) 
         self.open_btn.setEnabled(False)   
         self.convert_btn.setEnabled(False)
@@ -671,13 +1221,18 @@ class BionicPreserveApp(QMainWindow):
         self.timer.start(1000) 
 
         # Pass the output directory to the shrink thread
-        self.shrinker_thread = PDFShrinkThread(self.last_converted_path, output_dir) 
+        self.shrinker_thread = PDFShrinkThread(self.last_converted_path, output_dir,
+                                               self.selected_shrink_preset(), self.workers_spin.value()) 
+        self.shrinker_thread.progress.connect(self.on_progress_update)
+        self.shrinker_thread.report.connect(self.on_shrink_report)
         self.shrinker_thread.finished.connect(self.on_shrinking_finished)
         self.shrinker_thread.start()
 
+    def on_shrink_report(self, report):
+        self.shrink_report = report
+
     def on_shrinking_finished(self, result_path):
         self.timer.stop() 
-        QApplication.restoreOverrideCursor() 
 
         self.progress_bar.setRange(0, 100) 
         self.progress_bar.setValue(100) 
@@ -691,7 +1246,13 @@ class BionicPreserveApp(QMainWindow):
         else:
             # ... success handling ...
             actual_output_dir = os.path.normpath(os.path.dirname(result_path)) # Normalize actual output dir
-            self.shrink_label.setText(f'Shrunk PDF saved as: {os.path.basename(result_path)}')
+            report = getattr(self, 'shrink_report', None)
+            saved = ''
+            if report:
+                saved = (f" ({report['input_bytes'] / 1048576:.1f} MB -> {report['output_bytes'] / 1048576:.1f} MB; "
+                         + ', '.join(f"{phase['phase']} -{phase['saved_bytes'] / 1048576:.1f} MB"
+                                     for phase in report['phases']) + ')')
+            self.shrink_label.setText(f'Shrunk PDF saved as: {os.path.basename(result_path)}{saved}')
             self.last_output_dir = actual_output_dir # Store normalized dir
             self.output_dir_edit.setText(actual_output_dir) # Update edit field with normalized dir
             if self.start_time:
@@ -719,32 +1280,36 @@ class BionicPreserveApp(QMainWindow):
     # --- End New Method ---
 
     # Add methods to handle GIF changes
+    def show_gif(self, file_name):
+        movie = self.gifs.get(file_name)
+        if movie is None:
+            movie = self.gifs[file_name] = QMovie(resource_path(file_name))
+        self.gif_label.setMovie(movie)
+        movie.start()
+
     def show_loading_gif(self):
-        self.gif_label.setMovie(self.loading_gif)
-        self.loading_gif.start()
+        self.show_gif('hacker-man-hacker.gif')
 
     def show_finished_gif(self):
-        self.gif_label.setMovie(self.finished_gif)
-        self.finished_gif.start()
+        self.show_gif('finished-elijah-wood.gif')
 
     def show_idle_gif(self):
-        self.gif_label.setMovie(self.idle_gif)
-        self.idle_gif.start()
-
-    def bionic_reading(self, text):
-        # Apply bionic reading: bold the first part of each word, preserving line breaks and spacing, using HTML <b> tags
-        def style_word(word):
-            if len(word) < 3:
-                return f"<b>{word}</b>"
-            split = (len(word) + 1) // 2
-            return f"<b>{word[:split]}</b>{word[split:]}"
-        lines = text.splitlines(keepends=True)
-        styled_lines = []
-        for line in lines:
-            words = line.split(' ')
-            styled_words = [style_word(w) if w.isalpha() else w for w in words]
-            styled_lines.append(' '.join(styled_words))
-        return ''.join(styled_lines)
+        self.show_gif('patrick-star-to-do-list.gif')
+
+    def on_shown(self):
+        # Runs from the event loop once the first window is on screen: start the idle GIF and the preloading
+        if import_timer:
+            import_timer.uninstall()
+            shown = time.perf_counter()
+            print(import_timer.report(), file=sys.stderr)
+            print(f"Startup: first window after {(shown - STARTUP_TIME) * 1000:.0f} ms "
+                  f"(imports and QApplication {(self.init_time - STARTUP_TIME) * 1000:.0f} ms, "
+                  f"window {(self.ready_time - self.init_time) * 1000:.0f} ms, "
+                  f"show {(shown - self.ready_time) * 1000:.0f} ms)", file=sys.stderr, flush=True)
+        self.show_idle_gif()
+        if self.settings.get('preload_converters', True):
+            self.preload_thread = ModulePreloadThread()
+            self.preload_thread.start()
 
     # Modify method to update button states comprehensively
     def update_button_states(self):
@@ -759,6 +1324,14 @@ class BionicPreserveApp(QMainWindow):
         self.open_btn.setEnabled(not is_processing)
         self.convert_btn.setEnabled(file_selected and not is_processing)
         self.browse_output_btn.setEnabled(not is_processing) # Always enabled unless processing
+        self.workers_spin.setEnabled(not is_processing)
+        self.pages_edit.setEnabled(not is_processing)
+        self.render_combo.setEnabled(not is_processing)
+        self.image_mode_combo.setEnabled(not is_processing)
+        self.cache_checkbox.setEnabled(not is_processing)
+        self.shrink_preset_combo.setEnabled(not is_processing)
+        self.optimize_checkbox.setEnabled(not is_processing)
+        self.clear_cache_btn.setEnabled(not is_processing)
         # Only enable shrink if last converted file is a PDF
         is_pdf = self.last_converted_path and self.last_converted_path.lower().endswith('.pdf')
         self.shrink_btn.setEnabled(conversion_done and is_pdf and not is_processing)
@@ -767,6 +1340,57 @@ class BionicPreserveApp(QMainWindow):
         # Enable/Disable output directory editing
         self.output_dir_edit.setEnabled(not is_processing)
 
+    def open_batch_dialog(self):
+        if not hasattr(self, 'batch_dialog'):
+            self.batch_dialog = BatchDialog(self, self.settings, self.output_dir_edit.text().strip(),
+                                            self.is_experimental_pdf2epub())
+        self.batch_dialog.show()
+        self.batch_dialog.raise_()
+
+    def selected_render_mode(self):
+        return self.render_combo.currentData()
+
+    def on_render_mode_changed(self, index):
+        self.settings['pdf_render_mode'] = self.selected_render_mode()
+        save_settings(self.settings)
+
+    def selected_image_mode(self):
+        return self.image_mode_combo.currentData()
+
+    def on_image_mode_changed(self, index):
+        self.settings['pdf_image_mode'] = self.selected_image_mode()
+        save_settings(self.settings)
+
+    def selected_shrink_preset(self):
+        return self.shrink_preset_combo.currentData() or DEFAULT_SHRINK_PRESET
+
+    def on_shrink_preset_changed(self, index):
+        self.settings['shrink_preset'] = self.selected_shrink_preset()
+        save_settings(self.settings)
+
+    def on_optimize_toggled(self, checked):
+        self.settings['optimize_inline'] = checked
+        save_settings(self.settings)
+
+    def on_cache_toggled(self, checked):
+        self.settings['use_cache'] = checked
+        save_settings(self.settings)
+        if hasattr(self, 'batch_dialog'):
+            self.batch_dialog.queue.set_cache(conversion_cache(self.settings))
+
+    def clear_cache(self):
+        cache = ConversionCache(self.settings.get('cache_dir') or None)
+        size_mb = cache.stats()['bytes'] / (1024 * 1024)
+        reply = QMessageBox.question(self, "Clear Cache",
+                                     f"Delete {size_mb:.1f} MB of cached conversions in\n{cache.cache_dir}?",
+                                     QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
+        if reply == QMessageBox.Yes:
+            cache.clear()
+
+    def on_workers_changed(self, value):
+        self.settings['pdf_workers'] = value
+        save_settings(self.settings)
+
     def toggle_dark_mode(self):
         self.dark_mode = not self.dark_mode
         self.apply_theme(self.dark_mode)
@@ -802,23 +1426,19 @@ class BionicPreserveApp(QMainWindow):
     def is_experimental_pdf2epub(self):
         return self.experimental_combo.currentIndex() == 1
 
+    def closeEvent(self, event):
+        # The batch dialog keeps watching its folder while hidden; stop the watch thread and workers before exiting
+        if hasattr(self, 'batch_dialog'):
+            self.batch_dialog.stop_watching()
+            self.batch_dialog.queue.shutdown()
+        super().closeEvent(event)
+
 if __name__ == '__main__':
+    # Needed for the PDF worker processes in a frozen (PyInstaller) build
+    import multiprocessing
+    multiprocessing.freeze_support()
     app = QApplication(sys.argv)
     window = BionicPreserveApp()
     window.show()
+    QTimer.singleShot(0, window.on_shown)
     sys.exit(app.exec_())
-
-# Determine if running as a PyInstaller bundle
-def resource_path(relative_path):
-    if hasattr(sys, '_MEIPASS'):
-        return os.path.join(sys._MEIPASS, relative_path)
-    return os.path.join(os.path.abspath("."), relative_path)
-
-# Update icon path
-icon_path = resource_path('icon.png')
-if not os.path.exists(icon_path):
-    icon_path = resource_path('icon.ico')  # Fallback for .ico
-if os.path.exists(icon_path):
-    self.setWindowIcon(QIcon(icon_path))
-else:
-    print("Warning: icon.png or icon.ico not found. No application icon set.")
@@ -0,0 +1,49 @@
+# -*- mode: python ; coding: utf-8 -*-
+# Startup-optimized variant of main.spec: a onedir build (dist/main/) runs the program
+# straight from its folder instead of unpacking a onefile archive to a temporary
+# directory on every launch, and leaves UPX off since compressed libraries are unpacked
+# again each time they load. Build with: pyinstaller main_onedir.spec
+
+
+a = Analysis(
+    ['main.py'],
+    pathex=[],
+    binaries=[],
+    datas=[('icon.png', '.'), ('patrick-star-to-do-list.gif', '.'), ('hacker-man-hacker.gif', '.'), ('finished-elijah-wood.gif', '.')],
+    hiddenimports=[],
+    hookspath=[],
+    hooksconfig={},
+    runtime_hooks=[],
+    excludes=[],
+    noarchive=False,
+    optimize=0,
+)
+pyz = PYZ(a.pure)
+
+exe = EXE(
+    pyz,
+    a.scripts,
+    [],
+    exclude_binaries=True,
+    name='main',
+    debug=False,
+    bootloader_ignore_signals=False,
+    strip=False,
+    upx=False,
+    console=False,
+    disable_windowed_traceback=False,
+    argv_emulation=False,
+    target_arch=None,
+    codesign_identity=None,
+    entitlements_file=None,
+    icon=['icon.ico'],
+)
+coll = COLLECT(
+    exe,
+    a.binaries,
+    a.datas,
+    strip=False,
+    upx=False,
+    upx_exclude=[],
+    name='main',
+)
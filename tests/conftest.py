@@ -0,0 +1,119 @@
+import zipfile
+
+import fitz  # PyMuPDF
+import pytest
+
+CHAPTER = '''<?xml version='1.0' encoding='utf-8'?>
+<!DOCTYPE html>
+<html xmlns="http://www.w3.org/1999/xhtml" xml:lang="en">
+<head><title>{title}</title></head>
+<body><h1>{title}</h1><p>{text}</p></body>
+</html>
+'''
+
+PACKAGE = '''<?xml version='1.0' encoding='utf-8'?>
+<package xmlns="http://www.idpf.org/2007/opf" unique-identifier="id" version="3.0">
+<metadata xmlns:dc="http://purl.org/dc/elements/1.1/">
+<dc:identifier id="id">test-book</dc:identifier><dc:title>Test book</dc:title><dc:language>en</dc:language>
+</metadata>
+<manifest>
+<item id="nav" href="nav.xhtml" media-type="application/xhtml+xml" properties="nav"/>
+<item id="ncx" href="toc.ncx" media-type="application/x-dtbncx+xml"/>
+{items}</manifest>
+<spine toc="ncx">
+{itemrefs}</spine>
+</package>
+'''
+
+NAV = '''<?xml version='1.0' encoding='utf-8'?>
+<!DOCTYPE html>
+<html xmlns="http://www.w3.org/1999/xhtml" xmlns:epub="http://www.idpf.org/2007/ops">
+<head><title>Contents</title></head>
+<body><nav epub:type="toc"><ol>
+{links}</ol></nav></body>
+</html>
+'''
+
+NCX = '''<?xml version='1.0' encoding='utf-8'?>
+<ncx xmlns="http://www.daisy.org/z3986/2005/ncx/" version="2005-1">
+<head><meta name="dtb:uid" content="test-book"/></head>
+<docTitle><text>Test book</text></docTitle>
+<navMap>
+{points}</navMap>
+</ncx>
+'''
+
+CONTAINER = '''<?xml version="1.0"?>
+<container version="1.0" xmlns="urn:oasis:names:tc:opendocument:xmlns:container">
+<rootfiles><rootfile full-path="OEBPS/content.opf" media-type="application/oebps-package+xml"/></rootfiles>
+</container>
+'''
+
+
+def write_pdf(path, pages, fontname='helv'):
+    # One page per entry of ``pages``, each a list of text lines
+    doc = fitz.open()
+    for lines in pages:
+        page = doc.new_page()
+        for n, line in enumerate(lines):
+            page.insert_text((72, 72 + 24 * n), line, fontsize=14, fontname=fontname)
+    doc.save(path)
+    doc.close()
+    return path
+
+
+def write_form_pdf(path, text):
+    # A page that only draws a Form XObject ('q /fzFrm0 Do Q'), as show_pdf_page and imposition tools make
+    source = fitz.open()
+    source.new_page().insert_text((72, 72), text, fontsize=14)
+    doc = fitz.open()
+    page = doc.new_page()
+    page.show_pdf_page(page.rect, source, 0)
+    doc.save(path)
+    doc.close()
+    return path
+
+
+def write_epub(path, chapters):
+    # A small EPUB 3 book with one chapter per (title, text) pair, a nav document and an NCX
+    names = [f'chapter{n}.xhtml' for n in range(1, len(chapters) + 1)]
+    with zipfile.ZipFile(path, 'w') as archive:
+        archive.writestr('mimetype', 'application/epub+zip')
+        archive.writestr('META-INF/container.xml', CONTAINER)
+        archive.writestr('OEBPS/content.opf', PACKAGE.format(
+            items=''.join(f'<item id="c{n}" href="{name}" media-type="application/xhtml+xml"/>\n'
+                          for n, name in enumerate(names, 1)),
+            itemrefs=''.join(f'<itemref idref="c{n}"/>\n' for n in range(1, len(names) + 1))))
+        archive.writestr('OEBPS/nav.xhtml', NAV.format(links=''.join(
+            f'<li><a href="{name}">{title}</a></li>\n' for name, (title, _) in zip(names, chapters))))
+        archive.writestr('OEBPS/toc.ncx', NCX.format(points=''.join(
+            f'<navPoint id="p{n}" playOrder="{n}"><navLabel><text>{title}</text></navLabel>'
+            f'<content src="{name}"/></navPoint>\n'
+            for n, (name, (title, _)) in enumerate(zip(names, chapters), 1))))
+        for name, (title, text) in zip(names, chapters):
+            archive.writestr(f'OEBPS/{name}', CHAPTER.format(title=title, text=text),
+                             compress_type=zipfile.ZIP_DEFLATED)
+    return path
+
+
+def pdf_text(path):
+    with fitz.open(path) as doc:
+        return [page.get_text() for page in doc]
+
+
+@pytest.fixture
+def text_pdf(tmp_path):
+    return write_pdf(str(tmp_path / 'text.pdf'), [
+        ['Alpha page one about apples', 'second line of the first page'],
+        ['Bravo page two about bananas'],
+        ['Charlie page three about cherries'],
+    ])
+
+
+@pytest.fixture
+def book_epub(tmp_path):
+    return write_epub(str(tmp_path / 'book.epub'), [
+        ('One', 'The first chapter tells of apples.'),
+        ('Two', 'The second chapter tells of bananas.'),
+        ('Three', 'The third chapter tells of cherries.'),
+    ])
@@ -0,0 +1,93 @@
+import os
+
+import fitz  # PyMuPDF
+
+from bionic.cache import ConversionCache
+from bionic.converters import make_converter
+from conftest import pdf_text, write_form_pdf, write_pdf
+
+
+def page_key(cache, path, params=None):
+    with fitz.open(path) as doc:
+        return cache.page_key(doc, doc[0], params or {}, {})
+
+
+def test_form_xobject_pages_with_different_text_get_different_keys(tmp_path):
+    cache = ConversionCache(str(tmp_path / 'cache'))
+    a = write_form_pdf(str(tmp_path / 'a.pdf'), 'Alpha document about apples')
+    b = write_form_pdf(str(tmp_path / 'b.pdf'), 'Bravo document about bananas')
+    with fitz.open(a) as doc_a, fitz.open(b) as doc_b:
+        # The regression: both pages are just 'q /fzFrm0 Do Q' with the same font
+        assert doc_a[0].read_contents() == doc_b[0].read_contents()
+    assert page_key(cache, a) != page_key(cache, b)
+
+
+def test_form_xobject_pages_convert_to_their_own_text(tmp_path):
+    cache = ConversionCache(str(tmp_path / 'cache'))
+    a = write_form_pdf(str(tmp_path / 'a.pdf'), 'Alpha document about apples')
+    b = write_form_pdf(str(tmp_path / 'b.pdf'), 'Bravo document about bananas')
+    out_a = cache.run(make_converter(a, str(tmp_path / 'out')))
+    out_b = cache.run(make_converter(b, str(tmp_path / 'out')))
+    assert 'apples' in pdf_text(out_a)[0]
+    assert 'bananas' in pdf_text(out_b)[0]
+    assert 'apples' not in pdf_text(out_b)[0]
+
+
+def test_page_key_ignores_object_numbers(tmp_path):
+    cache = ConversionCache(str(tmp_path / 'cache'))
+    path = write_pdf(str(tmp_path / 'a.pdf'), [['Some text on the page']])
+    with fitz.open() as doc, fitz.open(path) as source:
+        # The same page copied behind another one, so its objects get other numbers
+        doc.new_page().insert_text((72, 72), 'A new first page')
+        doc.insert_pdf(source)
+        doc.save(str(tmp_path / 'b.pdf'))
+    with fitz.open(path) as doc_a, fitz.open(str(tmp_path / 'b.pdf')) as doc_b:
+        assert doc_a[0].xref != doc_b[1].xref
+        assert cache.page_key(doc_a, doc_a[0], {}, {}) == cache.page_key(doc_b, doc_b[1], {}, {})
+
+
+def test_page_key_depends_on_params_and_text(tmp_path):
+    cache = ConversionCache(str(tmp_path / 'cache'))
+    a = write_pdf(str(tmp_path / 'a.pdf'), [['Some text']])
+    b = write_pdf(str(tmp_path / 'b.pdf'), [['Other text']])
+    assert page_key(cache, a) != page_key(cache, b)
+    assert page_key(cache, a, {'render': 'html'}) != page_key(cache, a, {'render': 'text'})
+
+
+def test_edited_revision_reuses_unchanged_pages(tmp_path, text_pdf):
+    cache = ConversionCache(str(tmp_path / 'cache'))
+    cache.run(make_converter(text_pdf, str(tmp_path / 'out1')))
+    with fitz.open(text_pdf) as doc:
+        doc[1].insert_text((72, 200), 'an added line')
+        doc.save(str(tmp_path / 'edited.pdf'), garbage=3)
+    out = cache.run(make_converter(str(tmp_path / 'edited.pdf'), str(tmp_path / 'out2')))
+    assert cache.page_hits == 2
+    assert 'an added line' in pdf_text(out)[1]
+
+
+def test_run_reuses_the_whole_result(tmp_path, text_pdf):
+    cache = ConversionCache(str(tmp_path / 'cache'))
+    first = cache.run(make_converter(text_pdf, str(tmp_path / 'out1')))
+    second = cache.run(make_converter(text_pdf, str(tmp_path / 'out2')))
+    assert (cache.hits, cache.misses) == (1, 1)
+    with open(first, 'rb') as f1, open(second, 'rb') as f2:
+        assert f1.read() == f2.read()
+
+
+def test_job_key_depends_on_params(tmp_path, text_pdf):
+    cache = ConversionCache(str(tmp_path / 'cache'))
+    assert cache.job_key(text_pdf, {'mode': 'pdf'}) == cache.job_key(text_pdf, {'mode': 'pdf'})
+    assert cache.job_key(text_pdf, {'mode': 'pdf'}) != cache.job_key(text_pdf, {'mode': 'pdf2epub'})
+
+
+def test_evict_removes_least_recently_used(tmp_path):
+    cache = ConversionCache(str(tmp_path / 'cache'), max_bytes=2500)
+    paths = [cache.put_page(f'{n:02d}' * 32, b'x' * 1000) for n in range(3)]
+    for age, path in enumerate(paths):
+        os.utime(path, (1000 + age, 1000 + age))
+    assert cache.evict() == 1
+    assert not os.path.exists(paths[0])
+    assert all(os.path.exists(path) for path in paths[1:])
+    assert cache.stats()['pages'] == 2
+    cache.clear()
+    assert cache.stats()['bytes'] == 0
@@ -0,0 +1,62 @@
+import zipfile
+
+import fitz  # PyMuPDF
+
+from bionic.epub_converter import EpubConverter
+from conftest import pdf_text, write_epub
+
+
+def write_picture_epub(path):
+    # Two chapters, the second showing an image stored next to the chapters
+    write_epub(path, [('One', 'The first chapter tells of apples.'),
+                      ('Two', 'Bananas below.</p><p><img src="images/pic.png" alt="picture"/>')])
+    pixmap = fitz.Pixmap(fitz.csRGB, fitz.IRect(0, 0, 40, 30), 0)
+    pixmap.clear_with(200)
+    with zipfile.ZipFile(path, 'a') as archive:
+        archive.writestr('OEBPS/images/pic.png', pixmap.tobytes('png'))
+    return path
+
+
+def test_pdf_output_lays_out_chapters_with_their_images(tmp_path):
+    source = write_picture_epub(str(tmp_path / 'book.epub'))
+    out = EpubConverter(source, str(tmp_path / 'out'), output_format='PDF').run()
+    with fitz.open(out) as doc:
+        assert len(doc) == 2  # Each chapter starts a page; the navigation document is not a chapter
+        assert 'apples' in doc[0].get_text()
+        assert 'Bananas' in doc[1].get_text()
+        assert len(doc[1].get_images()) == 1
+
+
+def test_pdf_output_reads_only_chapters_through_python(tmp_path, monkeypatch):
+    # Images are read by the layout engine from the archive as chapters use them, not copied up front
+    source = write_picture_epub(str(tmp_path / 'book.epub'))
+    read = []
+    original = zipfile.ZipFile.read
+
+    def recording_read(self, name, *args):
+        read.append(name if isinstance(name, str) else name.filename)
+        return original(self, name, *args)
+
+    monkeypatch.setattr(zipfile.ZipFile, 'read', recording_read)
+    out = EpubConverter(source, str(tmp_path / 'out'), output_format='PDF').run()
+    assert sorted(read) == ['META-INF/container.xml', 'OEBPS/chapter1.xhtml', 'OEBPS/chapter2.xhtml',
+                            'OEBPS/content.opf']
+    with fitz.open(out) as doc:
+        assert len(doc[1].get_images()) == 1
+
+
+def test_pdf_output_of_selected_chapters(tmp_path, book_epub):
+    out = EpubConverter(book_epub, str(tmp_path / 'out'), output_format='PDF', chapters='2-3').run()
+    pages = pdf_text(out)
+    assert len(pages) == 2
+    assert 'bananas' in pages[0] and 'cherries' in pages[1]
+    assert 'apples' not in ''.join(pages)
+
+
+def test_pdf_output_from_memory(tmp_path):
+    with open(write_picture_epub(str(tmp_path / 'book.epub')), 'rb') as f:
+        data = f.read()
+    out = EpubConverter(data, str(tmp_path / 'out'), output_format='PDF', input_name='memory.epub').run()
+    assert out.endswith('memory_bionic.pdf')
+    with fitz.open(out) as doc:
+        assert len(doc[1].get_images()) == 1
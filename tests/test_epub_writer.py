@@ -0,0 +1,122 @@
+import io
+import os
+import zipfile
+
+from lxml import etree
+
+from bionic.epub_writer import EpubWriter, is_compressed_media, worth_deflating, xhtml_document
+
+XHTML = '{http://www.w3.org/1999/xhtml}'
+
+
+class Pipe:
+    # A write-only stream like stdout piped to another program
+    def __init__(self):
+        self.buffer = io.BytesIO()
+
+    def write(self, data):
+        return self.buffer.write(data)
+
+    def flush(self):
+        pass
+
+    def seekable(self):
+        return False
+
+    def tell(self):
+        raise OSError('unseekable')
+
+
+def write_book(writer):
+    writer.add_chapter('chapter1.xhtml', 'One', '<p>Apples &amp; pears<br>on a tree</p>')
+    writer.add_chapter('chapter2.xhtml', 'Two', '<p>Bananas</p>')
+    writer.add('style.css', b'p { margin: 0 }\n' * 100, 'text/css')
+    writer.add('image.png', os.urandom(4096), 'image/png')
+    return writer.close('A Book', 'urn:uuid:1234', 'en')
+
+
+def check_mimetype(data):
+    assert data[:4] == b'PK\x03\x04'
+    assert data[6:8] == b'\x00\x00'  # No data descriptor: CRC and sizes are in the local header
+    assert data[30:58] == b'mimetypeapplication/epub+zip'
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        info = archive.infolist()[0]
+        assert info.filename == 'mimetype'
+        assert info.compress_type == zipfile.ZIP_STORED
+        assert archive.testzip() is None
+
+
+def test_book_is_written_to_a_file(tmp_path):
+    out = write_book(EpubWriter(str(tmp_path / 'book.epub')))
+    assert out == str(tmp_path / 'book.epub')
+    assert not os.path.exists(out + '.partial')
+    with open(out, 'rb') as f:
+        check_mimetype(f.read())
+    with zipfile.ZipFile(out) as archive:
+        assert set(archive.namelist()) == {
+            'mimetype', 'EPUB/chapter1.xhtml', 'EPUB/chapter2.xhtml', 'EPUB/style.css', 'EPUB/image.png',
+            'EPUB/nav.xhtml', 'EPUB/toc.ncx', 'EPUB/content.opf', 'META-INF/container.xml'}
+        package = etree.fromstring(archive.read('EPUB/content.opf'))
+        opf = '{http://www.idpf.org/2007/opf}'
+        assert [item.get('idref') for item in package.iter(opf + 'itemref')] == ['nav', 'chapter_1', 'chapter_2']
+        nav = etree.fromstring(archive.read('EPUB/nav.xhtml'))
+        assert [a.text for a in nav.iter(XHTML + 'a')] == ['One', 'Two']
+        assert b'EPUB/content.opf' in archive.read('META-INF/container.xml')
+
+
+def test_unseekable_stream_writes_mimetype_with_known_size():
+    pipe = Pipe()
+    assert write_book(EpubWriter(stream=pipe)) is pipe
+    data = pipe.buffer.getvalue()
+    check_mimetype(data)
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        assert archive.read('EPUB/chapter2.xhtml').count(b'Bananas') == 1
+        assert len(archive.namelist()) == 9
+
+
+def test_seekable_stream():
+    stream = io.BytesIO()
+    write_book(EpubWriter(stream=stream))
+    check_mimetype(stream.getvalue())
+
+
+def test_compression_follows_the_media_type(tmp_path):
+    writer = EpubWriter(str(tmp_path / 'book.epub'))
+    writer.add('noise.png', os.urandom(4096), 'image/png')
+    writer.add('blank.png', bytes(4096), 'image/png')
+    writer.add('text.xhtml', b'<p>text</p>' * 100, 'application/xhtml+xml')
+    with zipfile.ZipFile(writer.close(package=False)) as archive:
+        types = {info.filename: info.compress_type for info in archive.infolist()}
+    assert types == {'mimetype': zipfile.ZIP_STORED, 'EPUB/noise.png': zipfile.ZIP_STORED,
+                     'EPUB/blank.png': zipfile.ZIP_DEFLATED, 'EPUB/text.xhtml': zipfile.ZIP_DEFLATED}
+
+
+def test_level_zero_stores_everything(tmp_path):
+    out = write_book(EpubWriter(str(tmp_path / 'book.epub'), compress_level=0))
+    with zipfile.ZipFile(out) as archive:
+        assert {info.compress_type for info in archive.infolist()} == {zipfile.ZIP_STORED}
+
+
+def test_is_compressed_media_and_worth_deflating():
+    assert is_compressed_media('cover.JPG')
+    assert is_compressed_media('song', 'audio/mpeg')
+    assert not is_compressed_media('chapter.xhtml', 'application/xhtml+xml')
+    assert worth_deflating(bytes(1000))
+    assert not worth_deflating(os.urandom(1000))
+
+
+def test_xhtml_document_serializes_html_fragments_as_xml():
+    document = etree.fromstring(xhtml_document('A & B', '<p>one<br>two &amp; three</p>', 'de'))
+    assert document.get('lang') == 'de'
+    assert document.find(XHTML + 'head/' + XHTML + 'title').text == 'A & B'
+    paragraph = document.find(XHTML + 'body/' + XHTML + 'p')
+    assert paragraph.find(XHTML + 'br') is not None
+    assert ''.join(paragraph.itertext()) == 'onetwo & three'
+
+
+def test_abort_leaves_nothing_behind(tmp_path):
+    writer = EpubWriter(str(tmp_path / 'book.epub'))
+    writer.add_chapter('chapter1.xhtml', 'One', '<p>Apples</p>')
+    writer.abort()
+    assert os.listdir(str(tmp_path)) == []
+
@@ -0,0 +1,95 @@
+import fitz  # PyMuPDF
+import pytest
+
+from bionic.extract import extract_columns, extract_lines
+
+
+@pytest.fixture
+def page():
+    # A line with a large bold word before smaller text, a line starting with blank space,
+    # a block of two lines and an image
+    doc = fitz.open()
+    page = doc.new_page()
+    writer = fitz.TextWriter(page.rect)
+    _, end = writer.append((72, 100), 'Big', font=fitz.Font('hebo'), fontsize=20)
+    writer.append(end, ' and small words here', font=fitz.Font('tiro'), fontsize=10)
+    _, end = writer.append((72, 140), '    ', font=fitz.Font('helv'), fontsize=8)
+    writer.append(end, 'Indented code', font=fitz.Font('cour'), fontsize=12)
+    writer.write_text(page)
+    page.insert_text((72, 200), 'Second block line one', fontsize=11)
+    page.insert_text((72, 214), 'Longer second line of that block', fontsize=11)
+    pixmap = fitz.Pixmap(fitz.csRGB, fitz.IRect(0, 0, 4, 4), 0)
+    pixmap.clear_with(128)
+    page.insert_image(fitz.Rect(300, 300, 340, 340), pixmap=pixmap)
+    yield page
+    doc.close()
+
+
+def reference_lines(page):
+    # What the converters used to read from get_text('dict')
+    lines = []
+    for block in page.get_text('dict')['blocks']:
+        for line in block.get('lines', []):
+            spans = line['spans']
+            first = next((span for span in spans if span['text'].strip()), None)
+            dominant = max(spans, key=lambda span: len(span['text'].strip()))
+            lines.append({'bbox': tuple(line['bbox']), 'text': ''.join(span['text'] for span in spans),
+                          'first': first, 'dominant': dominant, 'block': block['bbox']})
+    return lines
+
+
+def test_extract_lines_matches_get_text(page):
+    lines = extract_lines(page)
+    reference = reference_lines(page)
+    assert [line.text for line in lines] == [line['text'] for line in reference]
+    for line, expected in zip(lines, reference):
+        assert tuple(line.rect) == pytest.approx(expected['bbox'], abs=0.01)
+        assert line.font == expected['first']['font']
+        assert line.size == expected['first']['size']
+        assert line.flags == expected['first']['flags']
+        assert line.spans is None
+
+
+def test_extract_lines_with_spans(page):
+    lines = extract_lines(page, spans=True)
+    spans = lines[1].spans
+    assert [span.text for span in spans] == ['    ', 'Indented code']
+    assert (lines[1].font, lines[1].size) == (spans[1].font, 12.0)
+    assert spans[1].origin[1] == pytest.approx(140)
+    assert spans[0].x1 == pytest.approx(spans[1].x0)
+
+
+def test_extract_columns_matches_get_text(page):
+    columns = extract_columns(page)
+    reference = reference_lines(page)
+    assert len(columns) == len(reference) == 4
+    assert columns.text == [line['text'] for line in reference]
+    for n, expected in enumerate(reference):
+        assert tuple(columns.rect(n)) == pytest.approx(expected['bbox'], abs=0.01)
+        assert columns.font[n] == expected['first']['font']
+        assert columns.flags[n] == expected['first']['flags']
+        assert columns.size[n] == expected['dominant']['size']
+        assert columns.baseline[n] == pytest.approx(expected['dominant']['origin'][1])
+        assert columns.column_x1[n] == pytest.approx(expected['block'][2], abs=0.01)
+    # The first line's dominant span is the smaller text, not the large first word
+    assert columns.size[0] == 10.0
+    assert columns.font[0] == 'NimbusSans-Bold'
+
+
+def test_lines_without_visible_text():
+    with fitz.open() as doc:
+        page = doc.new_page()
+        page.insert_text((72, 72), '   ', fontsize=9)
+        lines = extract_lines(page)
+        columns = extract_columns(page)
+        assert [(line.text, line.font, line.size) for line in lines] == [('   ', None, 9)]
+        assert (columns.text, columns.font, columns.size.tolist()) == (['   '], [None], [9])
+
+
+def test_empty_page():
+    with fitz.open() as doc:
+        page = doc.new_page()
+        assert extract_lines(page) == []
+        columns = extract_columns(page)
+        assert len(columns) == 0
+        assert columns.x0.shape == (0,)
@@ -0,0 +1,88 @@
+import fitz  # PyMuPDF
+
+from bionic.fonts import FAMILY_MONO, FAMILY_SANS, FAMILY_SERIF, FontRegistry, font_family, get_font, share_fonts
+
+
+def registry_page(doc, registry, text, face='tiro'):
+    # A page showing ``text`` in an embedded registry face
+    page = doc.new_page()
+    registry.embed(page, [face])
+    page.insert_text((72, 72), text, fontname=registry.resource_name(face))
+    return page
+
+
+def page_font_xrefs(doc, page_number):
+    return sorted(font[0] for font in doc.get_page_fonts(page_number))
+
+
+def test_font_family_by_name_then_flags():
+    assert font_family('ABCDEF+CourierNewPSMT') == FAMILY_MONO
+    assert font_family('Arial-BoldMT') == FAMILY_SANS
+    assert font_family('TimesNewRomanPSMT') == FAMILY_SERIF
+    assert font_family('F1', flags=8) == FAMILY_MONO
+    assert font_family('F1', flags=4) == FAMILY_SERIF
+    assert font_family('F1') == FAMILY_SANS
+    assert font_family(None) == FAMILY_SANS
+
+
+def test_registry_family_needs_match_fonts():
+    assert FontRegistry().family('Arial') == FAMILY_SERIF
+    assert FontRegistry(match_fonts=True).family('Arial') == FAMILY_SANS
+    assert FontRegistry(match_fonts=True).family(None) == FAMILY_SERIF
+
+
+def test_covers_latin_greek_and_cyrillic_only():
+    registry = FontRegistry()
+    assert registry.covers(FAMILY_SERIF, 'Café – Ωμέγα – Привет')
+    assert not registry.covers(FAMILY_SERIF, '你好')
+
+
+def test_encode_matches_the_font():
+    registry = FontRegistry()
+    hex_ids, width = registry.encode('helv', 'Hello')
+    font = get_font('helv')
+    assert hex_ids == ''.join('%04x' % font.has_glyph(ord(char)) for char in 'Hello')
+    assert abs(width - font.text_length('Hello', fontsize=1)) < 1e-6
+    assert registry.encode('helv', 'Hello') is registry.encode('helv', 'Hello')
+
+
+def test_embedded_faces_are_shared_by_the_pages_of_a_document():
+    registry = FontRegistry()
+    with fitz.open() as doc:
+        registry_page(doc, registry, 'First page')
+        registry_page(doc, registry, 'Second page')
+        assert page_font_xrefs(doc, 0) == page_font_xrefs(doc, 1)
+
+
+def test_share_fonts_removes_copies_from_merged_parts(tmp_path):
+    registry = FontRegistry()
+    doc = fitz.open()
+    for text in ('Part one', 'Part two', 'Part three'):
+        with fitz.open() as part:
+            registry_page(part, registry, text)
+            doc.insert_pdf(part)
+    assert len({xref for n in range(3) for xref in page_font_xrefs(doc, n)}) == 3
+    before = len(doc.tobytes(garbage=1))
+    shared = {}
+    assert share_fonts(doc, shared) == 2
+    assert len({xref for n in range(3) for xref in page_font_xrefs(doc, n)}) == 1
+    assert len(doc.tobytes(garbage=1)) < before
+    assert [page.get_text().strip() for page in doc] == ['Part one', 'Part two', 'Part three']
+    # Called again for pages appended later, the same dict keeps pointing at the first copy
+    with fitz.open() as part:
+        registry_page(part, registry, 'Part four')
+        doc.insert_pdf(part)
+    assert share_fonts(doc, shared, first_page=3) == 1
+    assert page_font_xrefs(doc, 3) == page_font_xrefs(doc, 0)
+    doc.close()
+
+
+def test_share_fonts_leaves_other_fonts_alone():
+    with fitz.open() as doc:
+        for text in ('One', 'Two'):
+            with fitz.open() as part:
+                part.new_page().insert_text((72, 72), text, fontname='helv')
+                doc.insert_pdf(part)
+        fonts = [page_font_xrefs(doc, n) for n in range(2)]
+        assert share_fonts(doc, {}) == 0
+        assert [page_font_xrefs(doc, n) for n in range(2)] == fonts
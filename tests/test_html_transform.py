@@ -0,0 +1,58 @@
+from lxml import etree
+
+from bionic.html_transform import transform_document
+
+XHTML = '{http://www.w3.org/1999/xhtml}'
+EPUB_TYPE = '{http://www.idpf.org/2007/ops}type'
+
+CHAPTER = '''<?xml version="1.0" encoding="utf-8"?>
+<!DOCTYPE html>
+<html xmlns="http://www.w3.org/1999/xhtml" xmlns:epub="http://www.idpf.org/2007/ops" xml:lang="en">
+<head><title>Chapter title</title><style>p { margin: 0 }</style></head>
+<body><section epub:type="chapter"><p>Reading <i>quickly</i> helps{entity}</p>
+<pre>code stays plain</pre><img src="../images/a.png"/></section></body></html>'''
+
+
+def styled(root):
+    return [b.text for b in root.iter(XHTML + 'b')]
+
+
+def test_xhtml_is_styled_in_place():
+    out = transform_document(CHAPTER.replace('{entity}', '').encode('utf-8'), resource_base='OEBPS/text')
+    assert out.startswith(b"<?xml version='1.0' encoding='utf-8'?>\n<!DOCTYPE html>")
+    root = etree.fromstring(out)
+    assert styled(root) == ['Read', 'quic', 'hel']
+    assert root.find(f'{XHTML}head/{XHTML}title').text == 'Chapter title'
+    assert root.find(f'.//{XHTML}pre').text == 'code stays plain'
+    assert root.find(f'.//{XHTML}img').get('src') == 'OEBPS/images/a.png'
+    assert ''.join(root.find(f'.//{XHTML}p').itertext()) == 'Reading quickly helps'
+
+
+def test_html_fallback_keeps_the_xhtml_namespace():
+    # &nbsp; is not defined in XML, so the chapter goes through the HTML parser
+    out = transform_document(CHAPTER.replace('{entity}', '&nbsp;&copy;').encode('utf-8'))
+    assert out.count(b'<?xml') == 1 and b'<!--' not in out
+    root = etree.fromstring(out)
+    assert root.tag == XHTML + 'html'
+    assert root.get('{http://www.w3.org/XML/1998/namespace}lang') == 'en'
+    assert root.find(f'{XHTML}body/{XHTML}section').get(EPUB_TYPE) == 'chapter'
+    assert styled(root) == ['Read', 'quic', 'hel']
+    assert ''.join(root.find(f'.//{XHTML}p').itertext()) == 'Reading quickly helps\xa0\xa9'
+    assert all(element.tag.startswith(XHTML) for element in root.iter() if isinstance(element.tag, str))
+
+
+def test_html_fallback_for_plain_html_and_inline_svg():
+    out = transform_document('<html><body><p>Caf&eacute; &amp; bar<br>'
+                             '<svg xmlns="http://www.w3.org/2000/svg"><circle r="1"/></svg></body></html>')
+    root = etree.fromstring(out)
+    assert root.tag == XHTML + 'html'
+    assert root.find(f'.//{XHTML}br') is not None
+    assert root.find('.//{http://www.w3.org/2000/svg}circle') is not None
+    assert ''.join(root.find(f'.//{XHTML}p').itertext()) == 'Café & bar'
+
+
+def test_custom_styling_function_output_is_namespaced():
+    out = transform_document(CHAPTER.replace('{entity}', '').encode('utf-8'),
+                             lambda text: f'<strong>{text}</strong>')
+    root = etree.fromstring(out)
+    assert [node.text for node in root.iter(XHTML + 'strong')] == ['Reading ', 'quickly', ' helps']
@@ -0,0 +1,88 @@
+import fitz  # PyMuPDF
+import pytest
+
+from bionic.converters import make_converter
+from bionic.extract import extract_columns
+from bionic.pdf_converter import PDFConverter
+from conftest import pdf_text, write_pdf
+
+
+def write_layout_pdf(path):
+    # Lines in two sizes and two fonts, one of them indented, and a Chinese line only the HTML engine can show
+    doc = fitz.open()
+    page = doc.new_page()
+    page.insert_text((72, 80), 'A heading in large type', fontsize=20, fontname='tibo')
+    page.insert_text((72, 120), 'Body text set at eleven points in Times', fontsize=11, fontname='tiro')
+    page.insert_text((108, 140), 'An indented line in Helvetica', fontsize=11, fontname='helv')
+    page.insert_text((72, 160), 'Code in a monospace font', fontsize=9, fontname='cour')
+    page.insert_text((72, 190), '你好世界', fontsize=12, fontname='china-s')
+    doc.save(path)
+    doc.close()
+    return path
+
+
+def line_layout(path):
+    # {line text: (x0, baseline, font size)} of the first page
+    with fitz.open(path) as doc:
+        lines = extract_columns(doc[0])
+    return {text.strip(): (float(lines.x0[n]), float(lines.baseline[n]), float(lines.size[n]))
+            for n, text in enumerate(lines.text)}
+
+
+@pytest.mark.parametrize('match_fonts', [False, True])
+def test_html_mode_keeps_text_position_and_size(tmp_path, match_fonts):
+    source = write_layout_pdf(str(tmp_path / 'layout.pdf'))
+    out = make_converter(source, str(tmp_path / 'out'), match_fonts=match_fonts).run()
+    before = line_layout(source)
+    after = line_layout(out)
+    assert set(after) == set(before)
+    for text, (x0, baseline, size) in before.items():
+        new_x0, new_baseline, new_size = after[text]
+        assert abs(new_x0 - x0) < 1, text
+        assert abs(new_baseline - baseline) < 1, text
+        # Bold runs are wider, so a line may shrink a little to stay inside its box, never grow
+        assert 0.85 * size <= new_size <= size + 0.01, text
+
+
+def test_html_mode_shrinks_lines_that_would_overflow_their_column(tmp_path):
+    # Bold runs are wider than the source text; a line at the right margin may not grow past the column
+    source = write_pdf(str(tmp_path / 'wide.pdf'), [['W' * 40]])
+    out = make_converter(source, str(tmp_path / 'out')).run()
+    with fitz.open(source) as src, fitz.open(out) as dst:
+        before = extract_columns(src[0])
+        after = extract_columns(dst[0])
+    assert after.text == before.text
+    assert float(after.size[0]) < float(before.size[0])
+    assert float(after.x1[0]) <= float(before.x1[0]) + 1
+
+
+def test_html_mode_styles_words_in_bold(tmp_path, text_pdf):
+    out = make_converter(text_pdf, str(tmp_path / 'out')).run()
+    with fitz.open(out) as doc:
+        spans = [span for block in doc[0].get_text('dict')['blocks'] for line in block['lines']
+                 for span in line['spans']]
+    bold = [span['text'] for span in spans if span['flags'] & fitz.TEXT_FONT_BOLD]
+    assert 'Alp' in bold
+    assert pdf_text(out)[0].split('\n')[0] == 'Alpha page one about apples'
+
+
+def test_degenerate_line_boxes_still_get_their_text(tmp_path, text_pdf):
+    converter = PDFConverter(text_pdf, str(tmp_path / 'out'))
+    with fitz.open() as doc:
+        page = doc.new_page()
+        converter.insert_html_lines(page, [(fitz.Rect(72, 72, 72, 72), 'hidden text', 10.0)], 0)
+        assert 'hidden text' in page.get_text()
+
+
+def test_html_layout_errors_fail_the_conversion(tmp_path, monkeypatch):
+    source = write_pdf(str(tmp_path / 'cjk.pdf'), [[]])
+    with fitz.open(source) as doc:
+        doc[0].insert_text((72, 72), '你好世界', fontname='china-s')
+        doc.saveIncr()
+
+    def broken(*args, **kwargs):
+        raise ValueError('layout failed')
+
+    monkeypatch.setattr(fitz.Page, 'insert_htmlbox', broken)
+    with pytest.raises(RuntimeError, match='page 1'):
+        make_converter(source, str(tmp_path / 'out'), checkpoint=False).run()
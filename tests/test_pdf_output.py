@@ -0,0 +1,112 @@
+import io
+import json
+import os
+
+import fitz  # PyMuPDF
+
+from bionic.pdf_output import PDFOutput
+from conftest import pdf_text, write_pdf
+
+PAGES = [[f'Page {n} of the book'] for n in range(1, 8)]
+
+
+def add_pages(output, source, pages):
+    for n in pages:
+        output.doc.insert_pdf(source, from_page=n, to_page=n)
+        output.position = n + 1
+        output.page_added()
+
+
+def test_pages_are_written_in_chunks(tmp_path):
+    out_path = str(tmp_path / 'out.pdf')
+    output = PDFOutput(out_path, max_pages=3)
+    with fitz.open(write_pdf(str(tmp_path / 'in.pdf'), PAGES)) as source:
+        add_pages(output, source, range(7))
+    assert output.chunks_written == 2
+    assert len(output.doc) == 1
+    assert os.path.exists(out_path + '.partial')
+    assert output.close() == out_path
+    assert output.pages_written == 7
+    assert [text.strip() for text in pdf_text(out_path)] == [lines[0] for lines in PAGES]
+    assert set(os.listdir(str(tmp_path))) == {'in.pdf', 'out.pdf'}
+
+
+def test_byte_budget_flushes(tmp_path):
+    output = PDFOutput(str(tmp_path / 'out.pdf'), max_bytes=1)
+    with fitz.open(write_pdf(str(tmp_path / 'in.pdf'), PAGES[:2])) as source:
+        add_pages(output, source, range(2))
+    assert output.chunks_written == 2
+    output.close()
+    assert len(pdf_text(str(tmp_path / 'out.pdf'))) == 2
+
+
+def test_suspended_job_resumes_from_its_checkpoint(tmp_path):
+    out_path = str(tmp_path / 'out.pdf')
+    source_path = write_pdf(str(tmp_path / 'in.pdf'), PAGES)
+    job = {'source': 'in.pdf', 'params': [1, 2]}
+    output = PDFOutput(out_path, max_pages=2, checkpoint=job)
+    assert output.resume() == 0
+    with fitz.open(source_path) as source:
+        add_pages(output, source, range(3))
+    output.suspend(flush=False)  # Page 3 was only in memory, so the checkpoint is after page 2
+    with open(out_path + '.checkpoint.json', encoding='utf-8') as f:
+        assert json.load(f)['position'] == 2
+    # A save cut short by the interruption leaves bytes after the checkpoint
+    with open(out_path + '.partial', 'ab') as f:
+        f.write(b'half-written object')
+
+    output = PDFOutput(out_path, max_pages=2, checkpoint=job)
+    assert output.resume() == 2
+    with fitz.open(source_path) as source:
+        add_pages(output, source, range(2, 7))
+    output.close()
+    assert [text.strip() for text in pdf_text(out_path)] == [lines[0] for lines in PAGES]
+    assert not os.path.exists(out_path + '.checkpoint.json')
+
+
+def test_checkpoint_of_another_job_is_discarded(tmp_path):
+    out_path = str(tmp_path / 'out.pdf')
+    output = PDFOutput(out_path, max_pages=1, checkpoint={'source': 'a'})
+    with fitz.open(write_pdf(str(tmp_path / 'in.pdf'), PAGES[:2])) as source:
+        add_pages(output, source, range(2))
+    output.suspend()
+    assert os.path.exists(out_path + '.partial')
+    assert PDFOutput(out_path, checkpoint={'source': 'b'}).resume() == 0
+    assert not os.path.exists(out_path + '.partial')
+    assert not os.path.exists(out_path + '.checkpoint.json')
+
+
+def test_abort_leaves_nothing_behind(tmp_path):
+    output = PDFOutput(str(tmp_path / 'out.pdf'), max_pages=1, checkpoint={'source': 'a'})
+    with fitz.open(write_pdf(str(tmp_path / 'in.pdf'), PAGES[:2])) as source:
+        add_pages(output, source, range(2))
+    output.abort()
+    assert os.listdir(str(tmp_path)) == ['in.pdf']
+
+
+def test_stream_output(tmp_path):
+    stream = io.BytesIO()
+    output = PDFOutput(None, max_pages=1, checkpoint={'source': 'a'}, stream=stream)
+    with fitz.open(write_pdf(str(tmp_path / 'in.pdf'), PAGES[:3])) as source:
+        add_pages(output, source, range(3))
+    assert output.chunks_written == 0  # Everything stays in memory for a stream
+    assert output.close() is stream
+    with fitz.open('pdf', stream.getvalue()) as doc:
+        assert [page.get_text().strip() for page in doc] == [lines[0] for lines in PAGES[:3]]
+    assert os.listdir(str(tmp_path)) == ['in.pdf']
+
+
+def test_close_with_finish(tmp_path):
+    out_path = str(tmp_path / 'out.pdf')
+    output = PDFOutput(out_path)
+    with fitz.open(write_pdf(str(tmp_path / 'in.pdf'), PAGES[:2])) as source:
+        add_pages(output, source, range(2))
+
+    def finish(partial_path, finished_path):
+        with fitz.open(partial_path) as doc:
+            doc.delete_page(0)
+            doc.save(finished_path)
+
+    output.close(finish)
+    assert [text.strip() for text in pdf_text(out_path)] == ['Page 2 of the book']
+    assert set(os.listdir(str(tmp_path))) == {'in.pdf', 'out.pdf'}
@@ -0,0 +1,60 @@
+from bionic import reading
+from bionic.reading import bionic_lines, bionic_reading, bionic_segments, style_word, token_segments
+
+
+def test_style_word():
+    assert style_word('a') == '<b>a</b>'
+    assert style_word('an') == '<b>an</b>'
+    assert style_word('the') == '<b>th</b>e'
+    assert style_word('word') == '<b>wo</b>rd'
+    assert style_word('reading') == '<b>read</b>ing'
+
+
+def test_bionic_reading_keeps_spacing_and_punctuation():
+    assert bionic_reading('Hello,  world!') == '<b>Hel</b>lo,  <b>wor</b>ld!'
+    assert bionic_reading('line one\nline two') == '<b>li</b>ne <b>on</b>e\n<b>li</b>ne <b>tw</b>o'
+    assert bionic_reading('') == ''
+
+
+def test_words_are_letters_joined_by_apostrophes():
+    assert bionic_reading("don't") == "<b>don</b>'t"
+    assert bionic_reading('l’homme') == '<b>l’ho</b>mme'
+    assert bionic_reading('abc123def') == '<b>ab</b>c123<b>de</b>f'
+    assert bionic_reading('snake_case') == '<b>sna</b>ke_<b>ca</b>se'
+    assert bionic_reading('Привет') == '<b>При</b>вет'
+
+
+def test_text_between_words_is_escaped():
+    assert bionic_reading('a < b & c') == '<b>a</b> &lt; <b>b</b> &amp; <b>c</b>'
+    assert bionic_reading('<script>') == '&lt;<b>scr</b>ipt&gt;'
+
+
+def test_bionic_lines_matches_bionic_reading():
+    lines = ['First line, here.', '', 'Second & last']
+    assert bionic_lines(lines) == [bionic_reading(line) for line in lines]
+
+
+def test_segments_match_the_markup():
+    text = 'Hello,  (big) world & more'
+    segments = bionic_segments(text)
+    assert ''.join(run for run, _ in segments) == text
+    markup = ''.join(f'<b>{run}</b>' if bold else run.replace('&', '&amp;') for run, bold in segments)
+    assert markup == bionic_reading(text)
+    # Regular runs are merged, so bold and regular alternate
+    assert all(a[1] != b[1] for a, b in zip(segments, segments[1:]))
+
+
+def test_token_segments():
+    assert token_segments('(word),') == (('(', False), ('wo', True), ('rd),', False))
+    assert token_segments('42') == (('42', False),)
+    assert token_segments('') == ()
+
+
+def test_cache_clear_and_info():
+    reading.cache_clear()
+    bionic_reading('cached cached')
+    info = reading.cache_info()
+    assert info['tokens'].hits == 1
+    assert info['words'].currsize == 1
+    reading.cache_clear()
+    assert reading.cache_info()['tokens'].currsize == 0
@@ -0,0 +1,193 @@
+import http.client
+import json
+import os
+import shutil
+import threading
+import time
+import zipfile
+
+import pytest
+
+from bionic.server import ConversionService, job_options, make_server
+from conftest import pdf_text
+
+
+@pytest.fixture(scope='module')
+def daemon(tmp_path_factory):
+    # One warm worker and an HTTP server on a free port, shared by the tests in this module;
+    # files under the third item may be submitted by path
+    service = ConversionService(workers=1, spool_dir=str(tmp_path_factory.mktemp('spool')), cache_dir=None)
+    service.start()
+    books = str(tmp_path_factory.mktemp('books'))
+    server = make_server(service, port=0, path_roots=[books])
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield service, server.server_address[1], books
+    server.shutdown()
+    server.server_close()
+    service.stop()
+
+
+def request(port, method, path, body=None, headers=None):
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+    try:
+        connection.request(method, path, body=body, headers=headers or {})
+        response = connection.getresponse()
+        return response.status, response.read()
+    finally:
+        connection.close()
+
+
+def submit_path(port, body):
+    status, response = request(port, 'POST', '/jobs', json.dumps(body).encode('utf-8'),
+                               {'Content-Type': 'application/json'})
+    return status, json.loads(response)
+
+
+def wait(port, job, timeout=120):
+    # Poll until the job ends; returns (final job state, result bytes or None)
+    deadline = time.monotonic() + timeout
+    while job['status'] in ('queued', 'running'):
+        assert time.monotonic() < deadline, job
+        time.sleep(0.1)
+        job = json.loads(request(port, 'GET', f"/jobs/{job['id']}")[1])
+    if job['status'] != 'done':
+        return job, None
+    status, result = request(port, 'GET', job['result'])
+    assert status == 200
+    return job, result
+
+
+def convert(port, path, query='', timeout=120):
+    # Upload ``path``, wait for the job and return (final job state, result bytes or None)
+    with open(path, 'rb') as f:
+        status, body = request(port, 'POST', '/jobs' + query, f.read())
+    assert status == 202, body
+    return wait(port, json.loads(body), timeout)
+
+
+def test_job_options_only_pass_checkpoint_to_converters_that_take_it():
+    assert job_options('pdf', {})['checkpoint'] is False
+    assert job_options('epub', {'format': 'pdf'})['checkpoint'] is False
+    assert 'checkpoint' not in job_options('pdf2epub', {})
+
+
+def test_pdf_job(daemon, tmp_path, text_pdf):
+    job, result = convert(daemon[1], text_pdf)
+    assert job['status'] == 'done', job
+    (tmp_path / 'out.pdf').write_bytes(result)
+    assert 'apples' in pdf_text(str(tmp_path / 'out.pdf'))[0]
+
+
+def test_pdf_to_epub_job(daemon, tmp_path, text_pdf):
+    job, result = convert(daemon[1], text_pdf, '?mode=pdf2epub&epub_compression=9')
+    assert job['status'] == 'done', job
+    (tmp_path / 'out.epub').write_bytes(result)
+    with zipfile.ZipFile(str(tmp_path / 'out.epub')) as archive:
+        assert archive.namelist()[0] == 'mimetype'
+        assert b'<b>bana</b>nas' in b''.join(archive.read(name) for name in archive.namelist())
+
+
+def test_epub_job(daemon, tmp_path, book_epub):
+    job, result = convert(daemon[1], book_epub, '?chapters=2')
+    assert job['status'] == 'done', job
+    (tmp_path / 'out.epub').write_bytes(result)
+    with zipfile.ZipFile(str(tmp_path / 'out.epub')) as archive:
+        names = archive.namelist()
+        assert 'OEBPS/chapter2.xhtml' in names
+        assert 'OEBPS/chapter1.xhtml' not in names
+
+
+def test_epub_to_pdf_job(daemon, tmp_path, book_epub):
+    job, result = convert(daemon[1], book_epub, '?format=PDF')
+    assert job['status'] == 'done', job
+    (tmp_path / 'out.pdf').write_bytes(result)
+    assert 'cherries' in ''.join(pdf_text(str(tmp_path / 'out.pdf')))
+
+
+def test_failed_job_reports_its_error(daemon, tmp_path):
+    broken = tmp_path / 'broken.pdf'
+    broken.write_bytes(b'not a pdf')
+    job, result = convert(daemon[1], str(broken))
+    assert job['status'] == 'failed'
+    assert job['error']
+
+
+def test_bad_content_length_is_a_client_error(daemon):
+    status, body = request(daemon[1], 'POST', '/jobs', headers={'Content-Length': 'many'})
+    assert status == 400
+    assert 'Content-Length' in json.loads(body)['error']
+
+
+def test_bad_options_are_a_client_error(daemon, text_pdf):
+    with open(text_pdf, 'rb') as f:
+        status, body = request(daemon[1], 'POST', '/jobs?dpi=high', f.read())
+    assert status == 400
+    assert 'dpi' in json.loads(body)['error']
+
+
+def test_options_must_be_an_object(daemon, text_pdf):
+    path = shutil.copy(text_pdf, daemon[2])
+    for options in ([1], 5, 'ab'):
+        status, body = submit_path(daemon[1], {'path': path, 'options': options})
+        assert status == 400, options
+        assert body['error'] == "'options' must be a JSON object"
+
+
+def test_submit_by_path_under_a_root(daemon, text_pdf):
+    path = shutil.copy(text_pdf, os.path.join(daemon[2], 'by_path.pdf'))
+    status, job = submit_path(daemon[1], {'path': path, 'options': {'render': 'text'}})
+    assert status == 202, job
+    job, result = wait(daemon[1], job)
+    assert job['status'] == 'done', job
+    assert job['name'] == 'by_path.pdf'
+
+
+def test_submit_by_path_outside_the_roots_is_refused(daemon, tmp_path, text_pdf):
+    status, body = submit_path(daemon[1], {'path': text_pdf})
+    assert status == 403
+    assert 'path' in body['error']
+    # A link inside a root does not open up its target
+    link = os.path.join(daemon[2], 'link.pdf')
+    os.symlink(text_pdf, link)
+    assert submit_path(daemon[1], {'path': link})[0] == 403
+
+
+def test_unknown_job(daemon):
+    assert request(daemon[1], 'GET', '/jobs/nope')[0] == 404
+
+
+def test_submit_after_stop_is_refused(tmp_path, text_pdf):
+    service = ConversionService(workers=1, spool_dir=str(tmp_path / 'spool'), cache_dir=None)
+    service.start()
+    server = make_server(service, port=0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        service.stop()
+        with pytest.raises(RuntimeError):
+            service.submit(text_pdf)
+        with open(text_pdf, 'rb') as f:
+            status, body = request(server.server_address[1], 'POST', '/jobs', f.read())
+        assert status == 503
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_submit_with_converter_options_writes_to_output_dir(tmp_path, text_pdf):
+    service = ConversionService(workers=1, spool_dir=str(tmp_path / 'spool'), cache_dir=None, job_ttl=0)
+    service.start()
+    try:
+        service.add_workers(2)
+        job = service.submit(text_pdf, {'mode': 'pdf'}, options={'render_mode': 'text'},
+                             output_dir=str(tmp_path / 'out'))
+        version = None
+        while job.status not in ('done', 'failed', 'cancelled'):
+            info, version = service.wait(job, version, timeout=60)
+        assert job.status == 'done', job.error
+        assert job.out_path == str(tmp_path / 'out' / 'text_bionic.pdf')
+        assert 'apples' in pdf_text(job.out_path)[0]
+        assert service.stats()['workers'] == 2
+    finally:
+        service.stop()
@@ -0,0 +1,60 @@
+import fitz  # PyMuPDF
+
+from bionic.converters import make_converter
+from bionic.extract import extract_lines
+from bionic.text_writer import GlyphTextWriter, encodable
+from conftest import pdf_text, write_pdf
+
+LATIN = 'Plain English line here'
+CYRILLIC = 'Привет мир, это тест'
+CJK = '你好世界'
+
+
+def write_scripts_pdf(path):
+    # One Latin, one Cyrillic and one Chinese line
+    doc = fitz.open()
+    page = doc.new_page()
+    page.insert_font(fontname='F1', fontbuffer=fitz.Font('tiro').buffer)
+    page.insert_text((72, 72), LATIN, fontsize=12)
+    page.insert_text((72, 100), CYRILLIC, fontsize=12, fontname='F1')
+    page.insert_text((72, 128), CJK, fontsize=12, fontname='china-s')
+    doc.save(path)
+    doc.close()
+    return path
+
+
+def test_encodable():
+    assert encodable('Café – “quoted” €5')
+    assert not encodable(CYRILLIC)
+    assert not encodable(CJK)
+
+
+def test_page_operators_leave_out_lines_outside_winansi(tmp_path):
+    with fitz.open(write_scripts_pdf(str(tmp_path / 'scripts.pdf'))) as doc:
+        lines = extract_lines(doc[0], spans=True)
+    ops, skipped = GlyphTextWriter().page_operators(lines)
+    assert [lines[n].text for n in skipped] == [CYRILLIC, CJK]
+    shown = b''.join(bytes.fromhex(op[1:-3]) for op in ops if op.endswith('>Tj'))
+    assert shown and b'?' not in shown
+
+
+def test_text_mode_keeps_every_script(tmp_path):
+    source = write_scripts_pdf(str(tmp_path / 'scripts.pdf'))
+    out = make_converter(source, str(tmp_path / 'out'), render_mode='text').run()
+    text = pdf_text(out)[0]
+    for line in (LATIN, CYRILLIC, CJK):
+        assert line in text
+    assert '?' not in text
+
+
+def test_text_mode_places_spans_at_their_baseline(tmp_path):
+    source = write_pdf(str(tmp_path / 'latin.pdf'), [['First line of text', 'Second line of text']])
+    out = make_converter(source, str(tmp_path / 'out'), render_mode='text').run()
+    with fitz.open(source) as src, fitz.open(out) as dst:
+        before = extract_lines(src[0], spans=True)
+        after = extract_lines(dst[0], spans=True)
+    assert [line.text for line in after] == [line.text for line in before]
+    for old, new in zip(before, after):
+        assert abs(new.spans[0].origin[1] - old.spans[0].origin[1]) < 0.5
+        assert abs(new.x0 - old.x0) < 0.5
+        assert new.size <= old.size + 0.01
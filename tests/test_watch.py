@@ -0,0 +1,135 @@
+import os
+import time
+
+import pytest
+
+from bionic.watch import (BACKEND_INOTIFY, BACKEND_POLLING, FolderWatcher, WatchState, file_stamp,
+                          is_watched_name, watch_folder)
+
+OPTIONS = {'mode': 'pdf', 'render': 'html'}
+
+
+def write(path, data=b'%PDF-1.7 content'):
+    with open(path, 'wb') as f:
+        f.write(data)
+    return str(path)
+
+
+def touch_later(path):
+    # A new modification time with the same content
+    stamp = file_stamp(path)
+    os.utime(path, ns=(stamp[1] + 10 ** 9, stamp[1] + 10 ** 9))
+
+
+def test_is_watched_name():
+    assert is_watched_name('book.PDF')
+    assert is_watched_name('book.epub')
+    assert not is_watched_name('notes.txt')
+    assert not is_watched_name('.hidden.pdf')
+    assert not is_watched_name('~$lock.pdf')
+
+
+def test_state_skips_converted_files_until_they_change(tmp_path):
+    path = write(tmp_path / 'a.pdf')
+    state = WatchState(str(tmp_path / 'state.json'))
+    fingerprint = state.check(path, OPTIONS)
+    assert fingerprint is not None
+    state.record(path, fingerprint, OPTIONS, output=str(tmp_path / 'out' / 'a_bionic.pdf'))
+    assert state.check(path, OPTIONS) is None
+    # Touched only: recognised by its hash and marked current
+    touch_later(path)
+    assert state.check(path, OPTIONS) is None
+    assert tuple(state.entries[path]['stamp']) == file_stamp(path)
+    # Other options or other content: converted again
+    assert state.check(path, {'mode': 'pdf', 'render': 'text'}) is not None
+    write(path, b'%PDF-1.7 edited content')
+    assert state.check(path, OPTIONS) is not None
+
+
+def test_state_is_kept_on_disk(tmp_path):
+    path = write(tmp_path / 'a.pdf')
+    state_path = str(tmp_path / 'state' / 'state.json')
+    state = WatchState(state_path)
+    state.record(path, state.check(path, OPTIONS), OPTIONS, error='broken file')
+    reloaded = WatchState(state_path)
+    assert reloaded.entries[path]['error'] == 'broken file'
+    assert reloaded.check(path, OPTIONS) is None  # A failed file is retried only once it changes
+
+
+def test_unreadable_state_is_ignored(tmp_path):
+    state_path = write(tmp_path / 'state.json', b'{not json')
+    assert WatchState(state_path).entries == {}
+
+
+def test_outputs_are_not_inputs(tmp_path):
+    path = write(tmp_path / 'a.pdf')
+    output = write(tmp_path / 'a_bionic.pdf')
+    state = WatchState(str(tmp_path / 'state.json'))
+    state.record(path, state.check(path, OPTIONS), OPTIONS, output=output)
+    assert state.is_output(output)
+    assert state.check(output, OPTIONS) is None
+
+
+def test_prune_forgets_deleted_inputs(tmp_path):
+    kept = write(tmp_path / 'kept.pdf')
+    gone = write(tmp_path / 'gone.pdf')
+    state = WatchState(str(tmp_path / 'state.json'))
+    for path in (kept, gone):
+        state.record(path, state.check(path, OPTIONS), OPTIONS)
+    os.remove(gone)
+    assert state.prune(str(tmp_path)) == 1
+    assert list(state.entries) == [kept]
+
+
+@pytest.mark.parametrize('use_inotify', [False, True])
+def test_watcher_reports_files_once_settled(tmp_path, use_inotify):
+    existing = write(tmp_path / 'existing.pdf')
+    write(tmp_path / 'ignored.txt')
+    watcher = FolderWatcher(str(tmp_path), settle=0.3, poll_interval=0.05, use_inotify=use_inotify)
+    watcher.start()
+    try:
+        if use_inotify and watcher.backend != BACKEND_INOTIFY:
+            pytest.skip('inotify is not available here')
+        assert watcher.backend == (BACKEND_INOTIFY if use_inotify else BACKEND_POLLING)
+        assert watcher.wait(timeout=2) == [existing]
+
+        # A file that keeps growing is reported only after it stops changing
+        path = str(tmp_path / 'copying.pdf')
+        started = time.monotonic()
+        with open(path, 'wb') as f:
+            for _ in range(4):
+                f.write(b'x' * 1000)
+                f.flush()
+                time.sleep(0.1)
+        assert watcher.wait(timeout=3) == [path]
+        assert time.monotonic() - started >= 0.6
+        assert watcher.wait(timeout=0.5) == []
+    finally:
+        watcher.close()
+
+
+def test_watch_folder_converts_each_file_once(tmp_path):
+    watched = tmp_path / 'in'
+    watched.mkdir()
+    good = write(watched / 'good.pdf')
+    write(watched / 'bad.epub')
+    state = WatchState(str(tmp_path / 'state.json'))
+    converted = []
+
+    def convert(path):
+        if path.endswith('.epub'):
+            raise ValueError('not an EPUB')
+        converted.append(path)
+        return write(tmp_path / 'good_bionic.pdf')
+
+    def watcher():
+        return FolderWatcher(str(watched), settle=0.05, poll_interval=0.05, use_inotify=False)
+
+    logs = []
+    assert watch_folder(watcher(), state, convert, OPTIONS, once=True, log=logs.append) == 1
+    assert converted == [good]
+    assert state.entries[str(watched / 'bad.epub')]['error'] == 'not an EPUB'
+    assert any(line.startswith('Failed bad.epub') for line in logs)
+    # A restarted watcher finds nothing new
+    assert watch_folder(watcher(), WatchState(state.path), convert, OPTIONS, once=True, log=logs.append) == 0
+    assert converted == [good]